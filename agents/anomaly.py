@@ -0,0 +1,294 @@
+"""Anomaly Detector - Streaming anomaly detection over operations telemetry"""
+import os
+import json
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Sequence
+
+import numpy as np
+
+SEASONAL_SLOTS = 24  # hour-of-day baselines
+SLOT_SECONDS = 86400 // SEASONAL_SLOTS
+
+# Alert kinds, in the order of the per-sensor "active" flags
+KINDS = ("spike", "drift", "flatline")
+STATE_FIELDS = ("count", "mean", "m2", "ewma", "ewvar", "s_count", "s_mean", "s_m2", "active", "last", "run")
+ALERTS_LOG_NAME = "alerts.jsonl"
+STATE_NAME = "detector_state.npz"
+
+
+class StreamingDetector:
+    """Vectorized online detector with constant memory per sensor.
+
+    For every sensor it keeps:
+
+    - a Welford running mean/variance (long-run baseline),
+    - a Welford mean/variance per hour-of-day slot (seasonal baseline),
+    - an EWMA of the value and of its squared deviation (short-term level).
+
+    ``update`` takes arrays of readings for many sensors at once and raises:
+
+    - ``spike``: reading is ``z_threshold`` std devs from its seasonal baseline,
+    - ``drift``: the EWMA has moved ``drift_threshold`` std devs from the long-run mean,
+    - ``flatline``: ``flatline_readings`` consecutive readings within
+      ``flatline_tolerance`` std devs of each other (a stuck probe, stopped
+      irrigation), or the EWMA variance collapsed below ``flatline_ratio``.
+
+    An alert is raised once when a condition starts and re-armed once it clears.
+    """
+
+    def __init__(self, alpha: float = 0.05, z_threshold: float = 4.0, drift_threshold: float = 2.0,
+                 flatline_ratio: float = 0.05, flatline_readings: int = 12, flatline_tolerance: float = 0.01,
+                 warmup: int = 30, max_alerts: int = 1000, alerts_log: Optional[str] = None,
+                 capacity: int = 1024):
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.drift_threshold = drift_threshold
+        self.flatline_ratio = flatline_ratio
+        self.flatline_readings = flatline_readings
+        self.flatline_tolerance = flatline_tolerance
+        self.warmup = warmup
+        self.alerts_log = alerts_log
+        self.alerts: deque = deque(maxlen=max_alerts)
+        self.alerts_raised = 0
+
+        self.sensors: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        old = getattr(self, "count", None)
+        n = 0 if old is None else len(self.sensors)
+        fields = {
+            "count": (np.int64, ()),
+            "mean": (np.float64, ()),
+            "m2": (np.float64, ()),
+            "ewma": (np.float64, ()),
+            "ewvar": (np.float64, ()),
+            "s_count": (np.int64, (SEASONAL_SLOTS,)),
+            "s_mean": (np.float64, (SEASONAL_SLOTS,)),
+            "s_m2": (np.float64, (SEASONAL_SLOTS,)),
+            "active": (np.bool_, (len(KINDS),)),
+            "last": (np.float64, ()),
+            "run": (np.int64, ()),
+        }
+        for name, (dtype, shape) in fields.items():
+            arr = np.zeros((capacity,) + shape, dtype=dtype)
+            if old is not None:
+                arr[:n] = getattr(self, name)[:n]
+            setattr(self, name, arr)
+
+    def register(self, sensors: Sequence[str]) -> np.ndarray:
+        """Map sensor names to state indices, adding new sensors as needed"""
+        idx = np.empty(len(sensors), dtype=np.int64)
+        for i, sensor in enumerate(sensors):
+            j = self._index.get(sensor)
+            if j is None:
+                j = len(self.sensors)
+                if j >= self.count.shape[0]:
+                    self._allocate(self.count.shape[0] * 2)
+                self._index[sensor] = j
+                self.sensors.append(sensor)
+            idx[i] = j
+        return idx
+
+    def update(self, sensors: Sequence[str], values: Sequence[float],
+               timestamps: Optional[Sequence[float]] = None) -> List[Dict[str, Any]]:
+        """Feed one reading per entry; returns the alerts raised by this update"""
+        values = np.asarray(values, dtype=np.float64)
+        if timestamps is None:
+            timestamps = np.full(values.size, datetime.now(timezone.utc).timestamp())
+        return self.update_indices(self.register(sensors), values, np.asarray(timestamps, dtype=np.float64))
+
+    def update_indices(self, idx: np.ndarray, values: np.ndarray, timestamps: np.ndarray) -> List[Dict[str, Any]]:
+        """Vectorized update by state index.
+
+        Readings for the same sensor within one call are applied in order, in
+        as many vectorized rounds as the most frequent sensor has readings.
+        """
+        keep = ~np.isnan(values)
+        idx, values, timestamps = idx[keep], values[keep], timestamps[keep]
+        if idx.size == 0:
+            return []
+
+        order = np.lexsort((timestamps, idx))
+        idx, values, timestamps = idx[order], values[order], timestamps[order]
+        starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        rank = np.arange(idx.size) - np.repeat(starts, np.diff(np.r_[starts, idx.size]))
+
+        alerts = []
+        for r in range(int(rank.max()) + 1):
+            sel = rank == r
+            alerts.extend(self._step(idx[sel], values[sel], timestamps[sel]))
+        return alerts
+
+    def _step(self, idx: np.ndarray, x: np.ndarray, ts: np.ndarray) -> List[Dict[str, Any]]:
+        """One vectorized update where every sensor appears at most once"""
+        slot = ((ts % 86400) // SLOT_SECONDS).astype(np.int64)
+
+        # Score against the baselines as they were before this reading
+        count = self.count[idx]
+        base_std = np.sqrt(self.m2[idx] / np.maximum(count - 1, 1))
+        s_count = self.s_count[idx, slot]
+        s_std = np.sqrt(self.s_m2[idx, slot] / np.maximum(s_count - 1, 1))
+        seasonal_ready = s_count >= self.warmup
+        ref_mean = np.where(seasonal_ready, self.s_mean[idx, slot], self.mean[idx])
+        ref_std = np.where(seasonal_ready, s_std, base_std)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = np.abs(x - ref_mean) / ref_std
+        spike = (count >= self.warmup) & (ref_std > 0) & (z > self.z_threshold)
+
+        # EWMA level and variance (first reading seeds the level)
+        first = count == 0
+        ewma = np.where(first, x, self.ewma[idx])
+        diff = x - ewma
+        ewma = ewma + self.alpha * diff
+        ewvar = np.where(first, 0.0, (1 - self.alpha) * (self.ewvar[idx] + self.alpha * diff * diff))
+        self.ewma[idx] = ewma
+        self.ewvar[idx] = ewvar
+
+        # Length of the current run of (near-)identical readings
+        same = ~first & (np.abs(x - self.last[idx]) <= self.flatline_tolerance * base_std)
+        run = np.where(same, self.run[idx] + 1, 1)
+        self.run[idx] = run
+        self.last[idx] = x
+
+        ready = (count >= self.warmup) & (base_std > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drift = ready & (np.abs(ewma - self.mean[idx]) / base_std > self.drift_threshold)
+            flatline = ready & ((run >= self.flatline_readings)
+                                | (ewvar < (self.flatline_ratio * base_std) ** 2))
+
+        # Welford baselines; anomalous readings are kept out so a drift
+        # cannot slowly become the new normal
+        ok = ~(spike | drift)
+        u, us, ux = idx[ok], slot[ok], x[ok]
+        n = self.count[u] + 1
+        delta = ux - self.mean[u]
+        self.mean[u] += delta / n
+        self.m2[u] += delta * (ux - self.mean[u])
+        self.count[u] = n
+
+        sn = self.s_count[u, us] + 1
+        s_delta = ux - self.s_mean[u, us]
+        self.s_mean[u, us] += s_delta / sn
+        self.s_m2[u, us] += s_delta * (ux - self.s_mean[u, us])
+        self.s_count[u, us] = sn
+
+        # Individual spikes are not reported while the whole level has drifted
+        reported = (spike & ~drift, drift, flatline)
+        alerts = []
+        for k, (kind, flags) in enumerate(zip(KINDS, reported)):
+            was_active = self.active[idx, k]
+            for j in np.flatnonzero(flags & ~was_active):
+                alerts.append(self._alert(kind, int(idx[j]), float(x[j]), float(ts[j]),
+                                          float(ref_mean[j] if kind == "spike" else self.mean[idx[j]]),
+                                          float(ewma[j])))
+            self.active[idx, k] = flags
+
+        if alerts:
+            self.alerts.extend(alerts)
+            self.alerts_raised += len(alerts)
+            if self.alerts_log:
+                with open(self.alerts_log, "a") as f:
+                    for alert in alerts:
+                        f.write(json.dumps(alert) + "\n")
+        return alerts
+
+    def _alert(self, kind: str, i: int, value: float, ts: float, baseline: float, ewma: float) -> Dict[str, Any]:
+        return {
+            "timestamp": datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(),
+            "sensor": self.sensors[i],
+            "kind": kind,
+            "value": round(value, 4),
+            "baseline": round(baseline, 4),
+            "ewma": round(ewma, 4),
+        }
+
+    def recent_alerts(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent alerts held in memory"""
+        return list(self.alerts)[-limit:]
+
+    def save(self, path: str) -> None:
+        """Persist detector state so a restart does not repeat the warm-up"""
+        n = len(self.sensors)
+        np.savez(path, sensors=np.array(self.sensors, dtype=object),
+                 **{name: getattr(self, name)[:n] for name in STATE_FIELDS})
+
+    def load(self, path: str) -> None:
+        """Restore state written by ``save``"""
+        with np.load(path, allow_pickle=True) as data:
+            sensors = [str(s) for s in data["sensors"]]
+            self.sensors, self._index = [], {}
+            self._allocate(max(len(sensors), 1))
+            self.register(sensors)
+            for name in STATE_FIELDS:
+                # State saved before run-length flatlines existed starts those at zero
+                if name in data.files:
+                    getattr(self, name)[:len(sensors)] = data[name]
+
+
+def read_alerts(path: str, limit: int = 20, block_size: int = 65536) -> List[Dict[str, Any]]:
+    """Read the last ``limit`` alerts from a JSONL alerts log without loading it all"""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= limit:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    lines = [line for line in data.splitlines() if line.strip()][-limit:]
+    alerts = []
+    for line in lines:
+        try:
+            alerts.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return alerts
+
+
+def alerts_summary(alerts: List[Dict[str, Any]]) -> str:
+    """Compact text rendering of alerts for agent prompts"""
+    return "\n".join(
+        f"- {a['timestamp'][:19]} {a['sensor']}: {a['kind']} (value {a['value']}, baseline {a['baseline']})"
+        for a in alerts
+    )
+
+
+def alerts_log_path(root: Optional[str] = None) -> str:
+    """ANOMALY_ALERTS_LOG, else ``alerts.jsonl`` in the telemetry store (OPERATIONS_DATA_DIR)"""
+    root = root or os.getenv("OPERATIONS_DATA_DIR")
+    return os.getenv("ANOMALY_ALERTS_LOG") or (os.path.join(root, ALERTS_LOG_NAME) if root else "")
+
+
+def detector_from_env(root: str) -> StreamingDetector:
+    """Detector for a telemetry store, with thresholds from ANOMALY_* env vars and saved state"""
+    detector = StreamingDetector(
+        alpha=float(os.getenv("ANOMALY_ALPHA", "0.05")),
+        z_threshold=float(os.getenv("ANOMALY_Z_THRESHOLD", "4.0")),
+        drift_threshold=float(os.getenv("ANOMALY_DRIFT_THRESHOLD", "2.0")),
+        flatline_ratio=float(os.getenv("ANOMALY_FLATLINE_RATIO", "0.05")),
+        flatline_readings=int(os.getenv("ANOMALY_FLATLINE_READINGS", "12")),
+        flatline_tolerance=float(os.getenv("ANOMALY_FLATLINE_TOLERANCE", "0.01")),
+        warmup=int(os.getenv("ANOMALY_WARMUP", "30")),
+        alerts_log=alerts_log_path(root),
+    )
+    state = os.path.join(root, STATE_NAME)
+    if os.path.exists(state):
+        detector.load(state)
+    return detector
+
+
+def recent_alerts_context(state: Optional[Dict[str, Any]] = None, limit: int = 20) -> Optional[str]:
+    """Alerts feed as prompt context, from ``state["alerts"]`` or the alerts log (see ``alerts_log_path``)"""
+    state = state or {}
+    alerts = state.get("alerts")
+    if alerts is None:
+        alerts = read_alerts(alerts_log_path(state.get("sensor_store_dir")), limit=limit)
+    if not alerts:
+        return None
+    return alerts_summary(alerts[-limit:])
@@ -0,0 +1,162 @@
+"""Breaker - Circuit breakers per agent and model for the completion path
+
+A breaker watches the outcome of recent completions. When too many of them
+fail (upstream errors, timeouts) or are slow, it opens and further calls
+fail fast instead of waiting out the deadline. After a cool-down it lets a
+few probe requests through (half-open); if they succeed it closes again,
+otherwise it reopens.
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_WINDOW = 20
+DEFAULT_MIN_CALLS = 10
+DEFAULT_FAILURE_RATE = 50.0
+DEFAULT_SLOW_RATE = 80.0
+DEFAULT_OPEN_SECONDS = 30.0
+DEFAULT_HALF_OPEN_PROBES = 1
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit for an agent/model is open; the call was not attempted"""
+
+    def __init__(self, agent: str, model: str, retry_in: float):
+        super().__init__(f"{agent} is temporarily unavailable ({model} circuit open, retrying in {retry_in:.0f}s)")
+        self.agent = agent
+        self.model = model
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Failure-rate and slow-call-rate breaker over a sliding window of calls"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW, min_calls: int = DEFAULT_MIN_CALLS,
+                 failure_rate: float = DEFAULT_FAILURE_RATE, slow_seconds: Optional[float] = None,
+                 slow_rate: float = DEFAULT_SLOW_RATE, open_seconds: float = DEFAULT_OPEN_SECONDS,
+                 half_open_probes: int = DEFAULT_HALF_OPEN_PROBES):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._calls: deque = deque(maxlen=window)
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (half-open admits a limited number of probes)"""
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probes = self._probe_successes = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(self.opened_at + self.open_seconds - time.time(), 0.0)
+
+    def record(self, success: bool, seconds: float) -> None:
+        slow = self.slow_seconds is not None and seconds >= self.slow_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if success and not slow:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self.state = CLOSED
+                        self._calls.clear()
+                else:
+                    self._open()
+                return
+            if self.state == OPEN:
+                # A call admitted before the breaker opened finished late
+                return
+            self._calls.append((not success, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for failed, _ in self._calls if failed)
+            slow_calls = sum(1 for _, was_slow in self._calls if was_slow)
+            if (failures * 100 >= self.failure_rate * len(self._calls)
+                    or slow_calls * 100 >= self.slow_rate * len(self._calls)):
+                self._open()
+
+    def release(self) -> None:
+        """Return a half-open probe slot for a call that ended without an upstream outcome"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > self._probe_successes:
+                self._probes -= 1
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.time()
+        self.trips += 1
+        self._calls.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failure_rate": sum(1 for failed, _ in self._calls if failed) / calls if calls else 0.0,
+                "slow_rate": sum(1 for _, slow in self._calls if slow) / calls if calls else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "retry_in_s": max(self.opened_at + self.open_seconds - time.time(), 0.0) if self.state == OPEN else 0.0,
+            }
+
+
+def breakers_enabled() -> bool:
+    return os.getenv("LLM_BREAKER", "1").lower() not in ("0", "false", "no")
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(agent: str, model: str, deadline: float) -> CircuitBreaker:
+    """Breaker for an agent/model pair, configured from BREAKER_* env vars.
+
+    Calls slower than BREAKER_SLOW_SECONDS (default: half the agent's
+    deadline) count as slow.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get((agent, model))
+        if breaker is None:
+            slow = os.getenv("BREAKER_SLOW_SECONDS")
+            breaker = _breakers[(agent, model)] = CircuitBreaker(
+                window=int(os.getenv("BREAKER_WINDOW", DEFAULT_WINDOW)),
+                min_calls=int(os.getenv("BREAKER_MIN_CALLS", DEFAULT_MIN_CALLS)),
+                failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", DEFAULT_FAILURE_RATE)),
+                slow_seconds=float(slow) if slow else deadline / 2,
+                slow_rate=float(os.getenv("BREAKER_SLOW_RATE", DEFAULT_SLOW_RATE)),
+                open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", DEFAULT_OPEN_SECONDS)),
+                half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", DEFAULT_HALF_OPEN_PROBES)),
+            )
+        return breaker
+
+
+def breaker_states() -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Snapshot of every breaker, keyed by (agent, model)"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {key: breaker.snapshot() for key, breaker in sorted(breakers.items())}
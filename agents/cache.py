@@ -0,0 +1,575 @@
+"""Cache - Shared cache/state backend for agent responses and health status
+
+Replicas share one backend so a hit on one container is a hit on all:
+- ``redis://[:password@]host:port/db`` - any Redis-protocol server, spoken
+  to with a small built-in RESP client (pipelined, pub/sub invalidation)
+- ``sqlite:///path/to/cache.sqlite`` - file fallback (e.g. a shared volume)
+- ``memory://`` - process-local, for tests and single-container runs
+
+Values are compact JSON, zlib-compressed past a small size. A short-lived
+in-process near-cache sits in front of the backend; writes and deletes
+invalidate it locally and, with Redis, on every other replica.
+"""
+import os
+import json
+import time
+import zlib
+import socket
+import logging
+import sqlite3
+import tempfile
+import threading
+import socketserver
+from collections import OrderedDict
+from urllib.parse import urlparse, unquote
+from typing import Dict, Any, Optional, List, Iterable, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NEAR_TTL = 5.0
+DEFAULT_NEAR_SIZE = 1024
+COMPRESS_ABOVE = 512
+# After a backend error, skip it for this long instead of paying a timeout per call
+RETRY_AFTER = 5.0
+INVALIDATION_CHANNEL = "digital_roots:invalidate"
+
+
+def dumps(value: Any) -> bytes:
+    data = json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    if len(data) > COMPRESS_ABOVE:
+        return b"z" + zlib.compress(data, 6)
+    return b"j" + data
+
+
+def loads(data: bytes) -> Any:
+    if data[:1] == b"z":
+        return json.loads(zlib.decompress(data[1:]))
+    return json.loads(data[1:])
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+def _encode_command(*args: Any) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+class _RespReader:
+    """Incremental RESP2 reply parser over a socket"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buffer = b""
+
+    def _fill(self) -> None:
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("Connection closed by server")
+        self.buffer += chunk
+
+    def _line(self) -> bytes:
+        while b"\r\n" not in self.buffer:
+            self._fill()
+        line, self.buffer = self.buffer.split(b"\r\n", 1)
+        return line
+
+    def _exact(self, size: int) -> bytes:
+        while len(self.buffer) < size + 2:
+            self._fill()
+        data, self.buffer = self.buffer[:size], self.buffer[size + 2:]
+        return data
+
+    def read(self) -> Any:
+        line = self._line()
+        kind, rest = line[:1], line[1:]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            return None if size < 0 else self._exact(size)
+        if kind == b"*":
+            size = int(rest)
+            return None if size < 0 else [self.read() for _ in range(size)]
+        raise ConnectionError(f"Unexpected RESP reply: {line[:40]!r}")
+
+
+class RedisBackend:
+    """Minimal Redis-protocol client: MGET, pipelined SET/DEL and pub/sub"""
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader: Optional[_RespReader] = None
+        self._lock = threading.Lock()
+        self._subscriber: Optional[threading.Thread] = None
+
+    def _connect(self) -> Tuple[socket.socket, _RespReader]:
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        reader = _RespReader(sock)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            sock.sendall(b"".join(_encode_command(*c) for c in setup))
+            for _ in setup:
+                reply = reader.read()
+                if isinstance(reply, RespError):
+                    sock.close()
+                    raise reply
+        return sock, reader
+
+    def pipeline(self, commands: List[tuple]) -> List[Any]:
+        """Send commands in one write and read all replies (reconnects once)"""
+        if not commands:
+            return []
+        payload = b"".join(_encode_command(*c) for c in commands)
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None:
+                        self._sock, self._reader = self._connect()
+                    self._sock.sendall(payload)
+                    replies = [self._reader.read() for _ in commands]
+                    break
+                except (OSError, ConnectionError):
+                    self.close_connection()
+                    if attempt:
+                        raise
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def close_connection(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        values = self.pipeline([("MGET", *keys)])[0]
+        return {k: v for k, v in zip(keys, values) if v is not None}
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        commands = []
+        for key, value in items.items():
+            if ttl:
+                commands.append(("SET", key, value, "PX", int(ttl * 1000)))
+            else:
+                commands.append(("SET", key, value))
+        self.pipeline(commands)
+
+    def delete_many(self, keys: List[str]) -> None:
+        if keys:
+            self.pipeline([("DEL", *keys)])
+
+    def publish(self, keys: List[str]) -> None:
+        if keys:
+            self.pipeline([("PUBLISH", INVALIDATION_CHANNEL, json.dumps(keys))])
+
+    def subscribe(self, callback: Callable[[Optional[List[str]]], None]) -> None:
+        """Call ``callback(keys)`` for invalidations from any replica (``None`` = drop everything)"""
+        if self._subscriber is not None:
+            return
+
+        def listen() -> None:
+            delay = 0.5
+            while True:
+                try:
+                    sock, reader = self._connect()
+                    sock.settimeout(None)
+                    sock.sendall(_encode_command("SUBSCRIBE", INVALIDATION_CHANNEL))
+                    reader.read()
+                    # Anything may have changed while we were not listening
+                    callback(None)
+                    delay = 0.5
+                    while True:
+                        message = reader.read()
+                        if isinstance(message, list) and len(message) == 3 and message[0] == b"message":
+                            callback(json.loads(message[2]))
+                except Exception as e:
+                    logger.warning("Cache invalidation listener reconnecting: %s", e)
+                    callback(None)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 30.0)
+
+        self._subscriber = threading.Thread(target=listen, name="cache-invalidation", daemon=True)
+        self._subscriber.start()
+
+
+class SQLiteBackend:
+    """File-backed fallback; replicas sharing the file see each other's writes"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._lock = threading.Lock()
+        with self._db:
+            self._db.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL);
+            """)
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(batch))}) "
+                    "AND (expires IS NULL OR expires > ?)", (*batch, now))
+                found.update((k, bytes(v)) for k, v in rows)
+        return found
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        expires = time.time() + ttl if ttl else None
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                                 [(k, v, expires) for k, v in items.items()])
+            # Opportunistic cleanup keeps the file from growing without bound
+            self._db.execute("DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache "
+                             "WHERE expires IS NOT NULL AND expires <= ? LIMIT 100)", (time.time(),))
+
+    def delete_many(self, keys: List[str]) -> None:
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM cache WHERE key = ?", [(k,) for k in keys])
+
+    def publish(self, keys: List[str]) -> None:
+        # No push channel: other replicas' near-caches expire on their own TTL
+        pass
+
+    def subscribe(self, callback: Callable[[Optional[List[str]]], None]) -> None:
+        pass
+
+
+class MemoryBackend:
+    """Process-local backend with the same interface (tests, single container)"""
+
+    def __init__(self):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[Optional[List[str]]], None]] = []
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        now = time.time()
+        with self._lock:
+            found = {}
+            for key in keys:
+                entry = self._data.get(key)
+                if entry and (entry[1] is None or entry[1] > now):
+                    found[key] = entry[0]
+            return found
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None) -> None:
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires)
+
+    def delete_many(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def publish(self, keys: List[str]) -> None:
+        for callback in list(self._subscribers):
+            callback(keys)
+
+    def subscribe(self, callback: Callable[[Optional[List[str]]], None]) -> None:
+        self._subscribers.append(callback)
+
+
+class Cache:
+    """Namespaced cache over a shared backend with an in-process near-cache"""
+
+    def __init__(self, backend: Any, namespace: str = "digital_roots", near_size: int = DEFAULT_NEAR_SIZE,
+                 near_ttl: float = DEFAULT_NEAR_TTL):
+        self.backend = backend
+        self.namespace = namespace
+        self.near_size = near_size
+        self.near_ttl = near_ttl
+        self._near: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"near_hits": 0, "hits": 0, "misses": 0, "errors": 0}
+        self._retry_at = 0.0
+        backend.subscribe(self._invalidate)
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _available(self) -> bool:
+        return time.time() >= self._retry_at
+
+    def _failed(self, error: Exception) -> None:
+        # A cache outage must never take the app down: callers see misses
+        logger.warning("Cache backend unavailable: %s", error)
+        self.stats["errors"] += 1
+        self._retry_at = time.time() + RETRY_AFTER
+
+    def _invalidate(self, keys: Optional[List[str]]) -> None:
+        with self._lock:
+            if keys is None:
+                self._near.clear()
+            else:
+                for key in keys:
+                    self._near.pop(key, None)
+
+    def _remember(self, full_key: str, value: Any, ttl: Optional[float]) -> None:
+        expires = time.time() + min(self.near_ttl, ttl or self.near_ttl)
+        with self._lock:
+            self._near[full_key] = (value, expires)
+            self._near.move_to_end(full_key)
+            while len(self._near) > self.near_size:
+                self._near.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values for the keys that are cached; near-cache first, then one backend round trip"""
+        found: Dict[str, Any] = {}
+        remote: List[str] = []
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                full_key = self._key(key)
+                entry = self._near.get(full_key)
+                if entry and entry[1] > now:
+                    found[key] = entry[0]
+                    self.stats["near_hits"] += 1
+                else:
+                    remote.append(key)
+        values: Dict[str, bytes] = {}
+        if remote and self._available():
+            try:
+                values = self.backend.get_many([self._key(k) for k in remote])
+            except Exception as e:
+                self._failed(e)
+            for key in remote:
+                data = values.get(self._key(key))
+                if data is None:
+                    self.stats["misses"] += 1
+                    continue
+                value = loads(data)
+                found[key] = value
+                self.stats["hits"] += 1
+                self._remember(self._key(key), value, None)
+        return found
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> None:
+        if not items:
+            return
+        if not self._available():
+            return
+        encoded = {self._key(k): dumps(v) for k, v in items.items()}
+        try:
+            self.backend.set_many(encoded, ttl)
+            self.backend.publish(list(encoded))
+        except Exception as e:
+            self._failed(e)
+            return
+        for key, value in items.items():
+            self._remember(self._key(key), value, ttl)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def delete(self, *keys: str) -> None:
+        full_keys = [self._key(k) for k in keys]
+        self._invalidate(full_keys)
+        if not self._available():
+            return
+        try:
+            self.backend.delete_many(full_keys)
+            self.backend.publish(full_keys)
+        except Exception as e:
+            self._failed(e)
+
+
+class _LocalRedisHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        server: "LocalRedisServer" = self.server.owner
+        while True:
+            try:
+                command = self._read_command()
+            except (ConnectionError, ValueError, OSError):
+                return
+            if command is None:
+                return
+            name = command[0].upper()
+            if name == b"SUBSCRIBE":
+                self._write([b"subscribe", command[1], 1])
+                server.add_subscriber(self)
+                continue
+            self._write(server.execute(name, command[1:]))
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _write(self, reply: Any) -> None:
+        with self.server.owner.write_lock(self):
+            self.wfile.write(_encode_reply(reply))
+            self.wfile.flush()
+
+
+def _encode_reply(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RespError):
+        return b"-%s\r\n" % str(reply).encode()
+    if isinstance(reply, bool):
+        return b"+OK\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode()
+    return b"*%d\r\n" % len(reply) + b"".join(_encode_reply(r) for r in reply)
+
+
+class LocalRedisServer:
+    """Tiny in-process Redis-protocol server (GET/MGET/SET/DEL/PUBLISH/SUBSCRIBE).
+
+    A stand-in for tests and load tests, so the RESP client and cross-replica
+    invalidation can be exercised without a real Redis.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._data: Dict[bytes, tuple] = {}
+        self._lock = threading.Lock()
+        self._subscribers: List[_LocalRedisHandler] = []
+        self._write_locks: Dict[int, threading.Lock] = {}
+        self._server = socketserver.ThreadingTCPServer((host, port), _LocalRedisHandler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="local-redis", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self) -> "LocalRedisServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def write_lock(self, handler: _LocalRedisHandler) -> threading.Lock:
+        with self._lock:
+            return self._write_locks.setdefault(id(handler), threading.Lock())
+
+    def add_subscriber(self, handler: _LocalRedisHandler) -> None:
+        with self._lock:
+            self._subscribers.append(handler)
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        return entry[0]
+
+    def execute(self, name: bytes, args: List[bytes]) -> Any:
+        if name in (b"PING", b"AUTH", b"SELECT"):
+            return "PONG" if name == b"PING" else True
+        if name == b"PUBLISH":
+            with self._lock:
+                subscribers = list(self._subscribers)
+            delivered = 0
+            for handler in subscribers:
+                try:
+                    handler._write([b"message", args[0], args[1]])
+                    delivered += 1
+                except OSError:
+                    with self._lock:
+                        if handler in self._subscribers:
+                            self._subscribers.remove(handler)
+            return delivered
+        with self._lock:
+            if name == b"GET":
+                return self._get(args[0])
+            if name == b"MGET":
+                return [self._get(k) for k in args]
+            if name == b"SET":
+                expires = None
+                options = [a.upper() for a in args[2:]]
+                if b"PX" in options:
+                    expires = time.time() + int(args[2 + options.index(b"PX") + 1]) / 1000
+                elif b"EX" in options:
+                    expires = time.time() + int(args[2 + options.index(b"EX") + 1])
+                self._data[args[0]] = (args[1], expires)
+                return True
+            if name == b"DEL":
+                return sum(1 for k in args if self._data.pop(k, None) is not None)
+            if name == b"FLUSHDB":
+                self._data.clear()
+                return True
+        return RespError(f"ERR unknown command '{name.decode(errors='replace')}'")
+
+
+def backend_from_url(url: str) -> Any:
+    if url.startswith(("redis://", "rediss://")):
+        if url.startswith("rediss://"):
+            raise ValueError("TLS (rediss://) is not supported by the built-in client")
+        return RedisBackend(url)
+    if url.startswith("sqlite://"):
+        return SQLiteBackend(urlparse(url).path or os.path.join(tempfile.gettempdir(), "digital_roots_cache.sqlite"))
+    if url.startswith("memory://"):
+        return MemoryBackend()
+    raise ValueError(f"Unsupported CACHE_URL '{url}' (expected redis://, sqlite:// or memory://)")
+
+
+_cache: Optional[Cache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Cache:
+    """Process-wide cache from CACHE_URL (default: SQLite file in the temp directory)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            url = os.getenv("CACHE_URL") or "sqlite://" + os.path.join(tempfile.gettempdir(),
+                                                                     "digital_roots_cache.sqlite")
+            _cache = Cache(backend_from_url(url),
+                           near_size=int(os.getenv("CACHE_NEAR_SIZE", DEFAULT_NEAR_SIZE)),
+                           near_ttl=float(os.getenv("CACHE_NEAR_TTL", DEFAULT_NEAR_TTL)))
+        return _cache
@@ -1,29 +1,49 @@
 """Code Agent - Engineering and technical support"""
 import os
 from typing import Dict, Any, Optional
-from openai import OpenAI
 
+from .llm import complete
+from .tracing import span, traced
+from .code_index import get_code_index, format_snippets
+
+
+def _code_context(question: str, state: Dict[str, Any]) -> str:
+    """Snippets from the configured source tree most relevant to the question"""
+    root = state.get("code_root") or os.getenv("CODE_AGENT_SOURCE_ROOT")
+    if not root:
+        return ""
+    index = get_code_index(root, cache_dir=os.getenv("CODE_INDEX_CACHE_DIR"))
+    budget = int(state.get("code_context_tokens", os.getenv("CODE_AGENT_CONTEXT_TOKENS", "2000")))
+    return format_snippets(index.snippets(question, token_budget=budget))
+
+
+@traced("agent.code")
 def run_code(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Code/engineering agent implementation"""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return {"answer": "OPENAI_API_KEY not configured", "meta": {"agent": "code", "tokens": 0}}
     
-    client = OpenAI(api_key=api_key)
     context = "You are the Code Engineering Agent for Green Hill Canarias. Provide technical guidance and code solutions."
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            messages=[
+        with span("prompt_assembly"):
+            snippets = _code_context(question, state or {})
+            if snippets:
+                context += f"\n\nRelevant code from our repository:\n{snippets}"
+
+        result = complete(
+            "code",
+            [
                 {"role": "system", "content": context},
                 {"role": "user", "content": question}
-            ]
+            ],
+            model="gpt-4o-mini",
+            temperature=0.3
         )
         return {
-            "answer": response.choices[0].message.content,
-            "meta": {"agent": "code", "tokens": response.usage.total_tokens}
+            "answer": result["answer"],
+            "meta": {"agent": "code", "tokens": result["tokens"]}
         }
     except Exception as e:
         return {"answer": f"Error: {str(e)}", "meta": {"agent": "code", "tokens": 0}}
@@ -0,0 +1,324 @@
+"""Code Index - Incremental trigram and symbol index over a source tree"""
+import os
+import re
+import ast
+import math
+import time
+import pickle
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Optional, List, Set, Tuple
+
+DEFAULT_EXTENSIONS = (".py", ".md", ".toml", ".yml", ".yaml", ".json", ".txt", ".cfg", ".sh")
+SKIP_DIRS = {".git", "__pycache__", ".venv", "venv", "node_modules", ".mypy_cache", ".pytest_cache", ".tox"}
+CHUNK_LINES = 40
+MAX_FILE_BYTES = 1 << 20
+# Rough chars-per-token ratio used for the snippet budget
+CHARS_PER_TOKEN = 4
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
+def _trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _tokens(text: str) -> Set[str]:
+    """Identifiers and words, with snake_case and CamelCase parts split out"""
+    words = set()
+    for word in _WORD.findall(text):
+        words.add(word.lower())
+        for part in re.split(r"_|(?<=[a-z0-9])(?=[A-Z])", word):
+            if len(part) >= 3:
+                words.add(part.lower())
+    return words
+
+
+def _python_symbols(source: str) -> List[Tuple[str, str, int, int]]:
+    """(kind, qualified name, first line, last line) for classes and functions"""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    symbols = []
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                kind = "class" if isinstance(child, ast.ClassDef) else "function"
+                name = f"{prefix}{child.name}"
+                start = min([d.lineno for d in child.decorator_list] + [child.lineno])
+                symbols.append((kind, name, start, child.end_lineno or child.lineno))
+                visit(child, name + ".")
+
+    visit(tree, "")
+    return symbols
+
+
+class CodeIndex:
+    """Trigram + symbol index that refreshes only files whose mtime or size changed.
+
+    Each file is split into documents: one per class/function (via ``ast``)
+    and fixed line chunks for everything else. Identifier tokens map to
+    document ids, and a trigram index over the token vocabulary resolves
+    partial or misspelled identifiers to known tokens, so a lookup only
+    touches documents that share terms with the query.
+
+    One index is shared by every session thread: ``refresh`` and retrieval
+    hold the index lock, so a query never sees a half-updated index.
+    """
+
+    def __init__(self, root: str, extensions: Tuple[str, ...] = DEFAULT_EXTENSIONS,
+                 cache_path: Optional[str] = None, refresh_interval: float = 5.0):
+        self.root = os.path.abspath(root)
+        self.extensions = extensions
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+
+        self.files: Dict[str, Tuple[float, int, List[int]]] = {}  # path -> (mtime, size, doc ids)
+        self.docs: Dict[int, Dict[str, Any]] = {}
+        self.vocab_trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self.token_postings: Dict[str, Set[int]] = defaultdict(set)
+        self.symbols: Dict[str, Set[int]] = defaultdict(set)
+        self._next_id = 0
+
+        if cache_path and os.path.exists(cache_path):
+            self._load()
+
+    # Persistence
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        if data.get("root") != self.root:
+            return
+        self.files, self.docs, self._next_id = data["files"], data["docs"], data["next_id"]
+        self.token_postings.update(data["token_postings"])
+        self.vocab_trigrams.update(data["vocab_trigrams"])
+        self.symbols.update(data["symbols"])
+
+    def save(self) -> None:
+        if not self.cache_path:
+            return
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"root": self.root, "files": self.files, "docs": self.docs, "next_id": self._next_id,
+                         "token_postings": dict(self.token_postings),
+                         "vocab_trigrams": dict(self.vocab_trigrams),
+                         "symbols": dict(self.symbols)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.cache_path)
+
+    # Indexing
+
+    def _post(self, doc_id: int, doc: Dict[str, Any]) -> None:
+        for token in _tokens(doc["text"]):
+            postings = self.token_postings[token]
+            if not postings:
+                for gram in _trigrams(token):
+                    self.vocab_trigrams[gram].add(token)
+            postings.add(doc_id)
+        if doc["symbol"]:
+            self.symbols[doc["symbol"].rsplit(".", 1)[-1].lower()].add(doc_id)
+
+    def _unpost(self, doc_id: int) -> None:
+        # Vocabulary trigrams are left in place; tokens with no postings are ignored at query time
+        doc = self.docs.pop(doc_id)
+        for token in _tokens(doc["text"]):
+            self.token_postings[token].discard(doc_id)
+        if doc["symbol"]:
+            self.symbols[doc["symbol"].rsplit(".", 1)[-1].lower()].discard(doc_id)
+
+    def _split(self, path: str, source: str) -> List[Dict[str, Any]]:
+        lines = source.splitlines()
+        covered = [False] * len(lines)
+        docs = []
+        if path.endswith(".py"):
+            # Top-level symbols cover their lines; methods are extra, finer documents
+            for kind, name, start, end in _python_symbols(source):
+                docs.append({"path": path, "symbol": name, "kind": kind, "start": start, "end": end,
+                             "text": "\n".join(lines[start - 1:end])})
+                if "." not in name:
+                    for i in range(start - 1, end):
+                        covered[i] = True
+
+        start = None
+        for i in range(len(lines) + 1):
+            free = i < len(lines) and not covered[i]
+            if free and start is None:
+                start = i
+            if start is not None and (not free or i - start >= CHUNK_LINES):
+                text = "\n".join(lines[start:i])
+                if text.strip():
+                    docs.append({"path": path, "symbol": None, "kind": "chunk", "start": start + 1,
+                                 "end": i, "text": text})
+                start = i if free else None
+        return docs
+
+    def _index_file(self, path: str, mtime: float, size: int) -> None:
+        self._remove_file(path)
+        try:
+            with open(os.path.join(self.root, path), "r", encoding="utf-8") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError):
+            self.files[path] = (mtime, size, [])
+            return
+        ids = []
+        for doc in self._split(path, source):
+            doc_id = self._next_id
+            self._next_id += 1
+            self.docs[doc_id] = doc
+            self._post(doc_id, doc)
+            ids.append(doc_id)
+        self.files[path] = (mtime, size, ids)
+
+    def _remove_file(self, path: str) -> None:
+        entry = self.files.pop(path, None)
+        if entry:
+            for doc_id in entry[2]:
+                self._unpost(doc_id)
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """Re-index files added or changed since the last refresh and drop deleted ones"""
+        with self._lock:
+            return self._refresh(force)
+
+    def _refresh(self, force: bool) -> Dict[str, int]:
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return {"added": 0, "updated": 0, "removed": 0}
+        self._last_refresh = now
+
+        stats = {"added": 0, "updated": 0, "removed": 0}
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+            for name in filenames:
+                if not name.endswith(self.extensions):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                if st.st_size > MAX_FILE_BYTES:
+                    continue
+                path = os.path.relpath(full, self.root)
+                seen.add(path)
+                known = self.files.get(path)
+                if known and known[0] == st.st_mtime and known[1] == st.st_size:
+                    continue
+                stats["updated" if known else "added"] += 1
+                self._index_file(path, st.st_mtime, st.st_size)
+
+        for path in list(self.files):
+            if path not in seen:
+                self._remove_file(path)
+                stats["removed"] += 1
+        if any(stats.values()):
+            self.save()
+        return stats
+
+    # Retrieval
+
+    def _similar_tokens(self, token: str, limit: int = 8, threshold: float = 0.5) -> List[Tuple[str, float]]:
+        """Vocabulary tokens sharing enough trigrams with ``token`` (exact match scores 1.0)"""
+        grams = _trigrams(token)
+        if not grams:
+            return [(token, 1.0)] if self.token_postings.get(token) else []
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self.vocab_trigrams.get(gram, ()):
+                shared[candidate] += 1
+        matches = []
+        for candidate, count in shared.items():
+            if not self.token_postings.get(candidate):
+                continue
+            similarity = count / (len(grams) + len(candidate) - 2 - count)
+            if similarity >= threshold:
+                matches.append((candidate, similarity))
+        matches.sort(key=lambda m: m[1], reverse=True)
+        return matches[:limit]
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
+        """Documents ranked by symbol hits and IDF-weighted (fuzzy) token overlap with the query"""
+        with self._lock:
+            return self._search(query, limit)
+
+    def _search(self, query: str, limit: int) -> List[Tuple[float, Dict[str, Any]]]:
+        n_docs = max(len(self.docs), 1)
+        scores: Dict[int, float] = defaultdict(float)
+
+        def idf(df: int) -> float:
+            return math.log(1 + n_docs / df)
+
+        for token in _tokens(query):
+            for doc_id in self.symbols.get(token, ()):
+                scores[doc_id] += 5.0
+            for match, similarity in self._similar_tokens(token):
+                postings = self.token_postings[match]
+                weight = idf(len(postings)) * similarity
+                for doc_id in postings:
+                    scores[doc_id] += weight
+
+        # Dampen long documents so a huge class does not win just by containing every word
+        for doc_id in scores:
+            doc = self.docs[doc_id]
+            scores[doc_id] /= 1.0 + math.log1p((doc["end"] - doc["start"] + 1) / CHUNK_LINES)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(score, self.docs[doc_id]) for doc_id, score in ranked]
+
+    def snippets(self, query: str, token_budget: int = 2000) -> List[Dict[str, Any]]:
+        """Best-matching snippets that fit within ``token_budget``; overlapping ranges are skipped"""
+        budget = token_budget * CHARS_PER_TOKEN
+        chosen: List[Dict[str, Any]] = []
+        for _, doc in self.search(query, limit=50):
+            if any(c["path"] == doc["path"] and c["start"] <= doc["end"] and doc["start"] <= c["end"]
+                   for c in chosen):
+                continue
+            cost = len(doc["text"]) + len(doc["path"]) + 20
+            if cost > budget:
+                if chosen:
+                    continue
+                # The best match alone is too big: keep its head
+                lines = doc["text"][:budget].splitlines()[:-1] or [doc["text"][:budget]]
+                doc = dict(doc, text="\n".join(lines), end=doc["start"] + len(lines) - 1)
+                cost = budget
+            chosen.append(doc)
+            budget -= cost
+            if budget < 200:
+                break
+        return chosen
+
+
+def format_snippets(snippets: List[Dict[str, Any]]) -> str:
+    """Render snippets with path and line range headers"""
+    blocks = []
+    for doc in snippets:
+        label = f" ({doc['kind']} {doc['symbol']})" if doc["symbol"] else ""
+        blocks.append(f"# {doc['path']}:{doc['start']}-{doc['end']}{label}\n{doc['text']}")
+    return "\n\n".join(blocks)
+
+
+_indexes: Dict[str, CodeIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_code_index(root: str, cache_dir: Optional[str] = None) -> CodeIndex:
+    """Process-wide index per source root, refreshed incrementally on each call"""
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            cache_path = None
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+                cache_path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", os.path.abspath(root)) + ".idx")
+            index = _indexes[root] = CodeIndex(root, cache_path=cache_path)
+    index.refresh()
+    return index
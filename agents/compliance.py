@@ -1,29 +1,45 @@
 """Compliance Agent - Regulatory compliance and quality assurance"""
 import os
 from typing import Dict, Any, Optional
-from openai import OpenAI
 
+from .llm import complete
+from .tracing import span, traced
+from .scanner import regulated_terms, redact
+
+
+@traced("agent.compliance")
 def run_compliance(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Compliance/QA agent implementation"""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return {"answer": "OPENAI_API_KEY not configured", "meta": {"agent": "compliance", "tokens": 0}}
     
-    client = OpenAI(api_key=api_key)
     context = "You are the Compliance & QA Agent for Green Hill Canarias. Ensure regulatory compliance and quality."
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.1,
-            messages=[
+        with span("prompt_assembly"):
+            terms = regulated_terms(question)
+            documents = (state or {}).get("documents") or []
+            for doc in documents:
+                terms.update(regulated_terms(doc))
+            if terms:
+                flagged = ", ".join(f"{term} ({count})" for term, count in terms.most_common())
+                context += f"\n\nRegulated terms flagged by the document scanner: {flagged}"
+            if documents:
+                context += "\n\nDocuments under review (PII redacted):\n" + "\n---\n".join(redact(d) for d in documents)
+
+        result = complete(
+            "compliance",
+            [
                 {"role": "system", "content": context},
                 {"role": "user", "content": question}
-            ]
+            ],
+            model="gpt-4o-mini",
+            temperature=0.1
         )
         return {
-            "answer": response.choices[0].message.content,
-            "meta": {"agent": "compliance", "tokens": response.usage.total_tokens}
+            "answer": result["answer"],
+            "meta": {"agent": "compliance", "tokens": result["tokens"]}
         }
     except Exception as e:
         return {"answer": f"Error: {str(e)}", "meta": {"agent": "compliance", "tokens": 0}}
@@ -0,0 +1,333 @@
+"""Evidence - Append-only, hash-chained evidence log with Merkle-sealed segments
+
+The log stays plain JSONL (one entry per line) so existing readers keep
+working; each entry gains ``seq``, ``prev`` (hash of the previous entry) and
+``hash`` fields. Every ``segment_size`` entries the segment is sealed: its
+Merkle root, byte range and last hash go to ``<log>.roots``. Sealed segments
+can be verified independently and in parallel, and ``<log>.verified``
+remembers how far verification got so audits only read new segments.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+GENESIS = "0" * 64
+DEFAULT_SEGMENT_SIZE = 1000
+CHAIN_FIELDS = ("seq", "prev", "hash")
+
+
+def canonical(entry: Dict[str, Any]) -> bytes:
+    return json.dumps(entry, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def entry_hash(entry: Dict[str, Any]) -> str:
+    """Hash of an entry (including its ``prev`` link) without its own ``hash`` field"""
+    return hashlib.sha256(canonical({k: v for k, v in entry.items() if k != "hash"})).hexdigest()
+
+
+def merkle_root(hashes: List[str]) -> str:
+    """Binary Merkle root over hex leaf hashes (odd nodes are paired with themselves)"""
+    if not hashes:
+        return GENESIS
+    level = [bytes.fromhex(h) for h in hashes]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _exclusive(f):
+    """Hold the cross-process writer lock on an open log file"""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class EvidenceLog:
+    """Writer for one evidence log file (safe across threads and processes)"""
+
+    def __init__(self, path: str, segment_size: int = DEFAULT_SEGMENT_SIZE):
+        self.path = path
+        self.roots_path = path + ".roots"
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Under the writer lock: another process may be creating the genesis
+        # record or be halfway through an append we must not mistake for a torn line
+        with open(self.path, "ab") as f, _exclusive(f):
+            self._recover()
+
+    def _recover(self) -> None:
+        """Rebuild the writer state from the roots file and the unsealed tail (writer lock held)"""
+        roots = _read_jsonl(self.roots_path)
+        genesis = next((r for r in roots if r.get("type") == "genesis"), None)
+        segments = [r for r in roots if r.get("type") == "segment"]
+        if genesis is None:
+            # Entries written before chaining existed stay in front as unverified legacy bytes
+            genesis = {"type": "genesis", "offset": self._legacy_end(), "created": time.time()}
+            with open(self.roots_path, "a") as f:
+                f.write(json.dumps(genesis) + "\n")
+        self.legacy_bytes = genesis["offset"]
+        self.segments = len(segments)
+        if segments:
+            last = segments[-1]
+            self._tail_offset = last["offset"] + last["length"]
+            self._head = last["head"]
+            self._seq = last["end_seq"] + 1
+        else:
+            self._tail_offset = genesis["offset"]
+            self._head = GENESIS
+            self._seq = 0
+
+        self._tail_hashes: List[str] = []
+        with open(self.path, "rb+") as f:
+            f.seek(self._tail_offset)
+            data = f.read()
+            complete = data[:data.rfind(b"\n") + 1]
+            if len(complete) < len(data):
+                # A torn final line from an interrupted write is never part of the chain
+                f.truncate(self._tail_offset + len(complete))
+        for line in complete.splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self._tail_hashes.append(entry["hash"])
+                self._head = entry["hash"]
+                self._seq = entry["seq"] + 1
+        self._end = self._tail_offset + len(complete)
+
+    def _legacy_end(self) -> int:
+        """Byte offset just past any unchained entries already in the file"""
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    if "hash" in json.loads(line):
+                        break
+                except ValueError:
+                    pass
+                offset += len(line)
+        return offset
+
+    @property
+    def head(self) -> str:
+        """Hash of the latest entry; publishing it anchors everything before it"""
+        return self._head
+
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Chain and append one entry, sealing the segment when it is full"""
+        with self._lock, open(self.path, "ab") as f, _exclusive(f):
+            if os.fstat(f.fileno()).st_size != self._end:
+                # Another process appended since we last looked
+                self._recover()
+            record = {k: v for k, v in entry.items() if k not in CHAIN_FIELDS}
+            record["seq"] = self._seq
+            record["prev"] = self._head
+            record["hash"] = entry_hash(record)
+            line = json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+            f.write(line)
+            f.flush()
+            self._end += len(line)
+            self._head = record["hash"]
+            self._seq += 1
+            self._tail_hashes.append(record["hash"])
+            if len(self._tail_hashes) >= self.segment_size:
+                self._seal()
+        return record
+
+    def _seal(self) -> None:
+        count = len(self._tail_hashes)
+        segment = {
+            "type": "segment",
+            "index": self.segments,
+            "start_seq": self._seq - count,
+            "end_seq": self._seq - 1,
+            "offset": self._tail_offset,
+            "length": self._end - self._tail_offset,
+            "root": merkle_root(self._tail_hashes),
+            "head": self._head,
+            "sealed": time.time(),
+        }
+        with open(self.roots_path, "a") as f:
+            f.write(json.dumps(segment) + "\n")
+        self.segments += 1
+        self._tail_offset = self._end
+        self._tail_hashes = []
+
+
+def _verify_range(path: str, offset: int, length: Optional[int], prev: str,
+                  start_seq: int) -> Tuple[int, List[str], str, Optional[str]]:
+    """Check the chain over a byte range; returns (entries, hashes, head, error)"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read() if length is None else f.read(length)
+    if length is not None and len(data) != length:
+        return 0, [], prev, f"segment at byte {offset} is truncated"
+    hashes: List[str] = []
+    seq = start_seq
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return len(hashes), hashes, prev, f"entry {seq} is not valid JSON"
+        if entry.get("seq") != seq:
+            return len(hashes), hashes, prev, f"expected entry {seq}, found {entry.get('seq')}"
+        if entry.get("prev") != prev:
+            return len(hashes), hashes, prev, f"entry {seq} does not link to the previous entry"
+        if entry_hash(entry) != entry.get("hash"):
+            return len(hashes), hashes, prev, f"entry {seq} was modified"
+        prev = entry["hash"]
+        hashes.append(prev)
+        seq += 1
+    return len(hashes), hashes, prev, None
+
+
+def _verify_segment(path: str, segment: Dict[str, Any], prev: str,
+                    probe: Optional[int] = None) -> Tuple[int, int, Optional[str], Optional[str]]:
+    """Check one sealed segment; also returns the hash of entry ``probe`` if it is in the segment"""
+    count, hashes, head, error = _verify_range(path, segment["offset"], segment["length"], prev,
+                                               segment["start_seq"])
+    probe_hash = None
+    if probe is not None and 0 <= probe - segment["start_seq"] < len(hashes):
+        probe_hash = hashes[probe - segment["start_seq"]]
+    index = segment["index"]
+    if error is None and count != segment["end_seq"] - segment["start_seq"] + 1:
+        error = f"segment {index} has {count} entries, expected {segment['end_seq'] - segment['start_seq'] + 1}"
+    if error is None and head != segment["head"]:
+        error = f"segment {index} ends at the wrong hash"
+    if error is None and merkle_root(hashes) != segment["root"]:
+        error = f"segment {index} Merkle root mismatch"
+    return index, count, None if error is None else f"segment {index}: {error}", probe_hash
+
+
+def verify_log(path: str, full: bool = False, workers: Optional[int] = None) -> Dict[str, Any]:
+    """Verify sealed segments not yet verified (all with ``full``) and the unsealed tail.
+
+    Segments are checked in parallel; each one only needs its predecessor's
+    head from the roots file. The number of consecutive good segments and
+    the last verified entry are stored in ``<log>.verified``: the next run
+    (incremental or full) fails if the log no longer reaches that entry
+    or it was rewritten, so truncating the unsealed tail is caught too.
+    """
+    start = time.perf_counter()
+    roots = _read_jsonl(path + ".roots")
+    genesis = next((r for r in roots if r.get("type") == "genesis"), {"offset": 0})
+    segments = [r for r in roots if r.get("type") == "segment"]
+    checkpoint_path = path + ".verified"
+    checkpoint: Dict[str, Any] = {}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+    # Even a full rescan must still reach the last entry any earlier run verified
+    last_seq = checkpoint.get("last_seq")
+    done = 0 if full else checkpoint.get("segments", 0)
+    # The checkpoint only counts if the sealed segments it covered are unchanged
+    if done and (done > len(segments) or segments[done - 1]["head"] != checkpoint.get("head")):
+        done = 0
+
+    errors: List[str] = []
+    pending = segments[done:]
+    previous = [segments[i - 1]["head"] if i else GENESIS for i in range(done, len(segments))]
+    if workers is None:
+        workers = min(len(pending), os.cpu_count() or 1)
+    probes = [last_seq if last_seq is not None and s["start_seq"] <= last_seq <= s["end_seq"] else None
+              for s in pending]
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_verify_segment, [path] * len(pending), pending, previous, probes))
+    else:
+        results = [_verify_segment(path, s, p, q) for s, p, q in zip(pending, previous, probes)]
+
+    verified_to = done
+    records = 0
+    probed = None
+    for index, count, error, probe_hash in sorted(results):
+        records += count
+        probed = probed or probe_hash
+        if error:
+            errors.append(error)
+        elif index == verified_to:
+            verified_to += 1
+
+    # Unsealed tail: chained but not yet covered by a Merkle root
+    tail_offset = segments[-1]["offset"] + segments[-1]["length"] if segments else genesis["offset"]
+    tail_prev = segments[-1]["head"] if segments else GENESIS
+    tail_seq = segments[-1]["end_seq"] + 1 if segments else 0
+    tail_count, tail_hashes, head, tail_error = _verify_range(path, tail_offset, None, tail_prev, tail_seq)
+    if tail_error:
+        errors.append(f"tail: {tail_error}")
+
+    # Truncation or rollback: the previously verified last entry must still be there, unchanged
+    end_seq = tail_seq + tail_count - 1
+    if last_seq is not None and not tail_error:
+        if tail_seq <= last_seq <= end_seq:
+            probed = tail_hashes[last_seq - tail_seq]
+        if last_seq > end_seq:
+            errors.append(f"log ends at entry {end_seq} but entry {last_seq} was verified before "
+                          "(truncated or rolled back)")
+        elif probed is not None and probed != checkpoint.get("last_head"):
+            errors.append(f"entry {last_seq} differs from the one verified before (rolled back and rewritten)")
+
+    updated = dict(checkpoint)
+    if verified_to:
+        updated.update(segments=verified_to, head=segments[verified_to - 1]["head"])
+    if not errors and end_seq >= 0:
+        updated.update(last_seq=end_seq, last_head=head)
+    if updated != checkpoint:
+        updated["verified"] = time.time()
+        _write_json(checkpoint_path, updated)
+    return {
+        "ok": not errors,
+        "segments": len(segments),
+        "checked_segments": len(pending),
+        "checked_entries": records + tail_count,
+        "tail_entries": tail_count,
+        "legacy_bytes": genesis["offset"],
+        "head": head,
+        "errors": errors,
+        "elapsed_s": time.perf_counter() - start,
+    }
+
+
+_logs: Dict[str, EvidenceLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_evidence_log(path: str) -> EvidenceLog:
+    """Shared writer per log path (EVIDENCE_SEGMENT_SIZE sets the segment size)"""
+    with _logs_lock:
+        if path not in _logs:
+            _logs[path] = EvidenceLog(path, int(os.getenv("EVIDENCE_SEGMENT_SIZE", DEFAULT_SEGMENT_SIZE)))
+        return _logs[path]
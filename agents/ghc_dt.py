@@ -3,8 +3,14 @@ import os
 import json
 from datetime import datetime
 from typing import Dict, Any, Optional
-from openai import OpenAI
 
+from .llm import complete
+from .tracing import span, traced
+from .anomaly import recent_alerts_context
+from .evidence import get_evidence_log
+
+
+@traced("agent.ghc_dt")
 def run_ghc_dt(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """CEO Digital Twin orchestrator implementation"""
     # Get configuration
@@ -20,7 +26,7 @@ Current context: {context}"""
     
     system_prompt = os.getenv("GHC_DT_SYSTEM_PROMPT", default_prompt)
     
-    # Initialize OpenAI
+    # Check API key
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return {
@@ -28,7 +34,6 @@ Current context: {context}"""
             "meta": {"agent": "ghc_dt", "tokens": 0}
         }
     
-    client = OpenAI(api_key=api_key)
     state = state or {}
     
     # Build context
@@ -39,29 +44,36 @@ Current context: {context}"""
     })
     
     try:
-        response = client.chat.completions.create(
-            model=model,
-            temperature=temperature,
-            messages=[
-                {"role": "system", "content": system_prompt.format(context=context)},
+        with span("prompt_assembly"):
+            system_content = system_prompt.format(context=context)
+            alerts = recent_alerts_context(state, limit=10)
+            if alerts:
+                system_content += f"\n\nOperations anomaly alerts:\n{alerts}"
+
+        result = complete(
+            "ghc_dt",
+            [
+                {"role": "system", "content": system_content},
                 {"role": "user", "content": question}
-            ]
+            ],
+            model=model,
+            temperature=temperature
         )
         
-        answer = response.choices[0].message.content
-        tokens = response.usage.total_tokens
+        answer = result["answer"]
+        tokens = result["tokens"]
         
-        # Log to evidence if configured
+        # Log to the hash-chained evidence log if configured
         if evidence_log:
-            entry = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "agent": "ghc_dt",
-                "question": question,
-                "answer": answer,
-                "tokens": tokens
-            }
-            with open(evidence_log, "a") as f:
-                f.write(json.dumps(entry) + "\n")
+            with span("evidence_write"):
+                entry = {
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "agent": "ghc_dt",
+                    "question": question,
+                    "answer": answer,
+                    "tokens": tokens
+                }
+                get_evidence_log(evidence_log).append(entry)
         
         return {"answer": answer, "meta": {"agent": "ghc_dt", "tokens": tokens}}
     
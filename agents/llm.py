@@ -0,0 +1,445 @@
+"""LLM - Shared chat completion path used by every agent"""
+import os
+import json
+import time
+import hashlib
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional
+from openai import OpenAI, APIConnectionError, APIStatusError
+
+from .tracing import span
+from .tokens import admit
+from .cache import get_cache
+from .breaker import CircuitOpenError, breakers_enabled, get_breaker
+
+# One client (and connection pool) per API key instead of one per question
+_clients: Dict[str, OpenAI] = {}
+
+DEFAULT_DEADLINE_SECONDS = 60.0
+# Hedges allowed per agent as a percentage of its requests
+DEFAULT_HEDGE_BUDGET = 5.0
+DEFAULT_MAX_WORKERS = 32
+
+# Attempts run in a shared pool so the caller can wait with a deadline and race a hedge
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_size = 0
+_inflight = 0
+_executor_lock = threading.Lock()
+
+
+class WorkerPoolTimeout(RuntimeError):
+    """No completion worker became free in time; nothing was sent upstream"""
+
+
+def _submit(fn, *args) -> Future:
+    """Run ``fn`` on the completion pool (LLM_MAX_WORKERS threads), tracking queued work"""
+    global _executor, _executor_size, _inflight
+    with _executor_lock:
+        if _executor is None:
+            _executor_size = int(os.getenv("LLM_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+            _executor = ThreadPoolExecutor(max_workers=_executor_size, thread_name_prefix="llm")
+        _inflight += 1
+        future = _executor.submit(fn, *args)
+    future.add_done_callback(_finished)
+    return future
+
+
+def _finished(future: Future) -> None:
+    global _inflight
+    with _executor_lock:
+        _inflight -= 1
+
+
+def _worker_free() -> bool:
+    """Whether a new attempt would start right away instead of queueing"""
+    with _executor_lock:
+        return _executor is None or _inflight < _executor_size
+
+
+def get_client(api_key: str) -> OpenAI:
+    """Reuse OpenAI clients across calls"""
+    if api_key not in _clients:
+        _clients[api_key] = OpenAI(api_key=api_key)
+    return _clients[api_key]
+
+
+def agent_deadline(agent: str) -> float:
+    """Seconds an agent's completion may take (LLM_DEADLINE_<AGENT>, else LLM_DEADLINE_SECONDS)"""
+    value = os.getenv(f"LLM_DEADLINE_{agent.upper()}") or os.getenv("LLM_DEADLINE_SECONDS")
+    return float(value) if value else DEFAULT_DEADLINE_SECONDS
+
+
+class LatencyTracker:
+    """Rolling window of completion latencies per agent"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(agent, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, agent: str, q: float = 95.0) -> Optional[float]:
+        """The ``q``-th percentile latency, or None until enough samples exist"""
+        with self._lock:
+            samples = sorted(self._samples.get(agent, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(q / 100 * len(samples)), len(samples) - 1)]
+
+
+class HedgeStats:
+    """Per-agent request, hedge and deadline counters"""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _agent(self, agent: str) -> Dict[str, int]:
+        return self._counts.setdefault(agent, {"requests": 0, "hedged": 0, "hedge_wins": 0,
+                                               "hedges_skipped": 0, "deadline_exceeded": 0})
+
+    def increment(self, agent: str, key: str) -> None:
+        with self._lock:
+            self._agent(agent)[key] += 1
+
+    def reserve_hedge(self, agent: str, budget: float) -> bool:
+        """Count a hedge if it keeps hedged requests within ``budget`` percent"""
+        with self._lock:
+            counts = self._agent(agent)
+            if counts["hedged"] + 1 > counts["requests"] * budget / 100:
+                return False
+            counts["hedged"] += 1
+            return True
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {agent: dict(counts) for agent, counts in self._counts.items()}
+
+
+latency = LatencyTracker()
+stats = HedgeStats()
+
+
+def hedge_stats() -> Dict[str, Dict[str, Any]]:
+    """Hedge rate, hedge win rate and p95 latency per agent"""
+    report = {}
+    for agent, counts in stats.snapshot().items():
+        p95 = latency.percentile(agent)
+        report[agent] = dict(
+            counts,
+            hedge_rate=counts["hedged"] / counts["requests"] if counts["requests"] else 0.0,
+            win_rate=counts["hedge_wins"] / counts["hedged"] if counts["hedged"] else 0.0,
+            p95_ms=None if p95 is None else p95 * 1000,
+        )
+    return report
+
+
+class _Attempt:
+    """One in-flight request; cancelling closes its stream"""
+
+    def __init__(self, hedge: bool, origin: Optional[float] = None):
+        self.hedge = hedge
+        # Time to first token is measured from here (the primary attempt's start for hedges)
+        self.origin = origin
+        self.started: Optional[float] = None
+        self.running = threading.Event()
+        self.cancelled = threading.Event()
+        self.stream = None
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        stream = self.stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+
+def _run_attempt(client: OpenAI, attempt: _Attempt, messages: List[Dict[str, str]], model: str,
+                 temperature: float, timeout: float) -> Optional[Dict[str, Any]]:
+    """Stream one completion; returns None if cancelled by the winning attempt"""
+    attempt.started = time.perf_counter()
+    start = attempt.origin if attempt.origin is not None else attempt.started
+    attempt.running.set()
+    if attempt.cancelled.is_set():
+        return None
+    with span("attempt", hedge=attempt.hedge) as sp:
+        stream = client.chat.completions.create(
+            model=model,
+            temperature=temperature,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            timeout=timeout,
+        )
+        attempt.stream = stream
+        parts = []
+        tokens = 0
+        ttft_ms = None
+        try:
+            for chunk in stream:
+                if attempt.cancelled.is_set():
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                    parts.append(chunk.choices[0].delta.content)
+                if chunk.usage:
+                    tokens = chunk.usage.total_tokens
+        except Exception:
+            if attempt.cancelled.is_set():
+                sp.set_attribute("cancelled", True)
+                return None
+            raise
+        if attempt.cancelled.is_set():
+            sp.set_attribute("cancelled", True)
+            stream.close()
+            return None
+        return {"answer": "".join(parts), "tokens": tokens, "ttft_ms": ttft_ms}
+
+
+def response_key(agent: str, messages: List[Dict[str, str]], model: str, temperature: float) -> str:
+    """Shared cache key for an identical request to the same agent and model"""
+    request = json.dumps([agent, model, temperature, messages], sort_keys=True, separators=(",", ":"))
+    return "response:" + hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+def response_cache_ttl(agent: str) -> float:
+    """Seconds answers stay cached (LLM_CACHE_TTL_<AGENT>, else LLM_CACHE_TTL; 0 = off)"""
+    value = os.getenv(f"LLM_CACHE_TTL_{agent.upper()}") or os.getenv("LLM_CACHE_TTL")
+    return float(value) if value else 0.0
+
+
+def stale_answer_ttl() -> float:
+    """Seconds an answer may still be served while its circuit is open (LLM_STALE_TTL; 0 = off)"""
+    return float(os.getenv("LLM_STALE_TTL", "0"))
+
+
+def fallback_model(agent: str) -> Optional[str]:
+    """Cheaper model to use while the primary circuit is open (LLM_FALLBACK_MODEL[_<AGENT>])"""
+    return os.getenv(f"LLM_FALLBACK_MODEL_{agent.upper()}") or os.getenv("LLM_FALLBACK_MODEL") or None
+
+
+def _upstream_failure(error: BaseException) -> bool:
+    """Errors that say the provider is unhealthy (not that our request was bad)"""
+    if isinstance(error, (TimeoutError, APIConnectionError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code >= 500 or error.status_code == 429)
+
+
+def complete(agent: str, messages: List[Dict[str, str]], model: str = "gpt-4o-mini",
+             temperature: float = 0.3, deadline: Optional[float] = None,
+             hedge: Optional[bool] = None) -> Dict[str, Any]:
+    """Run a chat completion and return ``{"answer": str, "tokens": int}``.
+
+    With LLM_CACHE_TTL set, identical requests are answered from the shared
+    cache (see ``cache.get_cache``) so every replica benefits from a hit;
+    cached answers report zero tokens. Otherwise the prompt is counted
+    locally and checked against the model's context window and the
+    agent/session token budgets; a request that cannot be admitted raises
+    ``AdmissionError`` without any network call, and an oversize one may be
+    truncated or chunked (see ``tokens.admit``). Chunked requests are
+    answered part by part and the answers merged by one more request, all
+    within the one deadline.
+
+    Each agent/model pair has a circuit breaker (see ``breaker``). While it
+    is open the call does not go upstream: it is answered with a cached
+    answer up to LLM_STALE_TTL old, else by LLM_FALLBACK_MODEL, else fails
+    fast with ``CircuitOpenError``. Degraded results carry a ``degraded``
+    key (``"cache"`` or ``"model"``).
+    """
+    ttl = response_cache_ttl(agent)
+    stale_ttl = stale_answer_ttl()
+    key = response_key(agent, messages, model, temperature)
+    if ttl > 0:
+        with span("cache_lookup", agent=agent) as sp:
+            cached = get_cache().get(key)
+            fresh = cached is not None and time.time() - cached.get("at", time.time()) < ttl
+            sp.set_attribute("hit", fresh)
+        if fresh:
+            return {"answer": cached["answer"], "tokens": 0}
+
+    deadline = agent_deadline(agent) if deadline is None else deadline
+    try:
+        result = _guarded(agent, messages, model, temperature, deadline, hedge)
+    except CircuitOpenError as open_error:
+        with span("degraded", agent=agent, model=model) as sp:
+            cached = get_cache().get(key) if max(ttl, stale_ttl) > 0 else None
+            if cached is not None and time.time() - cached.get("at", 0) < max(ttl, stale_ttl):
+                sp.set_attribute("fallback", "cache")
+                return {"answer": cached["answer"], "tokens": 0, "degraded": "cache"}
+            fallback = fallback_model(agent)
+            if not fallback or fallback == model:
+                sp.set_attribute("fallback", "none")
+                raise
+            sp.set_attribute("fallback", fallback)
+            try:
+                result = _guarded(agent, messages, fallback, temperature, deadline, hedge)
+            except CircuitOpenError:
+                raise open_error from None
+            return dict(result, degraded="model")
+
+    if ttl > 0 or stale_ttl > 0:
+        get_cache().set(key, {"answer": result["answer"], "tokens": result["tokens"], "model": model,
+                              "at": time.time()}, max(ttl, stale_ttl))
+    return result
+
+
+def _guarded(agent: str, messages: List[Dict[str, str]], model: str, temperature: float,
+             deadline: float, hedge: Optional[bool]) -> Dict[str, Any]:
+    """Admission and completion behind the agent/model circuit breaker"""
+    breaker = get_breaker(agent, model, deadline) if breakers_enabled() else None
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(agent, model, breaker.retry_in())
+
+    try:
+        with span("admission", agent=agent, model=model) as sp:
+            admission = admit(agent, messages, model)
+            sp.set_attribute("prompt_tokens", admission.prompt_tokens)
+            sp.set_attribute("action", admission.action)
+    except Exception:
+        if breaker is not None:
+            breaker.release()
+        raise
+
+    tokens = 0
+    began = time.perf_counter()
+
+    def call(request: List[Dict[str, str]], allowed: bool) -> str:
+        """One upstream request within what is left of the deadline"""
+        nonlocal tokens
+        remaining = deadline - (time.perf_counter() - began)
+        if remaining <= 0:
+            if allowed and breaker is not None:
+                breaker.release()
+            raise TimeoutError(f"{agent} chunked completion exceeded its {deadline:g}s deadline")
+        # Later parts of a chunked request re-check the breaker: it may have opened meanwhile
+        if not allowed and breaker is not None and not breaker.allow():
+            raise CircuitOpenError(agent, model, breaker.retry_in())
+        started = time.perf_counter()
+        try:
+            result = _complete(agent, request, model, temperature, remaining, hedge)
+        except Exception as e:
+            if breaker is not None:
+                if _upstream_failure(e):
+                    breaker.record(False, time.perf_counter() - started)
+                else:
+                    breaker.release()
+            raise
+        if breaker is not None:
+            # Upstream time only: waiting for a worker is not the provider being slow
+            breaker.record(True, result["elapsed"])
+        tokens += result["tokens"]
+        return result["answer"]
+
+    try:
+        answers = [call(request, allowed=i == 0) for i, request in enumerate(admission.requests)]
+        if len(answers) > 1:
+            with span("combine", agent=agent, parts=len(answers)):
+                answer = call(admission.combine_request(answers, model), allowed=False)
+        else:
+            answer = answers[0]
+    finally:
+        admission.settle(tokens)
+    return {"answer": answer, "tokens": tokens}
+
+
+def _complete(agent: str, messages: List[Dict[str, str]], model: str, temperature: float,
+              deadline: Optional[float], hedge: Optional[bool]) -> Dict[str, Any]:
+    """One streamed completion with a deadline and optional hedging.
+
+    The response is streamed so the ``completion`` span can record time to
+    first token; usage is taken from the final stream chunk. The deadline
+    clock starts when the request actually starts running: waiting for a
+    free worker does not count, but if none frees up within the deadline
+    the call fails with ``WorkerPoolTimeout``. Past the deadline it fails
+    with ``TimeoutError``. With hedging on (``hedge`` or LLM_HEDGE) a second
+    identical request is sent when the first one outlives the agent's
+    observed p95 latency, as long as hedged requests stay within
+    LLM_HEDGE_BUDGET percent and a worker is free to run it at once; the
+    first response wins and the other stream is closed.
+    """
+    client = get_client(os.getenv("OPENAI_API_KEY", ""))
+    deadline = agent_deadline(agent) if deadline is None else deadline
+    if hedge is None:
+        hedge = os.getenv("LLM_HEDGE", "").lower() in ("1", "true", "yes")
+    budget = float(os.getenv("LLM_HEDGE_BUDGET", DEFAULT_HEDGE_BUDGET))
+
+    with span("completion", agent=agent, model=model, temperature=temperature) as sp:
+        queued = time.perf_counter()
+        stats.increment(agent, "requests")
+        hedge_after = latency.percentile(agent) if hedge else None
+
+        def launch(is_hedge: bool, origin: Optional[float] = None) -> _Attempt:
+            attempt = _Attempt(is_hedge, origin)
+            attempts[_submit(contextvars.copy_context().run, _run_attempt, client, attempt,
+                             messages, model, temperature, deadline)] = attempt
+            return attempt
+
+        attempts: Dict[Any, _Attempt] = {}
+        primary = launch(False)
+        if not primary.running.wait(deadline):
+            primary.cancel()
+            for future in attempts:
+                future.cancel()
+            raise WorkerPoolTimeout(f"{agent} completion waited {deadline:g}s for a free worker")
+        start = primary.started
+        sp.set_attribute("queue_ms", (start - queued) * 1000)
+        pending = set(attempts)
+        winner = None
+        error: Optional[BaseException] = None
+        while pending and winner is None:
+            elapsed = time.perf_counter() - start
+            remaining = deadline - elapsed
+            if remaining <= 0:
+                break
+            if hedge_after is not None and elapsed >= hedge_after:
+                if not _worker_free():
+                    # A queued hedge would only add load behind the requests it is meant to beat
+                    stats.increment(agent, "hedges_skipped")
+                elif stats.reserve_hedge(agent, budget):
+                    launch(True, start)
+                    pending = {f for f in attempts if not f.done()}
+                hedge_after = None
+            timeout = remaining if hedge_after is None else min(remaining, hedge_after - elapsed)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if result is not None:
+                    winner = (attempts[future], result)
+                    break
+
+        for attempt in attempts.values():
+            if winner is None or attempt is not winner[0]:
+                attempt.cancel()
+
+        elapsed = time.perf_counter() - start
+        sp.set_attribute("hedged", len(attempts) > 1)
+        if winner is None:
+            if error is not None and not pending:
+                raise error
+            stats.increment(agent, "deadline_exceeded")
+            latency.record(agent, deadline)
+            raise TimeoutError(f"{agent} completion exceeded its {deadline:g}s deadline")
+
+        attempt, result = winner
+        latency.record(agent, elapsed)
+        if attempt.hedge:
+            stats.increment(agent, "hedge_wins")
+        sp.set_attribute("hedge_won", attempt.hedge)
+        if result["ttft_ms"] is not None:
+            sp.set_attribute("ttft_ms", result["ttft_ms"])
+        sp.set_attribute("tokens", result["tokens"])
+    return {"answer": result["answer"], "tokens": result["tokens"], "elapsed": elapsed}
@@ -1,29 +1,55 @@
 """Market Agent - Market analysis and competitive intelligence"""
 import os
 from typing import Dict, Any, Optional
-from openai import OpenAI
 
+from .llm import complete
+from .tracing import span, traced
+from .market_data import MarketStore, market_summary
+
+# Stores are reused across calls so indicator state stays in memory; state
+# rewritten by another process (market_ingest.py) is re-read on next use
+_stores: Dict[str, MarketStore] = {}
+
+
+def get_market_store(state: Optional[Dict[str, Any]] = None) -> Optional[MarketStore]:
+    """Return the configured price series store, if any"""
+    root = (state or {}).get("market_data_dir") or os.getenv("MARKET_DATA_DIR")
+    if not root:
+        return None
+    if root not in _stores:
+        _stores[root] = MarketStore(root)
+    return _stores[root]
+
+
+@traced("agent.market")
 def run_market(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Market agent implementation"""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return {"answer": "OPENAI_API_KEY not configured", "meta": {"agent": "market", "tokens": 0}}
     
-    client = OpenAI(api_key=api_key)
     context = "You are the Market Intelligence Agent for Green Hill Canarias. Analyze markets, competitors, and opportunities."
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            messages=[
+        with span("prompt_assembly"):
+            store = get_market_store(state)
+            if store:
+                summary = market_summary(store)
+                if summary:
+                    context += f"\n\nMarket price indicators:\n{summary}"
+
+        result = complete(
+            "market",
+            [
                 {"role": "system", "content": context},
                 {"role": "user", "content": question}
-            ]
+            ],
+            model="gpt-4o-mini",
+            temperature=0.3
         )
         return {
-            "answer": response.choices[0].message.content,
-            "meta": {"agent": "market", "tokens": response.usage.total_tokens}
+            "answer": result["answer"],
+            "meta": {"agent": "market", "tokens": result["tokens"]}
         }
     except Exception as e:
         return {"answer": f"Error: {str(e)}", "meta": {"agent": "market", "tokens": 0}}
@@ -0,0 +1,324 @@
+"""Market Data - Price/volume series store with incremental indicators"""
+import os
+import re
+import json
+import math
+import logging
+import calendar
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Iterable
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SMA_WINDOWS = (7, 30)
+EMA_SPANS = (12, 26)
+VOLATILITY_WINDOW = 30
+# Annualization factor for volatility; daily series by default
+PERIODS_PER_YEAR = int(os.getenv("MARKET_PERIODS_PER_YEAR", "365"))
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _stamp(path: str) -> Optional[tuple]:
+    """(mtime, size) of a file, or None when it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _iso(epoch: Optional[int]) -> str:
+    return "" if epoch is None else datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+class Indicators:
+    """Incrementally maintained indicators for one price/volume series.
+
+    Every ``append`` is O(1): moving averages and volatility use running sums
+    over bounded windows, seasonality keeps per-month accumulators and the
+    price elasticity is an online least-squares fit of ln(volume) on ln(price).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_timestamp: Optional[int] = None
+        self.last_price: Optional[float] = None
+        self.prices: deque = deque(maxlen=max(SMA_WINDOWS))
+        self.price_sums = {w: 0.0 for w in SMA_WINDOWS}
+        self.ema: Dict[int, Optional[float]] = {s: None for s in EMA_SPANS}
+        self.returns: deque = deque(maxlen=VOLATILITY_WINDOW)
+        self.ret_sum = 0.0
+        self.ret_sumsq = 0.0
+        self.month_count = [0] * 12
+        self.month_sum = [0.0] * 12
+        # Online OLS sums for ln(volume) = a + b * ln(price)
+        self.ols = {"n": 0, "x": 0.0, "y": 0.0, "xx": 0.0, "xy": 0.0, "yy": 0.0}
+
+    def append(self, timestamp: int, price: float, volume: Optional[float] = None) -> bool:
+        """Fold in one point; points older than the last one are ignored"""
+        if price is None or not price > 0 or (self.last_timestamp is not None and timestamp <= self.last_timestamp):
+            return False
+
+        for w in SMA_WINDOWS:
+            self.price_sums[w] += price
+            if len(self.prices) >= w:
+                self.price_sums[w] -= self.prices[-w]
+        self.prices.append(price)
+
+        for span in EMA_SPANS:
+            alpha = 2.0 / (span + 1)
+            prev = self.ema[span]
+            self.ema[span] = price if prev is None else prev + alpha * (price - prev)
+
+        if self.last_price is not None:
+            ret = math.log(price / self.last_price)
+            if len(self.returns) == self.returns.maxlen:
+                old = self.returns[0]
+                self.ret_sum -= old
+                self.ret_sumsq -= old * old
+            self.returns.append(ret)
+            self.ret_sum += ret
+            self.ret_sumsq += ret * ret
+
+        month = datetime.fromtimestamp(timestamp, tz=timezone.utc).month - 1
+        self.month_count[month] += 1
+        self.month_sum[month] += price
+
+        if volume is not None and volume > 0:
+            x, y = math.log(price), math.log(volume)
+            self.ols["n"] += 1
+            self.ols["x"] += x
+            self.ols["y"] += y
+            self.ols["xx"] += x * x
+            self.ols["xy"] += x * y
+            self.ols["yy"] += y * y
+
+        self.count += 1
+        self.last_timestamp = timestamp
+        self.last_price = price
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current indicator values"""
+        result: Dict[str, Any] = {"points": self.count, "last_price": self.last_price}
+        if self.last_timestamp is not None:
+            result["last_timestamp"] = datetime.fromtimestamp(self.last_timestamp, tz=timezone.utc).isoformat()
+        for w in SMA_WINDOWS:
+            result[f"sma_{w}"] = self.price_sums[w] / w if len(self.prices) >= w else None
+        for span in EMA_SPANS:
+            result[f"ema_{span}"] = self.ema[span]
+
+        n = len(self.returns)
+        if n >= 2:
+            mean = self.ret_sum / n
+            var = max((self.ret_sumsq - n * mean * mean) / (n - 1), 0.0)
+            result["volatility_annualized"] = math.sqrt(var * PERIODS_PER_YEAR)
+        else:
+            result["volatility_annualized"] = None
+
+        total = sum(self.month_sum)
+        overall = total / self.count if self.count else 0.0
+        result["seasonality"] = {
+            calendar.month_abbr[m + 1]: round(self.month_sum[m] / self.month_count[m] / overall, 3)
+            for m in range(12) if self.month_count[m] and overall
+        }
+
+        o = self.ols
+        denom = o["n"] * o["xx"] - o["x"] ** 2
+        if o["n"] >= 3 and denom > 1e-12:
+            slope = (o["n"] * o["xy"] - o["x"] * o["y"]) / denom
+            syy = o["n"] * o["yy"] - o["y"] ** 2
+            r2 = ((o["n"] * o["xy"] - o["x"] * o["y"]) ** 2 / (denom * syy)) if syy > 1e-12 else None
+            result["price_elasticity"] = slope
+            result["elasticity_r2"] = r2
+        else:
+            result["price_elasticity"] = None
+            result["elasticity_r2"] = None
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "last_timestamp": self.last_timestamp,
+            "last_price": self.last_price,
+            "prices": list(self.prices),
+            "price_sums": {str(k): v for k, v in self.price_sums.items()},
+            "ema": {str(k): v for k, v in self.ema.items()},
+            "returns": list(self.returns),
+            "ret_sum": self.ret_sum,
+            "ret_sumsq": self.ret_sumsq,
+            "month_count": self.month_count,
+            "month_sum": self.month_sum,
+            "ols": self.ols,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Indicators":
+        ind = cls()
+        ind.count = data["count"]
+        ind.last_timestamp = data["last_timestamp"]
+        ind.last_price = data["last_price"]
+        ind.prices.extend(data["prices"])
+        ind.price_sums = {int(k): v for k, v in data["price_sums"].items()}
+        ind.ema = {int(k): v for k, v in data["ema"].items()}
+        ind.returns.extend(data["returns"])
+        ind.ret_sum = data["ret_sum"]
+        ind.ret_sumsq = data["ret_sumsq"]
+        ind.month_count = data["month_count"]
+        ind.month_sum = data["month_sum"]
+        ind.ols = data["ols"]
+        return ind
+
+
+class MarketStore:
+    """Append-only price/volume series with indicator state persisted alongside.
+
+    Layout under ``root``::
+
+        series/<name>.csv        timestamp, price, volume
+        indicators/<name>.json   incremental indicator state
+
+    Indicator state is cached in memory and re-read when its file changes, so
+    a store held by the app sees points written by ``market_ingest.py``.
+    Points at or before a series' last timestamp cannot be folded into the
+    incremental indicators; they are skipped, logged and counted in
+    ``dropped``.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, "series"), exist_ok=True)
+        os.makedirs(os.path.join(root, "indicators"), exist_ok=True)
+        # name -> (file mtime/size, indicators)
+        self._indicators: Dict[str, tuple] = {}
+        self.dropped = {"out_of_order": 0, "invalid": 0}
+
+    @staticmethod
+    def _key(name: str) -> str:
+        """Series name as stored on disk and listed by ``series_names``"""
+        return _SAFE_NAME.sub("_", name)
+
+    def _path(self, kind: str, name: str, ext: str) -> str:
+        return os.path.join(self.root, kind, self._key(name) + ext)
+
+    def series_names(self) -> List[str]:
+        return sorted(f[:-len(".json")] for f in os.listdir(os.path.join(self.root, "indicators"))
+                      if f.endswith(".json"))
+
+    def indicators(self, name: str) -> Indicators:
+        # One cache entry per stored series, whatever spelling the caller used
+        name = self._key(name)
+        path = self._path("indicators", name, ".json")
+        stamp = _stamp(path)
+        cached = self._indicators.get(name)
+        if cached is None or cached[0] != stamp:
+            if stamp is None:
+                ind = Indicators()
+            else:
+                with open(path, "r") as f:
+                    ind = Indicators.from_dict(json.load(f))
+            cached = self._indicators[name] = (stamp, ind)
+        return cached[1]
+
+    def append(self, name: str, points: Iterable[Dict[str, Any]]) -> int:
+        """Append points (timestamp, price, optional volume) and update indicators"""
+        name = self._key(name)
+        ind = self.indicators(name)
+        rows = []
+        late, invalid = [], 0
+        last = ind.last_timestamp
+        for p in sorted(points, key=lambda p: p["timestamp"]):
+            volume = p.get("volume")
+            volume = None if volume is None or pd.isna(volume) else float(volume)
+            timestamp = int(p["timestamp"])
+            if ind.append(timestamp, float(p["price"]), volume):
+                rows.append(f"{timestamp},{float(p['price'])},{'' if volume is None else volume}\n")
+            elif ind.last_timestamp is not None and timestamp <= ind.last_timestamp:
+                late.append(timestamp)
+            else:
+                invalid += 1
+        if late:
+            self.dropped["out_of_order"] += len(late)
+            logger.warning("%s: dropped %d points at or before the last stored timestamp %s (%s .. %s)",
+                           name, len(late), _iso(last), _iso(late[0]), _iso(late[-1]))
+        if invalid:
+            self.dropped["invalid"] += invalid
+            logger.warning("%s: dropped %d points without a positive price", name, invalid)
+        if not rows:
+            return 0
+
+        series_path = self._path("series", name, ".csv")
+        new_file = not os.path.exists(series_path)
+        with open(series_path, "a") as f:
+            if new_file:
+                f.write("timestamp,price,volume\n")
+            f.writelines(rows)
+        tmp = self._path("indicators", name, ".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(ind.to_dict(), f)
+        path = self._path("indicators", name, ".json")
+        os.replace(tmp, path)
+        self._indicators[name] = (_stamp(path), ind)
+        return len(rows)
+
+    def _ingest_frame(self, frame: pd.DataFrame, series: Optional[str]) -> int:
+        if "series" not in frame.columns:
+            if not series:
+                raise ValueError("Input has no 'series' column; pass a series name")
+            frame = frame.assign(series=series)
+        frame = frame.assign(timestamp=pd.to_datetime(frame["timestamp"], utc=True).dt.as_unit("s").astype("int64"))
+        if "volume" not in frame.columns:
+            frame = frame.assign(volume=None)
+        count = 0
+        for name, group in frame.groupby("series", sort=False):
+            count += self.append(str(name), group[["timestamp", "price", "volume"]].to_dict("records"))
+        return count
+
+    def ingest_csv(self, path: str, series: Optional[str] = None) -> int:
+        """Ingest a CSV with timestamp, price[, volume][, series] columns"""
+        return self._ingest_frame(pd.read_csv(path), series)
+
+    def ingest_json(self, path: str, series: Optional[str] = None) -> int:
+        """Ingest a JSON list of records, or ``{"<series>": [records...]}``"""
+        with open(path, "r") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            frames = [pd.DataFrame(records).assign(series=name) for name, records in data.items()]
+            frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        else:
+            frame = pd.DataFrame(data)
+        if frame.empty:
+            return 0
+        return self._ingest_frame(frame, series)
+
+    def history(self, name: str) -> pd.DataFrame:
+        """Full stored series"""
+        return pd.read_csv(self._path("series", name, ".csv"))
+
+
+def _fmt(value: Any, spec: str = ",.2f") -> str:
+    return "n/a" if value is None else format(value, spec)
+
+
+def market_summary(store: MarketStore) -> str:
+    """Compact text rendering of indicators for every series"""
+    lines = []
+    for name in store.series_names():
+        snap = store.indicators(name).snapshot()
+        vol = snap["volatility_annualized"]
+        lines.append(
+            f"- {name}: last {_fmt(snap['last_price'])} ({snap.get('last_timestamp', '')[:10]}), "
+            + ", ".join(f"SMA{w} {_fmt(snap[f'sma_{w}'])}" for w in SMA_WINDOWS) + ", "
+            + ", ".join(f"EMA{s} {_fmt(snap[f'ema_{s}'])}" for s in EMA_SPANS)
+            + f", volatility {_fmt(vol, '.1%')}, elasticity {_fmt(snap['price_elasticity'])}"
+        )
+        seasonal = snap["seasonality"]
+        if len(seasonal) >= 2:
+            high = max(seasonal, key=seasonal.get)
+            low = min(seasonal, key=seasonal.get)
+            lines.append(f"  seasonality: high {high} ({seasonal[high]:.2f}x), low {low} ({seasonal[low]:.2f}x)")
+    return "\n".join(lines)
@@ -1,29 +1,59 @@
 """Operations Agent - Operational excellence and execution"""
 import os
 from typing import Dict, Any, Optional
-from openai import OpenAI
 
+from .llm import complete
+from .tracing import span, traced
+from .sensor_store import SensorStore, operations_summary
+from .anomaly import recent_alerts_context
+
+# Stores are reused across calls so their rollup caches stay warm; a rollup
+# rewritten by another process (telemetry_ingest.py) is re-read on next use
+_stores: Dict[str, SensorStore] = {}
+
+
+def get_sensor_store(state: Optional[Dict[str, Any]] = None) -> Optional[SensorStore]:
+    """Return the configured cultivation data store, if any"""
+    root = (state or {}).get("sensor_store_dir") or os.getenv("OPERATIONS_DATA_DIR")
+    if not root:
+        return None
+    if root not in _stores:
+        _stores[root] = SensorStore(root)
+    return _stores[root]
+
+
+@traced("agent.operations")
 def run_operations(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Operations agent implementation"""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return {"answer": "OPENAI_API_KEY not configured", "meta": {"agent": "operations", "tokens": 0}}
-    
-    client = OpenAI(api_key=api_key)
+
     context = "You are the Operations Agent for Green Hill Canarias. Focus on operational efficiency and execution."
-    
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            messages=[
+        with span("prompt_assembly"):
+            store = get_sensor_store(state)
+            if store:
+                summary = operations_summary(store)
+                if summary:
+                    context += f"\n\nCultivation sensor and batch data:\n{summary}"
+            alerts = recent_alerts_context(state)
+            if alerts:
+                context += f"\n\nRecent telemetry anomaly alerts:\n{alerts}"
+
+        result = complete(
+            "operations",
+            [
                 {"role": "system", "content": context},
                 {"role": "user", "content": question}
-            ]
+            ],
+            model="gpt-4o-mini",
+            temperature=0.3
         )
         return {
-            "answer": response.choices[0].message.content,
-            "meta": {"agent": "operations", "tokens": response.usage.total_tokens}
+            "answer": result["answer"],
+            "meta": {"agent": "operations", "tokens": result["tokens"]}
         }
     except Exception as e:
         return {"answer": f"Error: {str(e)}", "meta": {"agent": "operations", "tokens": 0}}
@@ -1,29 +1,62 @@
 """Risk Agent - Risk assessment and mitigation"""
 import os
 from typing import Dict, Any, Optional
-from openai import OpenAI
 
+from .llm import complete
+from .tracing import span, traced
+from .risk_engine import RiskRegister, simulate, format_summary
+
+
+def _risk_summary(state: Dict[str, Any]) -> Optional[str]:
+    """Run the Monte Carlo engine over the configured risk register, if any"""
+    if state.get("risk_register"):
+        register = RiskRegister.from_dict(state["risk_register"])
+    elif os.getenv("RISK_REGISTER_PATH"):
+        register = RiskRegister.from_file(os.getenv("RISK_REGISTER_PATH"))
+    else:
+        return None
+
+    result = simulate(
+        register,
+        paths=int(state.get("risk_paths", os.getenv("RISK_MC_PATHS", "100000"))),
+        confidence=float(state.get("risk_confidence", os.getenv("RISK_MC_CONFIDENCE", "0.95"))),
+        seed=int(state.get("risk_seed", os.getenv("RISK_MC_SEED", "42"))),
+    )
+    return format_summary(result)
+
+
+@traced("agent.risk")
 def run_risk(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Risk agent implementation"""
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         return {"answer": "OPENAI_API_KEY not configured", "meta": {"agent": "risk", "tokens": 0}}
-    
-    client = OpenAI(api_key=api_key)
+
+    state = state or {}
     context = "You are the Risk Management Agent for Green Hill Canarias. Identify, assess, and mitigate risks."
-    
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.2,
-            messages=[
+        with span("prompt_assembly"):
+            summary = _risk_summary(state)
+            if summary:
+                context += f"\n\nQuantitative risk register results:\n{summary}"
+
+        result = complete(
+            "risk",
+            [
                 {"role": "system", "content": context},
                 {"role": "user", "content": question}
-            ]
+            ],
+            model="gpt-4o-mini",
+            temperature=0.2
         )
+        answer = result["answer"]
+        if summary:
+            with span("post_processing"):
+                answer += f"\n\n---\n{summary}"
         return {
-            "answer": response.choices[0].message.content,
-            "meta": {"agent": "risk", "tokens": response.usage.total_tokens}
+            "answer": answer,
+            "meta": {"agent": "risk", "tokens": result["tokens"]}
         }
     except Exception as e:
         return {"answer": f"Error: {str(e)}", "meta": {"agent": "risk", "tokens": 0}}
@@ -0,0 +1,267 @@
+"""Risk Engine - Risk register model and parallel Monte Carlo simulation"""
+import os
+import json
+import math
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+# Paths simulated per task; fixed so results do not depend on worker count
+CHUNK_PATHS = 100_000
+# Paths drawn per vectorized batch inside a task
+BATCH_PATHS = 25_000
+# Below this many paths the process pool costs more than it saves
+PARALLEL_THRESHOLD = 200_000
+
+DISTRIBUTIONS = ("triangular", "lognormal", "normal", "uniform", "fixed")
+
+
+def _validate_risk(risk: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a single risk register entry"""
+    if "name" not in risk:
+        raise ValueError("Risk entry is missing 'name'")
+    probability = float(risk.get("probability", 1.0))
+    if not 0.0 <= probability <= 1.0:
+        raise ValueError(f"Risk '{risk['name']}': probability must be between 0 and 1")
+    impact = dict(risk.get("impact", {}))
+    dist = impact.get("dist", "triangular")
+    if dist not in DISTRIBUTIONS:
+        raise ValueError(f"Risk '{risk['name']}': unknown impact distribution '{dist}'")
+    impact["dist"] = dist
+    return {"name": str(risk["name"]), "probability": probability, "impact": impact}
+
+
+class RiskRegister:
+    """Risks with occurrence probabilities, impact distributions and correlations.
+
+    Each risk is a dict such as::
+
+        {"name": "Crop disease", "probability": 0.15,
+         "impact": {"dist": "triangular", "low": 20000, "mode": 50000, "high": 150000}}
+
+    ``correlations`` is an optional list of ``[name_a, name_b, rho]`` triples
+    applied to risk occurrence through a Gaussian copula.
+    """
+
+    def __init__(self, risks: List[Dict[str, Any]], correlations: Optional[List[List[Any]]] = None):
+        if not risks:
+            raise ValueError("Risk register is empty")
+        self.risks = [_validate_risk(r) for r in risks]
+        self.names = [r["name"] for r in self.risks]
+        index = {name: i for i, name in enumerate(self.names)}
+
+        n = len(self.risks)
+        corr = np.eye(n)
+        for name_a, name_b, rho in correlations or []:
+            i, j = index[name_a], index[name_b]
+            corr[i, j] = corr[j, i] = float(rho)
+        try:
+            self.cholesky = np.linalg.cholesky(corr)
+        except np.linalg.LinAlgError:
+            raise ValueError("Risk correlation matrix is not positive definite")
+        self.correlated = not np.allclose(corr, np.eye(n))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RiskRegister":
+        """Build a register from ``{"risks": [...], "correlations": [...]}``"""
+        return cls(data.get("risks", []), data.get("correlations"))
+
+    @classmethod
+    def from_file(cls, path: str) -> "RiskRegister":
+        """Load a register from a JSON file"""
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Plain data shipped to worker processes"""
+        return {
+            "probabilities": [r["probability"] for r in self.risks],
+            "impacts": [r["impact"] for r in self.risks],
+            "cholesky": self.cholesky.tolist(),
+            "correlated": self.correlated,
+        }
+
+
+def _draw_impacts(rng: np.random.Generator, impact: Dict[str, Any], size: int) -> np.ndarray:
+    """Vectorized impact draws for one risk"""
+    dist = impact["dist"]
+    if dist == "triangular":
+        low, high = float(impact["low"]), float(impact["high"])
+        mode = float(impact.get("mode", (low + high) / 2))
+        if low == high:
+            return np.full(size, low)
+        return rng.triangular(low, mode, high, size)
+    if dist == "lognormal":
+        # Parameterized by the mean and standard deviation of the impact itself
+        mean, sd = float(impact["mean"]), float(impact["sd"])
+        sigma2 = math.log(1.0 + (sd / mean) ** 2)
+        return rng.lognormal(math.log(mean) - sigma2 / 2, math.sqrt(sigma2), size)
+    if dist == "normal":
+        draws = rng.normal(float(impact["mean"]), float(impact["sd"]), size)
+        return np.maximum(draws, 0.0)
+    if dist == "uniform":
+        return rng.uniform(float(impact["low"]), float(impact["high"]), size)
+    return np.full(size, float(impact["value"]))
+
+
+def _simulate_chunk(payload: Dict[str, Any], paths: int, seed: np.random.SeedSequence,
+                    tail_size: int) -> Dict[str, Any]:
+    """Simulate one chunk of paths in vectorized batches.
+
+    Only running sums plus the ``tail_size`` worst paths are kept, so memory
+    does not grow with the number of batches.
+    """
+    rng = np.random.default_rng(seed)
+    probabilities = np.asarray(payload["probabilities"])
+    thresholds = np.array([NormalDist().inv_cdf(p) if 0 < p < 1 else (math.inf if p >= 1 else -math.inf)
+                           for p in probabilities])
+    cholesky = np.asarray(payload["cholesky"])
+    n = len(probabilities)
+
+    totals = []
+    occur_count = np.zeros(n)
+    occur_total = np.zeros(n)
+    risk_loss_sum = np.zeros(n)
+    tail_totals = np.empty(0)
+    tail_losses = np.empty((0, n))
+
+    remaining = paths
+    while remaining > 0:
+        size = min(BATCH_PATHS, remaining)
+        remaining -= size
+
+        z = rng.standard_normal((size, n))
+        if payload["correlated"]:
+            z = z @ cholesky.T
+        occurs = z < thresholds
+
+        losses = np.zeros((size, n))
+        for i, impact in enumerate(payload["impacts"]):
+            hit = np.flatnonzero(occurs[:, i])
+            if hit.size:
+                losses[hit, i] = _draw_impacts(rng, impact, hit.size)
+        total = losses.sum(axis=1)
+
+        totals.append(total)
+        occur_count += occurs.sum(axis=0)
+        occur_total += total @ occurs
+        risk_loss_sum += losses.sum(axis=0)
+
+        # Keep the worst paths seen so far for tail attribution
+        tail_totals = np.concatenate([tail_totals, total])
+        tail_losses = np.concatenate([tail_losses, losses])
+        if tail_totals.size > tail_size:
+            keep = np.argpartition(tail_totals, -tail_size)[-tail_size:]
+            tail_totals, tail_losses = tail_totals[keep], tail_losses[keep]
+
+    return {
+        "totals": np.concatenate(totals),
+        "occur_count": occur_count,
+        "occur_total": occur_total,
+        "risk_loss_sum": risk_loss_sum,
+        "tail_totals": tail_totals,
+        "tail_losses": tail_losses,
+    }
+
+
+def simulate(register: RiskRegister, paths: int = 100_000, confidence: float = 0.95,
+             seed: int = 42, workers: Optional[int] = None, top: int = 5) -> Dict[str, Any]:
+    """Run a Monte Carlo simulation over the register.
+
+    Work is split into fixed-size chunks seeded from one ``SeedSequence``, so
+    the same seed gives the same results whether chunks run in-process or
+    across a process pool. Returns expected loss, VaR/CVaR at ``confidence``,
+    tornado sensitivities and the top tail contributors.
+    """
+    if paths <= 0:
+        raise ValueError("paths must be positive")
+    if not 0.0 < confidence < 1.0:
+        raise ValueError("confidence must be between 0 and 1")
+
+    payload = register.to_payload()
+    n_chunks = math.ceil(paths / CHUNK_PATHS)
+    chunk_sizes = [CHUNK_PATHS] * (n_chunks - 1) + [paths - CHUNK_PATHS * (n_chunks - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tail_size = max(1, math.ceil(paths * (1.0 - confidence)))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, n_chunks)
+
+    if workers > 1 and paths >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_chunk, [payload] * n_chunks, chunk_sizes,
+                                    seeds, [tail_size] * n_chunks))
+    else:
+        results = [_simulate_chunk(payload, size, s, tail_size)
+                   for size, s in zip(chunk_sizes, seeds)]
+
+    totals = np.concatenate([r["totals"] for r in results])
+    occur_count = sum(r["occur_count"] for r in results)
+    occur_total = sum(r["occur_total"] for r in results)
+    risk_loss_sum = sum(r["risk_loss_sum"] for r in results)
+
+    tail_totals = np.concatenate([r["tail_totals"] for r in results])
+    tail_losses = np.concatenate([r["tail_losses"] for r in results])
+    keep = np.argpartition(tail_totals, -tail_size)[-tail_size:]
+    tail_totals, tail_losses = tail_totals[keep], tail_losses[keep]
+
+    var = float(np.quantile(totals, confidence))
+    cvar = float(tail_totals.mean())
+    grand_total = float(totals.sum())
+
+    # Tornado: expected total loss when each risk does / does not occur
+    tornado = []
+    for i, name in enumerate(register.names):
+        hits = occur_count[i]
+        misses = paths - hits
+        # A risk that always (or never) occurs has no swing
+        high = occur_total[i] / hits if hits else grand_total / paths
+        low = (grand_total - occur_total[i]) / misses if misses else grand_total / paths
+        swing = high - low
+        tornado.append({"name": name, "low": float(low), "high": float(high), "swing": float(swing)})
+    tornado.sort(key=lambda t: abs(t["swing"]), reverse=True)
+
+    tail_contribution = tail_losses.mean(axis=0)
+    contributors = [
+        {
+            "name": name,
+            "expected_loss": float(risk_loss_sum[i] / paths),
+            "tail_loss": float(tail_contribution[i]),
+            "tail_share": float(tail_contribution[i] / cvar) if cvar else 0.0,
+        }
+        for i, name in enumerate(register.names)
+    ]
+    contributors.sort(key=lambda c: c["tail_loss"], reverse=True)
+
+    return {
+        "paths": paths,
+        "confidence": confidence,
+        "seed": seed,
+        "expected_loss": float(totals.mean()),
+        "std_loss": float(totals.std()),
+        "var": var,
+        "cvar": cvar,
+        "tornado": tornado,
+        "top_contributors": contributors[:top],
+    }
+
+
+def format_summary(result: Dict[str, Any]) -> str:
+    """Render a simulation result as a compact text block for prompts and answers"""
+    pct = int(round(result["confidence"] * 100))
+    lines = [
+        f"Monte Carlo ({result['paths']:,} paths, seed {result['seed']}):",
+        f"- Expected loss: {result['expected_loss']:,.0f}",
+        f"- VaR {pct}%: {result['var']:,.0f}",
+        f"- CVaR {pct}%: {result['cvar']:,.0f}",
+        "Tornado (expected loss if risk does not occur / occurs):",
+    ]
+    for t in result["tornado"]:
+        lines.append(f"- {t['name']}: {t['low']:,.0f} / {t['high']:,.0f} (swing {t['swing']:,.0f})")
+    lines.append("Top tail contributors:")
+    for c in result["top_contributors"]:
+        lines.append(f"- {c['name']}: {c['tail_loss']:,.0f} ({c['tail_share']:.0%} of CVaR)")
+    return "\n".join(lines)
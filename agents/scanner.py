@@ -0,0 +1,360 @@
+"""Scanner - Multi-pattern PII, licence and regulated-term scanning and redaction"""
+import os
+import re
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple
+
+try:
+    import ahocorasick  # pyahocorasick, optional C implementation
+except ImportError:
+    ahocorasick = None
+
+# Longest match we guarantee to find across chunk boundaries
+OVERLAP = 256
+CHUNK_SIZE = 1 << 20
+
+# Redacted before any text leaves the process
+PII_PATTERNS = {
+    "EMAIL": r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
+    "IBAN": r"\b[A-Z]{2}\d{2}(?:[ ]?[A-Z0-9]{4}){3,7}(?:[ ]?[A-Z0-9]{1,4})?\b",
+    "CARD": r"\b(?:\d[ -]?){12,18}\d\b",
+    "DNI": r"\b\d{8}[-\s]?[A-HJ-NP-TV-Z]\b",
+    "NIE": r"\b[XYZ][-\s]?\d{7}[-\s]?[A-HJ-NP-TV-Z]\b",
+    # International numbers (+34 / 0034 ...) anywhere; bare national numbers only after
+    # a phone keyword, so amounts like "812 345 678 seeds" or "750.000.000" are left alone
+    "PHONE": (r"(?P<ctx>\b(?:tel[eé]fono|tel|tlf|tfno|phone|m[oó]vil|mobile|cell|whatsapp|fax)\b\.?\W{0,4})?"
+              r"(?P<pii>(?<![\w+.,])(?:\+|00)[1-9]\d{0,2}[\s.-]?(?:\d[\s.-]?){6,12}\d\b"
+              r"|(?(ctx)[6-9]\d{2}[\s.-]?\d{3}[\s.-]?\d{3}\b|(?!)))"),
+    # Only after an address keyword, so version strings like "10.0.0.1" pass through
+    "IPV4": (r"\b(?:ip(?:v4)?(?:\s+address)?|address|addr|direcci[oó]n(?:\s+ip)?|host|server|servidor|gateway)"
+             r"\W{0,4}(?P<pii>\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b)"),
+}
+
+# Licence and permit references; flagged and redacted
+LICENCE_PATTERNS = {
+    # Either an explicit number marker, or an identifier mixing letters and digits:
+    # "permit no. 2025-114" and "licence ES-AEM-0042" match, "permit 2025 renewal" does not
+    "LICENCE": (r"\b(?:licen[cs]e|licencia|permit|autorizaci[oó]n)\s*"
+                r"(?:(?:no\.?|n[ºo°]\.?|n[uú]m(?:ero)?\.?|number|#)\s*[A-Z]{0,6}[-/]?\d[\w/-]{3,}"
+                r"|(?=[\w/-]*[A-Z])(?=[\w/-]*\d)[A-Z0-9][\w/-]{4,})"),
+    "AEMPS_REF": r"\bAEMPS[-/ ]?\d[\w/-]{2,}",
+}
+
+# Flagged for the compliance agent, never redacted
+DEFAULT_REGULATED_TERMS = [
+    "cannabis", "marijuana", "hemp", "THC", "CBD", "tetrahydrocannabinol", "cannabidiol",
+    "narcotic", "psychotropic", "controlled substance", "Schedule I", "Single Convention",
+    "AEMPS", "EU-GMP", "GMP", "GACP", "GDP", "export licence", "import licence",
+    "Ley 17/1967", "Real Decreto", "medicinal cannabis", "pharmacovigilance",
+    "batch release", "certificate of analysis", "pesticide residue", "heavy metals",
+]
+
+
+def _luhn(digits: str) -> bool:
+    total, parity = 0, len(digits) % 2
+    for i, ch in enumerate(digits):
+        d = int(ch)
+        if i % 2 == parity:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+_DNI_LETTERS = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+# Numeric PII only ever matches around a run of digits
+NUMERIC_KINDS = {"IBAN", "CARD", "DNI", "NIE", "PHONE", "IPV4"}
+_NUMERIC_CANDIDATE = re.compile(r"\d[\d .\-/]{5,}")
+CONTEXT_WINDOW = 32
+
+# Words that introduce a licence reference; found by the Aho-Corasick pass
+LICENCE_KEYWORDS = {"licence", "license", "licencia", "permit", "autorización", "autorizacion", "aemps"}
+
+
+def _valid(kind: str, text: str) -> bool:
+    """Checksum validation to keep false positives out of redaction"""
+    if kind == "CARD":
+        digits = re.sub(r"\D", "", text)
+        return 13 <= len(digits) <= 19 and _luhn(digits)
+    if kind in ("DNI", "NIE"):
+        raw = re.sub(r"[-\s]", "", text.upper())
+        number = raw[:-1].replace("X", "0").replace("Y", "1").replace("Z", "2")
+        return _DNI_LETTERS[int(number) % 23] == raw[-1]
+    return True
+
+
+class AhoCorasick:
+    """Case-insensitive multi-term matcher, one pass over the text for all terms.
+
+    Uses the ``pyahocorasick`` C extension when installed and a pure-Python
+    automaton otherwise.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms = sorted({t.strip() for t in terms if t.strip()}, key=str.lower)
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for term in self.terms:
+                self._automaton.add_word(term.lower(), (len(term), term))
+            if self.terms:
+                self._automaton.make_automaton()
+            return
+
+        self._automaton = None
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for term in self.terms:
+            node = 0
+            for ch in term.lower():
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(term)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield ``(start, end, term)`` for whole-word occurrences"""
+        lowered = text.lower()
+        if self._automaton is not None:
+            if not self.terms:
+                return
+            matches = ((end + 1 - length, end + 1, term)
+                       for end, (length, term) in self._automaton.iter(lowered))
+        else:
+            matches = self._iter_python(lowered)
+        for start, end, term in matches:
+            before = lowered[start - 1] if start > 0 else " "
+            after = lowered[end] if end < len(lowered) else " "
+            if not before.isalnum() and not after.isalnum():
+                yield start, end, term
+
+    def _iter_python(self, lowered: str) -> Iterator[Tuple[int, int, str]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for term in out[node]:
+                yield i + 1 - len(term), i + 1, term
+
+
+def _load_terms() -> List[str]:
+    path = os.getenv("REGULATED_TERMS_FILE")
+    if path and os.path.exists(path):
+        with open(path, "r") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return DEFAULT_REGULATED_TERMS
+
+
+def _merge_windows(windows: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _word_end(text: str, pos: int, limit: int = 64) -> int:
+    """Move ``pos`` forward to a word boundary so ``\\b`` at a window end is genuine"""
+    stop = min(len(text), pos + limit)
+    while pos < stop and (text[pos].isalnum() or text[pos] in "_-/."):
+        pos += 1
+    return pos
+
+
+class Scanner:
+    """Precompiled PII/licence regex set plus an Aho-Corasick regulated-term matcher.
+
+    The detailed regexes are expensive per character, so they only run inside
+    candidate windows found by cheap passes: runs of digits for numeric PII,
+    ``@`` for e-mail, and licence keywords picked up by the same Aho-Corasick
+    pass that finds regulated terms. Patterns without a trigger scan the whole text.
+    """
+
+    def __init__(self, terms: Optional[Iterable[str]] = None,
+                 extra_patterns: Optional[Dict[str, str]] = None):
+        patterns = {**PII_PATTERNS, **LICENCE_PATTERNS, **(extra_patterns or {})}
+        self._patterns = {kind: re.compile(p, re.IGNORECASE) for kind, p in patterns.items()}
+        self._regulated = {t.lower(): t for t in (_load_terms() if terms is None else terms)}
+        self._terms = AhoCorasick(set(self._regulated) | LICENCE_KEYWORDS)
+
+    def _windows(self, text: str, keyword_hits: List[int]) -> Dict[str, List[Tuple[int, int]]]:
+        windows: Dict[str, List[Tuple[int, int]]] = {}
+        # Wide enough on the left to take in a context keyword ("tel.:", "IP address")
+        numeric = [(max(m.start() - CONTEXT_WINDOW, 0), _word_end(text, m.end()))
+                   for m in _NUMERIC_CANDIDATE.finditer(text)]
+        email = []
+        i = text.find("@")
+        while i != -1:
+            email.append((max(i - 64, 0), _word_end(text, i + 1, 255)))
+            i = text.find("@", i + 1)
+        licence = [(start, _word_end(text, min(start + 64, len(text)))) for start in keyword_hits]
+        for kind in self._patterns:
+            if kind in NUMERIC_KINDS:
+                windows[kind] = numeric
+            elif kind == "EMAIL":
+                windows[kind] = email
+            elif kind in LICENCE_PATTERNS:
+                windows[kind] = licence
+            else:
+                windows[kind] = [(0, len(text))]
+        return {kind: _merge_windows(w) for kind, w in windows.items()}
+
+    def findings(self, text: str, offset: int = 0) -> List[Dict[str, Any]]:
+        """All PII/licence matches and regulated terms in ``text``"""
+        found = []
+        keyword_hits = []
+        for start, end, term in self._terms.finditer(text):
+            key = term.lower()
+            if key in LICENCE_KEYWORDS:
+                keyword_hits.append(start)
+            if key in self._regulated:
+                found.append({"kind": "REGULATED", "start": offset + start, "end": offset + end,
+                              "text": text[start:end], "term": self._regulated[key], "redact": False})
+
+        for kind, windows in self._windows(text, keyword_hits).items():
+            pattern = self._patterns[kind]
+            for lo, hi in windows:
+                for m in pattern.finditer(text, lo, hi):
+                    # Patterns with a context prefix mark the part to redact as ``pii``
+                    group = "pii" if "pii" in pattern.groupindex else 0
+                    if _valid(kind, m.group(group)):
+                        found.append({"kind": kind, "start": offset + m.start(group), "end": offset + m.end(group),
+                                      "text": m.group(group), "redact": True})
+        found.sort(key=lambda f: (f["start"], -f["end"]))
+        return found
+
+    def redact(self, text: str) -> str:
+        """Replace PII and licence matches with ``[KIND]`` placeholders"""
+        return self._redact(text, self.findings(text))
+
+    @staticmethod
+    def _redact(text: str, findings: List[Dict[str, Any]], offset: int = 0) -> str:
+        parts, pos = [], 0
+        for f in findings:
+            if not f["redact"]:
+                continue
+            start, end = f["start"] - offset, f["end"] - offset
+            if start < pos:
+                # Overlapping match: widen the previous redaction instead of leaking its tail
+                pos = max(pos, end)
+                continue
+            parts.append(text[pos:start])
+            parts.append(f"[{f['kind']}]")
+            pos = end
+        parts.append(text[pos:])
+        return "".join(parts)
+
+    def scan_stream(self, chunks: Iterable[str], redact: bool = False) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Scan text arriving in chunks; yields ``(redacted_or_raw_text, findings)``.
+
+        The last ``OVERLAP`` characters of each buffer are held back so matches
+        that straddle a chunk boundary are found once and never split.
+        """
+        carry, offset = "", 0
+        chunks = iter(chunks)
+        done = False
+        while not done:
+            chunk = next(chunks, None)
+            done = chunk is None
+            buffer = carry + (chunk or "")
+            if not buffer:
+                continue
+            safe = len(buffer) if done else max(len(buffer) - OVERLAP, 0)
+            found = [f for f in self.findings(buffer, offset) if f["start"] - offset < safe]
+            cut = max([safe] + [f["end"] - offset for f in found])
+            emitted = buffer[:cut]
+            yield (self._redact(emitted, found, offset) if redact else emitted), found
+            carry, offset = buffer[cut:], offset + cut
+
+
+_default: Optional[Scanner] = None
+
+
+def get_scanner() -> Scanner:
+    """Process-wide scanner, compiled once"""
+    global _default
+    if _default is None:
+        _default = Scanner()
+    return _default
+
+
+def redact(text: str) -> str:
+    """Redact PII and licence numbers before text is sent to a model"""
+    if os.getenv("PII_REDACTION", "1").lower() in ("0", "false", "no", "off"):
+        return text
+    return get_scanner().redact(text)
+
+
+def regulated_terms(text: str) -> Counter:
+    """Regulated terms mentioned in ``text`` with their counts"""
+    return Counter(f["term"] for f in get_scanner().findings(text) if f["kind"] == "REGULATED")
+
+
+def _read_chunks(path: str, chunk_size: int) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def scan_file(path: str, redacted_path: Optional[str] = None, chunk_size: int = CHUNK_SIZE,
+              max_findings: int = 100) -> Dict[str, Any]:
+    """Stream one file through the scanner; optionally write a redacted copy"""
+    scanner = get_scanner()
+    counts: Counter = Counter()
+    terms: Counter = Counter()
+    sample: List[Dict[str, Any]] = []
+    out = open(redacted_path, "w", encoding="utf-8") if redacted_path else None
+    try:
+        for text, found in scanner.scan_stream(_read_chunks(path, chunk_size), redact=out is not None):
+            if out is not None:
+                out.write(text)
+            for f in found:
+                counts[f["kind"]] += 1
+                if f["kind"] == "REGULATED":
+                    terms[f["term"]] += 1
+                elif len(sample) < max_findings:
+                    sample.append({k: f[k] for k in ("kind", "start", "end")})
+    finally:
+        if out is not None:
+            out.close()
+    return {"path": path, "counts": dict(counts), "regulated_terms": dict(terms), "findings": sample}
+
+
+def scan_files(paths: List[str], redact_dir: Optional[str] = None,
+               workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Scan many files across a process pool (one file per task)"""
+    targets = [os.path.join(redact_dir, os.path.basename(p) + ".redacted") if redact_dir else None
+               for p in paths]
+    if redact_dir:
+        os.makedirs(redact_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        return [scan_file(p, t) for p, t in zip(paths, targets)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(scan_file, paths, targets))
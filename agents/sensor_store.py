@@ -0,0 +1,374 @@
+"""Sensor Store - Columnar time-series storage and rollups for cultivation data"""
+import os
+import re
+import math
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Iterable
+
+import numpy as np
+import pandas as pd
+
+HOUR = 3600
+DAY = 86400
+ROLLUPS = {"hourly": HOUR, "daily": DAY}
+ROLLUP_FIELDS = ("bucket", "count", "sum", "sumsq", "min", "max")
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def _to_epoch(value: Any) -> int:
+    """Convert a datetime, ISO string or number to epoch seconds (UTC)"""
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.timestamp())
+
+
+def _day(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+def vpd_kpa(temperature_c: Any, humidity_pct: Any) -> Any:
+    """Vapour pressure deficit in kPa from air temperature and relative humidity"""
+    temperature_c = np.asarray(temperature_c, dtype=np.float64)
+    svp = 0.6108 * np.exp(17.27 * temperature_c / (temperature_c + 237.3))
+    return svp * (1.0 - np.asarray(humidity_pct, dtype=np.float64) / 100.0)
+
+
+def _empty_rollup() -> Dict[str, np.ndarray]:
+    return {
+        "bucket": np.empty(0, dtype=np.int64),
+        "count": np.empty(0, dtype=np.int64),
+        "sum": np.empty(0),
+        "sumsq": np.empty(0),
+        "min": np.empty(0),
+        "max": np.empty(0),
+    }
+
+
+def _group(buckets: np.ndarray, values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Aggregate values per bucket with sorted reduceat (no Python loops)"""
+    order = np.argsort(buckets, kind="stable")
+    buckets, values = buckets[order], values[order]
+    keys, starts = np.unique(buckets, return_index=True)
+    return {
+        "bucket": keys,
+        "count": np.diff(np.append(starts, buckets.size)),
+        "sum": np.add.reduceat(values, starts),
+        "sumsq": np.add.reduceat(values * values, starts),
+        "min": np.minimum.reduceat(values, starts),
+        "max": np.maximum.reduceat(values, starts),
+    }
+
+
+def _merge(old: Dict[str, np.ndarray], new: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Merge a freshly grouped batch into an existing rollup"""
+    if old["bucket"].size == 0:
+        return new
+    keys = np.union1d(old["bucket"], new["bucket"])
+    merged = {
+        "bucket": keys,
+        "count": np.zeros(keys.size, dtype=np.int64),
+        "sum": np.zeros(keys.size),
+        "sumsq": np.zeros(keys.size),
+        "min": np.full(keys.size, np.inf),
+        "max": np.full(keys.size, -np.inf),
+    }
+    for part in (old, new):
+        idx = np.searchsorted(keys, part["bucket"])
+        merged["count"][idx] += part["count"]
+        merged["sum"][idx] += part["sum"]
+        merged["sumsq"][idx] += part["sumsq"]
+        merged["min"][idx] = np.minimum(merged["min"][idx], part["min"])
+        merged["max"][idx] = np.maximum(merged["max"][idx], part["max"])
+    return merged
+
+
+def _stamp(path: str) -> Optional[tuple]:
+    """(mtime, size) of a file, or None when it does not exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _finish(count: int, total: float, sumsq: float, lo: float, hi: float) -> Dict[str, Any]:
+    if count == 0:
+        return {"count": 0, "mean": None, "std": None, "min": None, "max": None}
+    mean = total / count
+    var = max(sumsq / count - mean * mean, 0.0)
+    return {"count": int(count), "mean": mean, "std": math.sqrt(var), "min": float(lo), "max": float(hi)}
+
+
+class SensorStore:
+    """Day/sensor partitioned columnar store with incremental hourly and daily rollups.
+
+    Layout under ``root``::
+
+        raw/<sensor>/<YYYY-MM-DD>.ts    int64 epoch seconds (append-only)
+        raw/<sensor>/<YYYY-MM-DD>.val   float64 readings (append-only)
+        rollups/<sensor>/hourly.npz     bucket, count, sum, sumsq, min, max
+        rollups/<sensor>/daily.npz
+        batches.csv                     batch_id, start, end, yield_g, ...
+
+    Raw partitions are read through ``np.memmap`` so range queries only touch
+    the pages they need; whole hours inside a range are answered from rollups.
+
+    With a ``detector`` (see ``anomaly.detector_from_env``) every appended
+    reading is also fed to streaming anomaly detection; its state is kept in
+    ``detector_state.npz`` next to the data.
+    """
+
+    def __init__(self, root: str, detector: Optional[Any] = None):
+        self.root = root
+        os.makedirs(os.path.join(root, "raw"), exist_ok=True)
+        os.makedirs(os.path.join(root, "rollups"), exist_ok=True)
+        # (sensor, rollup) -> (file mtime/size, arrays); reloaded when another process rewrites the file
+        self._rollup_cache: Dict[tuple, tuple] = {}
+        self.detector = detector
+
+    # Paths
+
+    @staticmethod
+    def _key(sensor: str) -> str:
+        """Sensor name as stored on disk and listed by ``sensors``"""
+        return _SAFE_NAME.sub("_", sensor)
+
+    def _sensor_dir(self, kind: str, sensor: str) -> str:
+        return os.path.join(self.root, kind, self._key(sensor))
+
+    def _rollup_path(self, sensor: str, name: str) -> str:
+        return os.path.join(self._sensor_dir("rollups", sensor), f"{name}.npz")
+
+    def sensors(self) -> List[str]:
+        """Sensors with stored data"""
+        return sorted(os.listdir(os.path.join(self.root, "raw")))
+
+    # Ingestion
+
+    def append(self, sensor: str, timestamps: Iterable[Any], values: Iterable[float],
+               save_state: bool = True) -> int:
+        """Append readings for one sensor, update its rollups and feed the detector"""
+        ts = np.asarray(timestamps)
+        if ts.dtype.kind not in "iu":
+            ts = np.array([_to_epoch(t) for t in ts], dtype=np.int64)
+        ts = ts.astype(np.int64, copy=False)
+        vals = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(vals)
+        ts, vals = ts[keep], vals[keep]
+        if ts.size == 0:
+            return 0
+
+        raw_dir = self._sensor_dir("raw", sensor)
+        os.makedirs(raw_dir, exist_ok=True)
+        days = ts // DAY
+        for day in np.unique(days):
+            mask = days == day
+            stem = os.path.join(raw_dir, _day(int(day) * DAY))
+            with open(stem + ".ts", "ab") as f:
+                ts[mask].tofile(f)
+            with open(stem + ".val", "ab") as f:
+                vals[mask].tofile(f)
+
+        os.makedirs(self._sensor_dir("rollups", sensor), exist_ok=True)
+        for name, width in ROLLUPS.items():
+            merged = _merge(self._load_rollup(sensor, name), _group(ts - ts % width, vals))
+            path = self._rollup_path(sensor, name)
+            # Replace atomically so readers in other processes never see a half-written file
+            with open(path + ".tmp", "wb") as f:
+                np.savez(f, **merged)
+            os.replace(path + ".tmp", path)
+            self._rollup_cache[(self._key(sensor), name)] = (_stamp(path), merged)
+
+        if self.detector is not None:
+            idx = np.repeat(self.detector.register([sensor]), ts.size)
+            self.detector.update_indices(idx, vals, ts.astype(np.float64))
+            if save_state:
+                self.save_detector_state()
+        return int(ts.size)
+
+    def save_detector_state(self) -> None:
+        if self.detector is not None:
+            self.detector.save(os.path.join(self.root, "detector_state.npz"))
+
+    def ingest_csv(self, path: str, timestamp_col: str = "timestamp", chunksize: int = 500_000) -> int:
+        """Ingest a CSV in long (timestamp, sensor, value) or wide (timestamp, <sensor>...) format"""
+        count = 0
+        for frame in pd.read_csv(path, chunksize=chunksize):
+            frame[timestamp_col] = pd.to_datetime(frame[timestamp_col], utc=True)
+            if {"sensor", "value"} <= set(frame.columns):
+                long = frame[[timestamp_col, "sensor", "value"]]
+            else:
+                long = frame.melt(id_vars=[timestamp_col], var_name="sensor", value_name="value")
+            epochs = long[timestamp_col].dt.as_unit("s").astype("int64").to_numpy()
+            long = long.assign(epoch=epochs)
+            for sensor, group in long.groupby("sensor", sort=False):
+                count += self.append(str(sensor), group["epoch"].to_numpy(),
+                                     pd.to_numeric(group["value"], errors="coerce").to_numpy(),
+                                     save_state=False)
+        self.save_detector_state()
+        return count
+
+    def ingest_batches_csv(self, path: str) -> int:
+        """Append batch records (batch_id, start, end, yield_g, ...) to the batch table"""
+        frame = pd.read_csv(path)
+        missing = {"batch_id", "yield_g"} - set(frame.columns)
+        if missing:
+            raise ValueError(f"Batch CSV is missing columns: {', '.join(sorted(missing))}")
+        target = os.path.join(self.root, "batches.csv")
+        frame.to_csv(target, mode="a", header=not os.path.exists(target), index=False)
+        return len(frame)
+
+    # Queries
+
+    def _load_rollup(self, sensor: str, name: str) -> Dict[str, np.ndarray]:
+        """Cached rollup, re-read when the file changed on disk (e.g. telemetry_ingest.py)"""
+        key = (self._key(sensor), name)
+        path = self._rollup_path(sensor, name)
+        stamp = _stamp(path)
+        cached = self._rollup_cache.get(key)
+        if cached is None or cached[0] != stamp:
+            if stamp is None:
+                rollup = _empty_rollup()
+            else:
+                with np.load(path) as data:
+                    rollup = {f: data[f] for f in ROLLUP_FIELDS}
+            cached = self._rollup_cache[key] = (stamp, rollup)
+        return cached[1]
+
+    def _raw(self, sensor: str, start: int, end: int) -> tuple:
+        """Memory-mapped raw readings in [start, end)"""
+        raw_dir = self._sensor_dir("raw", sensor)
+        ts_parts, val_parts = [], []
+        for day in range(start // DAY, (end - 1) // DAY + 1):
+            stem = os.path.join(raw_dir, _day(day * DAY))
+            if not os.path.exists(stem + ".ts") or os.path.getsize(stem + ".ts") == 0:
+                continue
+            ts = np.memmap(stem + ".ts", dtype=np.int64, mode="r")
+            vals = np.memmap(stem + ".val", dtype=np.float64, mode="r")
+            mask = (ts >= start) & (ts < end)
+            ts_parts.append(np.asarray(ts[mask]))
+            val_parts.append(np.asarray(vals[mask]))
+        if not ts_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate(ts_parts), np.concatenate(val_parts)
+
+    def aggregate(self, sensor: str, start: Any, end: Any) -> Dict[str, Any]:
+        """Count, mean, std, min and max over [start, end).
+
+        Whole days come from the daily rollup, whole hours at the edges from
+        the hourly rollup and only the partial hours at each end scan raw data.
+        """
+        start, end = _to_epoch(start), _to_epoch(end)
+        count, total, sumsq, lo, hi = 0, 0.0, 0.0, math.inf, -math.inf
+        if end <= start:
+            return _finish(count, total, sumsq, lo, hi)
+
+        hour_lo, hour_hi = -(-start // HOUR) * HOUR, end // HOUR * HOUR
+        day_lo, day_hi = -(-hour_lo // DAY) * DAY, hour_hi // DAY * DAY
+        if day_hi <= day_lo:
+            day_lo = day_hi = hour_lo
+
+        covered = []
+        if hour_hi > hour_lo:
+            covered = [("daily", day_lo, day_hi), ("hourly", hour_lo, day_lo), ("hourly", day_hi, hour_hi)]
+        for name, lo_b, hi_b in covered:
+            if hi_b <= lo_b:
+                continue
+            rollup = self._load_rollup(sensor, name)
+            i, j = np.searchsorted(rollup["bucket"], [lo_b, hi_b])
+            if j > i:
+                count += int(rollup["count"][i:j].sum())
+                total += float(rollup["sum"][i:j].sum())
+                sumsq += float(rollup["sumsq"][i:j].sum())
+                lo = min(lo, float(rollup["min"][i:j].min()))
+                hi = max(hi, float(rollup["max"][i:j].max()))
+
+        edges = [(start, hour_lo), (hour_hi, end)] if hour_hi > hour_lo else [(start, end)]
+        for lo_t, hi_t in edges:
+            if hi_t <= lo_t:
+                continue
+            _, vals = self._raw(sensor, lo_t, hi_t)
+            if vals.size:
+                count += int(vals.size)
+                total += float(vals.sum())
+                sumsq += float((vals * vals).sum())
+                lo = min(lo, float(vals.min()))
+                hi = max(hi, float(vals.max()))
+        return _finish(count, total, sumsq, lo, hi)
+
+    def rollup(self, sensor: str, start: Any, end: Any, freq: str = "hourly") -> pd.DataFrame:
+        """Per-bucket mean/min/max/count between start and end"""
+        rollup = self._load_rollup(sensor, freq)
+        i, j = np.searchsorted(rollup["bucket"], [_to_epoch(start), _to_epoch(end)])
+        count = rollup["count"][i:j]
+        return pd.DataFrame({
+            "bucket": pd.to_datetime(rollup["bucket"][i:j], unit="s", utc=True),
+            "count": count,
+            "mean": rollup["sum"][i:j] / np.maximum(count, 1),
+            "min": rollup["min"][i:j],
+            "max": rollup["max"][i:j],
+        })
+
+    def vpd(self, temperature_sensor: str, humidity_sensor: str, start: Any, end: Any,
+            freq: str = "hourly") -> pd.DataFrame:
+        """VPD per bucket, derived from the bucket means of temperature and humidity"""
+        temp = self.rollup(temperature_sensor, start, end, freq)[["bucket", "mean"]]
+        rh = self.rollup(humidity_sensor, start, end, freq)[["bucket", "mean"]]
+        joined = temp.merge(rh, on="bucket", suffixes=("_temp", "_rh"))
+        joined["vpd_kpa"] = vpd_kpa(joined["mean_temp"], joined["mean_rh"])
+        return joined[["bucket", "vpd_kpa"]]
+
+    def batch_yields(self) -> pd.DataFrame:
+        """Yield per batch, with yield per m² when an area column is present"""
+        path = os.path.join(self.root, "batches.csv")
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=["batch_id", "yield_g"])
+        frame = pd.read_csv(path).groupby("batch_id", as_index=False).last()
+        if "area_m2" in frame.columns:
+            frame["yield_g_per_m2"] = frame["yield_g"] / frame["area_m2"]
+        return frame
+
+    def latest(self, sensor: str) -> Optional[int]:
+        """Epoch of the newest hourly bucket for a sensor"""
+        rollup = self._load_rollup(sensor, "hourly")
+        return int(rollup["bucket"][-1]) + HOUR if rollup["bucket"].size else None
+
+
+def operations_summary(store: SensorStore, windows: Optional[Dict[str, int]] = None,
+                       max_batches: int = 10) -> str:
+    """Compact text summary of recent sensor statistics and batch yields"""
+    windows = windows or {"24h": DAY, "30d": 30 * DAY}
+    lines = []
+    sensors = store.sensors()
+    for sensor in sensors:
+        end = store.latest(sensor)
+        if end is None:
+            continue
+        parts = []
+        for label, width in windows.items():
+            stats = store.aggregate(sensor, end - width, end)
+            if stats["count"]:
+                parts.append(f"{label} mean {stats['mean']:.2f} (min {stats['min']:.2f}, max {stats['max']:.2f}, n={stats['count']})")
+        if parts:
+            lines.append(f"- {sensor}: " + "; ".join(parts))
+
+    temps = [s for s in sensors if s.endswith("temperature")]
+    for temp in temps:
+        humidity = temp[: -len("temperature")] + "humidity"
+        if humidity in sensors:
+            end = store.latest(temp)
+            frame = store.vpd(temp, humidity, end - DAY, end)
+            if len(frame):
+                lines.append(f"- {temp[: -len('temperature')] or ''}VPD 24h mean: {frame['vpd_kpa'].mean():.2f} kPa")
+
+    batches = store.batch_yields()
+    if len(batches):
+        lines.append("Batch yields:")
+        for row in batches.tail(max_batches).to_dict("records"):
+            extra = f", {row['yield_g_per_m2']:.0f} g/m²" if "yield_g_per_m2" in row else ""
+            lines.append(f"- {row['batch_id']}: {row['yield_g']:.0f} g{extra}")
+    return "\n".join(lines)
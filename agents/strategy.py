@@ -3,8 +3,12 @@ import os
 import json
 from datetime import datetime
 from typing import Dict, Any, Optional
-from openai import OpenAI
 
+from .llm import complete
+from .tracing import traced
+
+
+@traced("agent.strategy")
 def run_strategy(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Strategy agent implementation"""
     api_key = os.getenv("OPENAI_API_KEY")
@@ -14,7 +18,6 @@ def run_strategy(question: str, state: Optional[Dict[str, Any]] = None) -> Dict[
             "meta": {"agent": "strategy", "tokens": 0}
         }
     
-    client = OpenAI(api_key=api_key)
     state = state or {}
     
     context = f"""You are the Strategy Agent for Green Hill Canarias.
@@ -22,17 +25,18 @@ Current phase: {state.get('phase', 'Phase 1')}
 Provide strategic insights and planning guidance."""
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            temperature=0.3,
-            messages=[
+        result = complete(
+            "strategy",
+            [
                 {"role": "system", "content": context},
                 {"role": "user", "content": question}
-            ]
+            ],
+            model="gpt-4o-mini",
+            temperature=0.3
         )
         return {
-            "answer": response.choices[0].message.content,
-            "meta": {"agent": "strategy", "tokens": response.usage.total_tokens}
+            "answer": result["answer"],
+            "meta": {"agent": "strategy", "tokens": result["tokens"]}
         }
     except Exception as e:
         return {"answer": f"Error: {str(e)}", "meta": {"agent": "strategy", "tokens": 0}}
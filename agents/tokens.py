@@ -0,0 +1,362 @@
+"""Tokens - Local token counting, context limits and token budgets
+
+Prompts are measured locally before any network call. With ``tiktoken``
+installed the model's real encoding is used; otherwise a conservative
+approximation with the same ``encode``/``decode`` interface stands in.
+Encodings and the counts of repeated texts (system prompts) are cached.
+"""
+import os
+import re
+import time
+import threading
+import contextvars
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+MODEL_CONTEXT_LIMITS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_LIMIT = 128000
+DEFAULT_OUTPUT_RESERVE = 1024
+# Chat formatting overhead per message and for priming the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+OVERFLOW_POLICIES = ("reject", "truncate", "chunk")
+TRUNCATION_MARKER = "\n[... truncated ...]\n"
+PART_HEADER = "[Part {index} of {count}]\n"
+# Below this many tokens per part, chunking is refused rather than fanned out
+MIN_CHUNK_TOKENS = 256
+DEFAULT_MAX_CHUNKS = 16
+# Final request of a chunked completion: merges the per-part answers
+COMBINE_PROMPT = ("The request below was too long to answer at once, so it was split into {count} parts "
+                  "and each part was answered on its own.\n\nRequest (excerpt):\n{excerpt}\n\n"
+                  "Answers per part:\n{answers}\n\n"
+                  "Combine these into one answer to the whole request: merge overlapping points, "
+                  "resolve contradictions and do not mention the parts.")
+COMBINE_EXCERPT_TOKENS = 512
+
+
+class AdmissionError(ValueError):
+    """A request was refused locally (context limit or token budget)"""
+
+
+class ApproximateEncoding:
+    """Stand-in for a tiktoken encoding: splits like cl100k and caps pieces at 4 chars.
+
+    It over-counts slightly compared to real BPE, which is the safe side for
+    admission decisions.
+    """
+
+    name = "approx_cl100k"
+    _pattern = re.compile(r"""'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+""")
+
+    def encode(self, text: str) -> List[str]:
+        tokens = []
+        for piece in self._pattern.findall(text):
+            tokens.extend(piece[i:i + 4] for i in range(0, len(piece), 4))
+        return tokens
+
+    def decode(self, tokens: List[Any]) -> str:
+        return "".join(tokens)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Encoding for a model (cached); falls back to the approximation without tiktoken"""
+    try:
+        import tiktoken
+    except ImportError:
+        return ApproximateEncoding()
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base" if model.startswith(("gpt-4o", "gpt-4.1", "o")) else "cl100k_base")
+
+
+@lru_cache(maxsize=4096)
+def _count(text: str, model: str) -> int:
+    return len(get_encoding(model).encode(text))
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    if not text:
+        return 0
+    # Only short, repeated texts (system prompts, templates) are worth caching
+    if len(text) <= 20000:
+        return _count(text, model)
+    return len(get_encoding(model).encode(text))
+
+
+def count_messages(messages: List[Dict[str, str]], model: str = "gpt-4o-mini") -> int:
+    """Prompt tokens of a chat request, including message formatting overhead"""
+    total = TOKENS_PER_REPLY
+    for message in messages:
+        total += TOKENS_PER_MESSAGE
+        total += count_tokens(message.get("content") or "", model)
+        if message.get("name"):
+            total += count_tokens(message["name"], model) + 1
+    return total
+
+
+def context_limit(model: str) -> int:
+    if os.getenv("LLM_CONTEXT_LIMIT"):
+        return int(os.getenv("LLM_CONTEXT_LIMIT"))
+    for prefix, limit in sorted(MODEL_CONTEXT_LIMITS.items(), key=lambda item: -len(item[0])):
+        if model.startswith(prefix):
+            return limit
+    return DEFAULT_CONTEXT_LIMIT
+
+
+def output_reserve() -> int:
+    """Tokens kept free for the answer when checking the context limit"""
+    return int(os.getenv("LLM_OUTPUT_RESERVE", DEFAULT_OUTPUT_RESERVE))
+
+
+def truncate_text(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> str:
+    """Keep the head and tail of ``text`` within ``max_tokens``"""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    keep = max(max_tokens - count_tokens(TRUNCATION_MARKER, model), 0)
+    head = keep * 3 // 4
+    return encoding.decode(tokens[:head]) + TRUNCATION_MARKER + encoding.decode(tokens[len(tokens) - (keep - head):])
+
+
+def split_text(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> List[str]:
+    """Cut ``text`` into consecutive pieces of at most ``max_tokens``"""
+    encoding = get_encoding(model)
+    tokens = encoding.encode(text)
+    step = max(max_tokens, 1)
+    return [encoding.decode(tokens[i:i + step]) for i in range(0, len(tokens), step)] or [""]
+
+
+class TokenBudget:
+    """Token allowance per key, over a sliding window or a lifetime.
+
+    Admission reserves the estimated tokens up front so concurrent requests
+    cannot overshoot together; the reservation is settled to the actual
+    usage when the request finishes.
+    """
+
+    def __init__(self, limit: int, window: Optional[float] = None, max_keys: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._usage: "OrderedDict[str, deque]" = OrderedDict()
+        self._totals: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, key: str, now: float) -> None:
+        events = self._usage[key]
+        while self.window is not None and events and events[0][0] < now - self.window:
+            self._totals[key] -= events.popleft()[1]
+
+    def used(self, key: str) -> int:
+        with self._lock:
+            if key not in self._usage:
+                return 0
+            self._expire(key, time.time())
+            return self._totals[key]
+
+    def reserve(self, key: str, tokens: int) -> Optional[List[Any]]:
+        """Reserve ``tokens`` for ``key``; returns a handle for :meth:`settle`, or None if over budget"""
+        with self._lock:
+            now = time.time()
+            if key not in self._usage:
+                self._usage[key] = deque()
+                self._totals[key] = 0
+                if len(self._usage) > self.max_keys:
+                    oldest, _ = self._usage.popitem(last=False)
+                    self._totals.pop(oldest, None)
+            self._usage.move_to_end(key)
+            self._expire(key, now)
+            if self._totals[key] + tokens > self.limit:
+                return None
+            event = [now, tokens]
+            self._usage[key].append(event)
+            self._totals[key] += tokens
+            return event
+
+    def settle(self, key: str, event: List[Any], tokens: int) -> None:
+        """Replace a reservation with the tokens actually used"""
+        with self._lock:
+            if key in self._usage and any(e is event for e in self._usage[key]):
+                self._totals[key] += tokens - event[1]
+                event[1] = tokens
+
+
+_session: contextvars.ContextVar = contextvars.ContextVar("digital_roots_token_session", default=None)
+
+
+@contextmanager
+def token_session(session_id: str):
+    """Charge completions made inside the block to ``session_id``"""
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+_budgets: Dict[Tuple[str, str], TokenBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def _budget(kind: str, name: str) -> Optional[TokenBudget]:
+    """Configured budget: LLM_SESSION_TOKEN_BUDGET (per session lifetime) or
+    LLM_AGENT_TOKEN_BUDGET[_<AGENT>] (per agent, per LLM_BUDGET_WINDOW seconds)"""
+    if kind == "session":
+        limit = os.getenv("LLM_SESSION_TOKEN_BUDGET")
+        window = None
+    else:
+        limit = os.getenv(f"LLM_AGENT_TOKEN_BUDGET_{name.upper()}") or os.getenv("LLM_AGENT_TOKEN_BUDGET")
+        window = float(os.getenv("LLM_BUDGET_WINDOW", "3600"))
+    if not limit or int(limit) <= 0:
+        return None
+    key = (kind, "*" if kind == "session" else name)
+    with _budgets_lock:
+        budget = _budgets.get(key)
+        if budget is None or budget.limit != int(limit) or budget.window != window:
+            budget = _budgets[key] = TokenBudget(int(limit), window)
+    return budget
+
+
+class Admission:
+    """Outcome of admission control for one completion"""
+
+    def __init__(self, requests: List[List[Dict[str, str]]], prompt_tokens: int, action: str):
+        self.requests = requests
+        self.prompt_tokens = prompt_tokens
+        self.action = action
+        self._charges: List[Tuple[TokenBudget, str, List[Any]]] = []
+        # Chunked requests: (original messages, chunked message index, tokens it may use)
+        self._source: Optional[Tuple[List[Dict[str, str]], int, int]] = None
+
+    def combine_request(self, answers: List[str], model: str) -> List[Dict[str, str]]:
+        """Request that merges the answers to a chunked request's parts into one answer"""
+        messages, index, room = self._source
+        excerpt = truncate_text(messages[index]["content"], min(COMBINE_EXCERPT_TOKENS, room // 4), model)
+        body = "\n\n".join(PART_HEADER.format(index=i, count=len(answers)) + answer
+                            for i, answer in enumerate(answers, 1))
+        fixed = count_tokens(COMBINE_PROMPT.format(count=len(answers), excerpt=excerpt, answers=""), model)
+        body = truncate_text(body, max(room - fixed - 2, 0), model)
+        return _replace(messages, index, COMBINE_PROMPT.format(count=len(answers), excerpt=excerpt, answers=body))
+
+    def settle(self, actual_tokens: Optional[int]) -> None:
+        """Replace reserved estimates with the real usage (None releases them)"""
+        for budget, key, event in self._charges:
+            budget.settle(key, event, actual_tokens or 0)
+        self._charges = []
+
+
+def admit(agent: str, messages: List[Dict[str, str]], model: str) -> Admission:
+    """Check a request against the model's context window and token budgets.
+
+    Oversize prompts follow LLM_OVERFLOW: ``reject`` (default), ``truncate``
+    (shorten the longest message) or ``chunk`` (split the longest message
+    into at most LLM_MAX_CHUNKS parts of at least MIN_CHUNK_TOKENS that are
+    sent as separate requests, plus one request that combines their answers;
+    see ``Admission.combine_request``). Budgets are charged for all of them.
+    Raises AdmissionError when the request cannot be admitted.
+    """
+    policy = os.getenv("LLM_OVERFLOW", "reject").lower()
+    if policy not in OVERFLOW_POLICIES:
+        raise ValueError(f"Unknown LLM_OVERFLOW policy '{policy}', expected one of {', '.join(OVERFLOW_POLICIES)}")
+    limit = context_limit(model)
+    reserve = output_reserve()
+    prompt_tokens = count_messages(messages, model)
+    requests = [messages]
+    action = "admitted"
+    source = None
+    combine_estimate = 0
+
+    if prompt_tokens + reserve > limit:
+        longest = max(range(len(messages)), key=lambda i: len(messages[i].get("content") or ""))
+        other = prompt_tokens - count_tokens(messages[longest].get("content") or "", model)
+        room = limit - reserve - other
+        if policy == "reject" or room <= 0:
+            raise AdmissionError(
+                f"Request rejected: prompt is {prompt_tokens:,} tokens but {model} allows "
+                f"{limit - reserve:,} with {reserve:,} reserved for the answer"
+            )
+        content = messages[longest]["content"]
+        if policy == "truncate":
+            requests = [_replace(messages, longest, truncate_text(content, room, model))]
+            action = "truncated"
+        else:
+            requests = _chunk(messages, longest, content, room, model)
+            action = "chunked"
+            source = (messages, longest, room)
+            # The combining request: the other messages, the part answers and its own answer
+            combine_estimate = other + min(room, reserve * len(requests)) + reserve
+        prompt_tokens = sum(count_messages(r, model) for r in requests)
+
+    admission = Admission(requests, prompt_tokens, action)
+    admission._source = source
+    estimate = prompt_tokens + reserve * len(requests) + combine_estimate
+    charges = [(_budget("agent", agent), agent, "agent")]
+    session_id = _session.get()
+    if session_id is not None:
+        charges.append((_budget("session", session_id), session_id, "session"))
+    for budget, key, kind in charges:
+        if budget is None:
+            continue
+        event = budget.reserve(key, estimate)
+        if event is None:
+            admission.settle(None)
+            raise AdmissionError(
+                f"Request rejected: {kind} token budget exhausted ({budget.used(key):,} of "
+                f"{budget.limit:,} used, this request needs about {estimate:,})"
+            )
+        admission._charges.append((budget, key, event))
+    return admission
+
+
+def max_chunks() -> int:
+    """Most parts one request may be split into (LLM_MAX_CHUNKS)"""
+    return int(os.getenv("LLM_MAX_CHUNKS", DEFAULT_MAX_CHUNKS))
+
+
+def _chunk(messages: List[Dict[str, str]], index: int, content: str, room: int,
+           model: str) -> List[List[Dict[str, str]]]:
+    """Split message ``index`` into numbered parts that each fit in ``room`` tokens"""
+    total = count_tokens(content, model)
+    limit = max_chunks()
+    count = 1
+    while True:
+        # The widest header for this many parts bounds every part's header
+        header = count_tokens(PART_HEADER.format(index=count, count=count), model)
+        # Cut points can re-encode a token or so longer, keep a little slack
+        part_room = room - header - 2
+        if part_room < MIN_CHUNK_TOKENS:
+            raise AdmissionError(
+                f"Request rejected: only {max(part_room, 0):,} tokens per part are left after the other "
+                f"messages and the answer reserve (at least {MIN_CHUNK_TOKENS} needed to chunk)"
+            )
+        needed = -(-total // part_room)
+        if needed > limit:
+            raise AdmissionError(
+                f"Request rejected: the prompt would need {needed} parts of {part_room:,} tokens "
+                f"(LLM_MAX_CHUNKS is {limit})"
+            )
+        if len(str(needed)) <= len(str(count)):
+            break
+        count = needed
+    parts = split_text(content, part_room, model)
+    return [_replace(messages, index, PART_HEADER.format(index=i, count=len(parts)) + part)
+            for i, part in enumerate(parts, 1)]
+
+
+def _replace(messages: List[Dict[str, str]], index: int, content: str) -> List[Dict[str, str]]:
+    updated = list(messages)
+    updated[index] = dict(messages[index], content=content)
+    return updated
@@ -0,0 +1,339 @@
+"""Tracing - Low-overhead span trees with head sampling and background export"""
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import functools
+import random
+import logging
+import threading
+import contextvars
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A timed operation inside a trace"""
+
+    __slots__ = ("trace", "id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[uuid.UUID], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.id = uuid.uuid4()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def sampled(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def event_ms(self) -> float:
+        """Milliseconds since the span started (e.g. for time to first token)"""
+        return (time.time_ns() - self.start_ns) / 1e6
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace.finish(self)
+
+
+class _NoopSpan:
+    """Returned for unsampled traces; every operation is a no-op"""
+
+    __slots__ = ("_token",)
+    sampled = False
+    attributes: Dict[str, Any] = {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def event_ms(self) -> float:
+        return 0.0
+
+    def __enter__(self) -> "_NoopSpan":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current_span.reset(self._token)
+
+
+class Trace:
+    """Spans sharing a trace id; exported as a unit once the root span ends"""
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self.id = uuid.uuid4()
+        self.spans: List[Span] = []
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def start(self, name: str, parent_id: Optional[uuid.UUID], attributes: Dict[str, Any]) -> Span:
+        with self._lock:
+            self.open += 1
+        return Span(self, name, parent_id, attributes)
+
+    def finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            self.open -= 1
+            done = self.open == 0
+        if done:
+            self.tracer.processor.submit(self)
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("digital_roots_span", default=None)
+
+
+class Tracer:
+    """Creates spans; the sampling decision is made once per trace at the root"""
+
+    def __init__(self, sample_rate: float = 1.0, processor: Optional["BatchProcessor"] = None):
+        self.sample_rate = sample_rate
+        self.processor = processor or BatchProcessor([])
+
+    def span(self, name: str, **attributes: Any):
+        parent = _current_span.get()
+        if parent is None:
+            if not self.processor.exporters or random.random() >= self.sample_rate:
+                return _NoopSpan()
+            return Trace(self).start(name, None, attributes)
+        if not parent.sampled:
+            return _NoopSpan()
+        return parent.trace.start(name, parent.id, attributes)
+
+
+def current_span():
+    """The active span, or a no-op span outside any trace"""
+    return _current_span.get() or _NoopSpan()
+
+
+class BatchProcessor:
+    """Hands finished traces to exporters on a background thread.
+
+    The request path only does a non-blocking ``put``; if the queue is full
+    the trace is dropped and counted rather than slowing the caller down.
+    """
+
+    def __init__(self, exporters: List[Any], max_queue: int = 2048, batch_size: int = 64,
+                 interval: float = 2.0):
+        self.exporters = exporters
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Trace]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, trace: Trace) -> None:
+        if not self.exporters:
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain(block=True)
+            if batch:
+                self._export(batch)
+
+    def _drain(self, block: bool) -> List[Trace]:
+        batch: List[Trace] = []
+        try:
+            batch.append(self._queue.get(block=block, timeout=self.interval if block else None))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _export(self, batch: List[Trace]) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(batch)
+            except Exception as e:
+                logger.warning("Trace exporter %s failed: %s", type(exporter).__name__, e)
+
+    def flush(self) -> None:
+        """Export everything still queued (called at interpreter exit)"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._export(batch)
+
+
+def _attr_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    return {
+        "traceId": span.trace.id.hex,
+        "spanId": span.id.hex[:16],
+        "parentSpanId": span.parent_id.hex[:16] if span.parent_id else "",
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": k, "value": _attr_value(v)} for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+
+
+def _resource_spans(batch: List[Trace]) -> Dict[str, Any]:
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "digital-roots"}}]},
+        "scopeSpans": [{
+            "scope": {"name": "digital_roots.agents"},
+            "spans": [_otlp_span(s) for trace in batch for s in trace.spans],
+        }],
+    }]}
+
+
+class FileExporter:
+    """Appends one OTLP/JSON ``resourceSpans`` document per line for offline analysis"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, batch: List[Trace]) -> None:
+        with open(self.path, "a") as f:
+            f.write(json.dumps(_resource_spans(batch)) + "\n")
+
+
+class OTLPHttpExporter:
+    """Posts OTLP/JSON to a collector (``<endpoint>/v1/traces``)"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.timeout = timeout
+
+    def export(self, batch: List[Trace]) -> None:
+        import requests
+
+        requests.post(self.url, json=_resource_spans(batch), timeout=self.timeout).raise_for_status()
+
+
+class LangSmithExporter:
+    """Sends span trees to LangSmith as runs (needs ``langsmith`` and ``LANGSMITH_API_KEY``)"""
+
+    def __init__(self, project: Optional[str] = None):
+        from langsmith import Client
+
+        self.client = Client()
+        self.project = project or os.getenv("LANGSMITH_PROJECT", "digital-roots")
+
+    def export(self, batch: List[Trace]) -> None:
+        runs = []
+        for trace in batch:
+            by_id = {s.id: s for s in trace.spans}
+            # LangSmith keys a trace by the id of its root run
+            root = next((s for s in trace.spans if s.parent_id is None), trace.spans[0])
+            for span in trace.spans:
+                chain, node = [], span
+                while node is not None:
+                    started = datetime.fromtimestamp(node.start_ns / 1e9, tz=timezone.utc)
+                    chain.append(f"{started:%Y%m%dT%H%M%S%f}Z{node.id}")
+                    node = by_id.get(node.parent_id)
+                runs.append({
+                    "id": span.id,
+                    "trace_id": root.id,
+                    "parent_run_id": span.parent_id,
+                    "dotted_order": ".".join(reversed(chain)),
+                    "name": span.name,
+                    "run_type": "llm" if span.name == "completion" else "chain",
+                    "start_time": datetime.fromtimestamp(span.start_ns / 1e9, tz=timezone.utc),
+                    "end_time": datetime.fromtimestamp(span.end_ns / 1e9, tz=timezone.utc),
+                    "inputs": {},
+                    "outputs": {},
+                    "extra": {"metadata": dict(span.attributes)},
+                    "error": span.error,
+                    "session_name": self.project,
+                })
+        self.client.batch_ingest_runs(create=runs)
+
+
+def _exporters_from_env() -> List[Any]:
+    exporters: List[Any] = []
+    if os.getenv("TRACE_FILE"):
+        exporters.append(FileExporter(os.getenv("TRACE_FILE")))
+    if os.getenv("TRACE_OTLP_ENDPOINT"):
+        exporters.append(OTLPHttpExporter(os.getenv("TRACE_OTLP_ENDPOINT")))
+    if os.getenv("TRACE_LANGSMITH", "").lower() in ("1", "true", "yes") and os.getenv("LANGSMITH_API_KEY"):
+        try:
+            exporters.append(LangSmithExporter())
+        except Exception as e:
+            logger.warning("LangSmith exporter disabled: %s", e)
+    return exporters
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Process-wide tracer configured from TRACE_* environment variables.
+
+    Tracing is off (all spans are no-ops) unless at least one exporter is
+    configured; TRACE_SAMPLE_RATE sets the fraction of questions traced.
+    """
+    global _tracer
+    if _tracer is None:
+        processor = BatchProcessor(_exporters_from_env())
+        _tracer = Tracer(float(os.getenv("TRACE_SAMPLE_RATE", "1.0")), processor)
+        atexit.register(processor.flush)
+    return _tracer
+
+
+def span(name: str, **attributes: Any):
+    """Start a span under the current one (or a new sampled/unsampled trace)"""
+    return get_tracer().span(name, **attributes)
+
+
+def traced(name: str):
+    """Decorator running the function inside a span (a trace root if none is active)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
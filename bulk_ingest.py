@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Bulk document ingestion for Digital Roots
+Walks directory trees and archives (.zip, .tar, .tar.gz) and feeds PDF, CSV,
+JSON and TXT files through the same content-addressed store as the Ingest
+tab. Parsing, chunking and scanning run across a process pool; the number
+of files in flight is bounded so a slow store applies back-pressure instead
+of filling memory. Progress is checkpointed so an interrupted run resumes
+where it stopped.
+
+Usage:
+    python bulk_ingest.py /data/sops /data/archive-2023.zip
+    python bulk_ingest.py /data/backfill --store /var/lib/digital_roots/ingest --workers 8
+"""
+import os
+import sys
+import json
+import time
+import tarfile
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional, Iterator, List, Tuple, Union
+
+from ingestion import DEFAULT_STORE_DIR, IngestStore, prepare
+
+EXTENSIONS = (".pdf", ".csv", ".json", ".txt")
+ARCHIVES = (".zip", ".tar", ".tar.gz", ".tgz")
+CHECKPOINT_NAME = "bulk_checkpoint.json"
+
+# (source name, path on disk or file bytes, (size, mtime) used for resume)
+Item = Tuple[str, Union[str, bytes], Tuple[int, float]]
+
+
+def default_workers() -> int:
+    """Cores this process may run on (respects CPU affinity / container limits)"""
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _wanted(name: str) -> bool:
+    return name.lower().endswith(EXTENSIONS)
+
+
+def _archive_items(path: str) -> Iterator[Item]:
+    """Members of an archive, read in order (sources are ``<archive>!<member>``)"""
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and _wanted(info.filename):
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                    yield f"{path}!{info.filename}", archive.read(info), (info.file_size, mtime)
+        return
+    # Streaming mode: compressed tars are read front to back exactly once
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            if member.isfile() and _wanted(member.name):
+                data = archive.extractfile(member).read()
+                yield f"{path}!{member.name}", data, (member.size, float(member.mtime))
+
+
+def discover(inputs: List[str]) -> Iterator[Item]:
+    """Files under the given directories, files and archives"""
+    for root in inputs:
+        if os.path.isfile(root):
+            if root.lower().endswith(ARCHIVES):
+                yield from _archive_items(root)
+            elif _wanted(root):
+                stat = os.stat(root)
+                yield root, root, (stat.st_size, stat.st_mtime)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                if name.lower().endswith(ARCHIVES):
+                    yield from _archive_items(path)
+                elif _wanted(name):
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, path, (stat.st_size, stat.st_mtime)
+
+
+def _scan(text: str) -> List[Dict[str, Any]]:
+    from agents.scanner import get_scanner
+
+    return get_scanner().findings(text)
+
+
+def parse(source: str, payload: Union[str, bytes], scan: bool) -> Tuple[str, Optional[Dict[str, Any]], float, Optional[str]]:
+    """Worker: read, hash, chunk and scan one file"""
+    start = time.perf_counter()
+    try:
+        if isinstance(payload, str):
+            with open(payload, "rb") as f:
+                payload = f.read()
+        prepared = prepare(source, payload, _scan if scan else None)
+        return source, prepared, time.perf_counter() - start, None
+    except Exception as e:
+        return source, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+
+class Checkpoint:
+    """Sources already stored, keyed to the (size, mtime) they had"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, List[float]] = {}
+        self._dirty = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = json.load(f)
+
+    def seen(self, source: str, stamp: Tuple[int, float]) -> bool:
+        return self.done.get(source) == list(stamp)
+
+    def mark(self, source: str, stamp: Tuple[int, float]) -> None:
+        self.done[source] = list(stamp)
+        self._dirty += 1
+
+    def save(self, force: bool = False) -> None:
+        if not self._dirty or (not force and self._dirty < 500):
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.done, f)
+        os.replace(tmp, self.path)
+        self._dirty = 0
+
+
+class Stage:
+    """Item count, bytes and busy time of one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy = 0.0
+
+    def add(self, seconds: float, size: int = 0) -> None:
+        self.items += 1
+        self.bytes += size
+        self.busy += seconds
+
+    def describe(self, elapsed: float, parallelism: int = 1) -> str:
+        rate = self.items / elapsed if elapsed else 0.0
+        mb = self.bytes / 2**20
+        capacity = self.items / self.busy * parallelism if self.busy else 0.0
+        return (f"{self.name:<8} {self.items:>8} files {mb:>9.1f} MB  {rate:>8.1f} files/s  "
+                f"(busy {self.busy:.1f}s, capacity ~{capacity:.0f} files/s)")
+
+
+def run(inputs: List[str], store: IngestStore, workers: int, checkpoint: Checkpoint,
+        scan: bool = True, max_inflight: Optional[int] = None, progress: float = 5.0) -> Dict[str, Any]:
+    """Discover -> parse (process pool) -> store, with bounded in-flight work"""
+    max_inflight = max_inflight or workers * 4
+    stages = {name: Stage(name) for name in ("discover", "parse", "store")}
+    totals = {"skipped": 0, "unchanged": 0, "changed": 0, "errors": 0, "chunks_processed": 0}
+    errors: List[str] = []
+    start = last_report = time.perf_counter()
+
+    def report(final: bool = False) -> None:
+        elapsed = time.perf_counter() - start
+        lines = [stages["discover"].describe(elapsed), stages["parse"].describe(elapsed, workers),
+                 stages["store"].describe(elapsed)]
+        status = ", ".join(f"{k} {v}" for k, v in totals.items())
+        print(("✅ Done" if final else "ℹ️ Progress") + f" after {elapsed:.1f}s: {status}", file=sys.stderr)
+        for line in lines:
+            print("   " + line, file=sys.stderr)
+
+    def store_result(future, stamps: Dict[str, Tuple[int, float]]) -> None:
+        source, prepared, seconds, error = future.result()
+        stamp = stamps.pop(source)
+        stages["parse"].add(seconds, stamp[0])
+        if error:
+            totals["errors"] += 1
+            errors.append(f"{source}: {error}")
+            return
+        began = time.perf_counter()
+        result = store.apply(source, prepared)
+        stages["store"].add(time.perf_counter() - began, stamp[0])
+        totals["unchanged" if result["unchanged"] else "changed"] += 1
+        totals["chunks_processed"] += result["processed"]
+        checkpoint.mark(source, stamp)
+        checkpoint.save()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = set()
+        stamps: Dict[str, Tuple[int, float]] = {}
+        items = discover(inputs)
+        while True:
+            began = time.perf_counter()
+            item = next(items, None)
+            if item is None:
+                break
+            source, payload, stamp = item
+            stages["discover"].add(time.perf_counter() - began, stamp[0])
+            if checkpoint.seen(source, stamp) or source in stamps:
+                totals["skipped"] += 1
+                continue
+            # Back-pressure: stop discovering until the store catches up
+            while len(inflight) >= max_inflight:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    store_result(future, stamps)
+            stamps[source] = stamp
+            inflight.add(pool.submit(parse, source, payload, scan))
+            if progress and time.perf_counter() - last_report >= progress:
+                report()
+                last_report = time.perf_counter()
+        for future in list(inflight):
+            store_result(future, stamps)
+
+    checkpoint.save(force=True)
+    report(final=True)
+    return dict(totals, elapsed_s=time.perf_counter() - start, failures=errors)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-ingest documents into the Digital Roots store")
+    parser.add_argument("inputs", nargs="+", help="Directories, files or archives (.zip, .tar, .tar.gz)")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR, help="Ingest store directory (INGEST_STORE_DIR)")
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Parser processes")
+    parser.add_argument("--max-inflight", type=int, help="Files parsed but not yet stored (default: 4 x workers)")
+    parser.add_argument("--checkpoint", help=f"Checkpoint file (default: <store>/{CHECKPOINT_NAME})")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and revisit every file")
+    parser.add_argument("--no-scan", action="store_true", help="Skip the PII/regulated-term scanner")
+    parser.add_argument("--progress", type=float, default=5.0, help="Seconds between progress reports (0 = off)")
+    args = parser.parse_args(argv)
+
+    store = IngestStore(args.store)
+    checkpoint_path = args.checkpoint or os.path.join(args.store, CHECKPOINT_NAME)
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+
+    try:
+        summary = run(args.inputs, store, args.workers, checkpoint, scan=not args.no_scan,
+                      max_inflight=args.max_inflight, progress=args.progress)
+    except KeyboardInterrupt:
+        checkpoint.save(force=True)
+        print("⚠️ Interrupted - progress checkpointed, rerun to resume", file=sys.stderr)
+        return 130
+    finally:
+        store.close()
+
+    for error in summary["failures"][:20]:
+        print(f"❌ {error}", file=sys.stderr)
+    print(f"✅ Ingested {summary['changed']} new/changed files ({summary['chunks_processed']} chunks processed), "
+          f"{summary['unchanged']} unchanged, {summary['skipped']} skipped by checkpoint, "
+          f"{summary['errors']} errors in {summary['elapsed_s']:.1f}s")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Document scanning for Digital Roots
+Streams text documents through the PII, licence and regulated-term scanner
+across a process pool, prints per-file counts and optionally writes redacted
+copies (e.g. before handing a document set to an external reviewer).
+
+Usage:
+    python document_scan.py /data/sops
+    python document_scan.py /data/contracts --redact-dir /data/contracts-redacted --json report.json
+"""
+import os
+import sys
+import json
+import argparse
+from collections import Counter
+from typing import Optional, List
+
+from agents.scanner import scan_files
+
+EXTENSIONS = (".txt", ".md", ".csv", ".json", ".log")
+
+
+def _text_files(inputs: List[str]) -> List[str]:
+    files = []
+    for root in inputs:
+        if os.path.isfile(root):
+            files.append(root)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            files.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                         if name.lower().endswith(EXTENSIONS))
+    return files
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scan documents for PII, licence numbers and regulated terms")
+    parser.add_argument("inputs", nargs="+", help="Text files or directories")
+    parser.add_argument("--redact-dir", help="Write <name>.redacted copies here")
+    parser.add_argument("--workers", type=int, help="Scanner processes (default: CPU count)")
+    parser.add_argument("--json", help="Write the full per-file report to this file")
+    args = parser.parse_args(argv)
+
+    paths = _text_files(args.inputs)
+    if not paths:
+        print("❌ No text files found", file=sys.stderr)
+        return 1
+    reports = scan_files(paths, args.redact_dir, args.workers)
+
+    totals: Counter = Counter()
+    for report in reports:
+        totals.update(report["counts"])
+        counts = ", ".join(f"{kind} {n}" for kind, n in sorted(report["counts"].items())) or "clean"
+        print(f"{report['path']}: {counts}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    summary = ", ".join(f"{kind} {n}" for kind, n in sorted(totals.items())) or "nothing found"
+    print(f"✅ Scanned {len(reports)} files: {summary}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Streaming evidence log export for Digital Roots
+Writes gzip-compressed NDJSON or Parquet in fixed-size chunks, so memory use
+does not depend on the size of the log.
+
+Usage:
+    python evidence_export.py evidence.jsonl -o evidence.ndjson.gz
+    python evidence_export.py evidence.jsonl -o evidence.parquet --since 2025-01-01 --agent finance
+"""
+import sys
+import json
+import gzip
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, Iterable, Iterator, List, Union, IO
+
+CHUNK_SIZE = 10_000
+FORMATS = ("ndjson.gz", "parquet")
+COLUMNS = ("timestamp", "agent", "question", "answer", "tokens")
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an ISO timestamp to a naive UTC datetime"""
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        try:
+            ts = datetime.fromisoformat(str(value))
+        except ValueError:
+            return None
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def parse_bound(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """Parse a --since/--until value; a bare date as ``end`` covers the whole day"""
+    if not value:
+        return None
+    ts = _parse_timestamp(value)
+    if ts is None:
+        raise ValueError(f"Invalid date: {value}")
+    if end and len(value) == 10:
+        ts += timedelta(days=1)
+    return ts
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream entries from a JSONL evidence log, skipping malformed lines"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def filter_entries(entries: Iterable[Dict[str, Any]], since: Optional[datetime] = None,
+                   until: Optional[datetime] = None,
+                   agents: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+    """Keep entries with ``since <= timestamp < until`` from the given agents"""
+    agents = set(agents) if agents else None
+    for entry in entries:
+        if agents is not None and entry.get("agent") not in agents:
+            continue
+        if since or until:
+            ts = _parse_timestamp(entry.get("timestamp", ""))
+            if ts is None or (since and ts < since) or (until and ts >= until):
+                continue
+        yield entry
+
+
+def export_ndjson_gz(entries: Iterable[Dict[str, Any]], output: Union[str, IO[bytes]],
+                     chunk_size: int = CHUNK_SIZE) -> int:
+    """Write entries as gzip-compressed NDJSON; returns the number written"""
+    count = 0
+    buffer: List[str] = []
+    with gzip.open(output, "wt", encoding="utf-8") as f:
+        for entry in entries:
+            buffer.append(json.dumps(entry, ensure_ascii=False, default=str))
+            if len(buffer) >= chunk_size:
+                f.write("\n".join(buffer) + "\n")
+                count += len(buffer)
+                buffer.clear()
+        if buffer:
+            f.write("\n".join(buffer) + "\n")
+            count += len(buffer)
+    return count
+
+
+def export_parquet(entries: Iterable[Dict[str, Any]], output: Union[str, IO[bytes]],
+                   chunk_size: int = CHUNK_SIZE) -> int:
+    """Write entries as Parquet, one row group per chunk; returns the number written"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("timestamp", pa.timestamp("us")),
+        ("agent", pa.string()),
+        ("question", pa.string()),
+        ("answer", pa.string()),
+        ("tokens", pa.int64()),
+        ("extra", pa.string()),
+    ])
+
+    def write(writer: "pq.ParquetWriter", rows: List[Dict[str, Any]]) -> None:
+        frame = pd.DataFrame({
+            "timestamp": pd.to_datetime([_parse_timestamp(r.get("timestamp", "")) for r in rows]),
+            "agent": [r.get("agent") for r in rows],
+            "question": [r.get("question") for r in rows],
+            "answer": [r.get("answer") for r in rows],
+            "tokens": pd.array([r.get("tokens") for r in rows], dtype="Int64"),
+            "extra": [json.dumps({k: v for k, v in r.items() if k not in COLUMNS}, default=str)
+                      if len(r.keys() - set(COLUMNS)) else None for r in rows],
+        })
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+    count = 0
+    rows: List[Dict[str, Any]] = []
+    with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+        for entry in entries:
+            rows.append(entry)
+            if len(rows) >= chunk_size:
+                write(writer, rows)
+                count += len(rows)
+                rows = []
+        if rows or count == 0:
+            write(writer, rows)
+            count += len(rows)
+    return count
+
+
+def export(entries: Iterable[Dict[str, Any]], output: Union[str, IO[bytes]], fmt: str = "ndjson.gz",
+           since: Optional[datetime] = None, until: Optional[datetime] = None,
+           agents: Optional[Iterable[str]] = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """Filter and export entries in the requested format"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(FORMATS)}")
+    selected = filter_entries(entries, since, until, agents)
+    if fmt == "parquet":
+        return export_parquet(selected, output, chunk_size)
+    return export_ndjson_gz(selected, output, chunk_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the Digital Roots evidence log")
+    parser.add_argument("inputs", nargs="+", help="JSONL evidence log(s), optionally .gz")
+    parser.add_argument("-o", "--output", required=True, help="Output file")
+    parser.add_argument("-f", "--format", choices=FORMATS,
+                        help="Output format (default: inferred from the output name)")
+    parser.add_argument("--since", help="Earliest timestamp or date (inclusive)")
+    parser.add_argument("--until", help="Latest timestamp (exclusive) or date (inclusive)")
+    parser.add_argument("--agent", action="append", help="Only export this agent (repeatable)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "ndjson.gz")
+
+    def entries() -> Iterator[Dict[str, Any]]:
+        for path in args.inputs:
+            yield from iter_jsonl(path)
+
+    try:
+        count = export(entries(), args.output, fmt, parse_bound(args.since),
+                       parse_bound(args.until, end=True), args.agent, args.chunk_size)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"❌ Export failed: {e}", file=sys.stderr)
+        return 1
+    print(f"✅ Exported {count} entries to {args.output} ({fmt})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Content-addressed document ingestion for Digital Roots
+Files are hashed as a whole and split into content-defined chunks that are
+hashed individually. A manifest records which chunks make up each source, so
+re-ingesting an updated document only processes the chunks that changed and
+retires the ones that disappeared; unchanged files are skipped outright.
+"""
+import os
+import json
+import zlib
+import sqlite3
+import socket
+import hashlib
+import tempfile
+import ipaddress
+import threading
+from datetime import datetime
+from urllib.parse import urlparse, urljoin
+from typing import Dict, Any, Optional, List, Tuple, Callable, Union
+
+DEFAULT_STORE_DIR = os.getenv("INGEST_STORE_DIR") or os.path.join(tempfile.gettempdir(), "digital_roots_ingest")
+
+# Chunk boundaries fall after lines whose checksum is 0 mod BOUNDARY_DIVISOR,
+# so an edit only moves the boundaries next to it
+MIN_CHUNK_CHARS = 1000
+MAX_CHUNK_CHARS = 8000
+BOUNDARY_DIVISOR = 16
+
+TEXT_EXTENSIONS = (".txt", ".md", ".csv", ".json", ".jsonl")
+
+# URL ingestion limits
+MAX_URL_BYTES = 50 * 2**20
+MAX_REDIRECTS = 5
+
+Chunk = Tuple[str, str]
+
+
+def file_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def extract_text(name: str, data: bytes) -> Optional[str]:
+    """Text content of a file, or None if the format is not supported"""
+    lower = name.lower()
+    if lower.endswith(".pdf"):
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return None
+        import io
+
+        reader = PdfReader(io.BytesIO(data))
+        # Form feeds keep page breaks as natural chunk boundaries
+        return "\f\n".join((page.extract_text() or "") for page in reader.pages)
+    if lower.endswith(TEXT_EXTENSIONS) or lower.startswith(("http://", "https://")):
+        return data.decode("utf-8", errors="replace")
+    return None
+
+
+def chunk_text(text: str, min_chars: int = MIN_CHUNK_CHARS, max_chars: int = MAX_CHUNK_CHARS,
+               divisor: int = BOUNDARY_DIVISOR) -> List[Chunk]:
+    """Split text into content-defined ``(hash, text)`` chunks on line boundaries"""
+    chunks: List[Chunk] = []
+    current: List[str] = []
+    size = 0
+
+    def emit() -> None:
+        nonlocal size
+        if current:
+            piece = "".join(current)
+            chunks.append((chunk_hash(piece), piece))
+            current.clear()
+            size = 0
+
+    for line in text.splitlines(keepends=True):
+        # Overlong lines are cut into fixed pieces so chunks stay bounded
+        while len(line) > max_chars:
+            emit()
+            piece, line = line[:max_chars], line[max_chars:]
+            chunks.append((chunk_hash(piece), piece))
+        current.append(line)
+        size += len(line)
+        if size >= max_chars or (size >= min_chars and zlib.crc32(line.encode("utf-8")) % divisor == 0):
+            emit()
+    emit()
+    return chunks
+
+
+def prepare(name: str, data: bytes, processor: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+    """Hash and chunk one file; pure, so it can run in a worker process.
+
+    With ``processor`` the chunks are also processed here, which lets bulk
+    loads spread that work across processes too.
+    """
+    text = extract_text(name, data)
+    chunks = chunk_text(text) if text is not None else None
+    prepared = {"file_hash": file_hash(data), "size": len(data), "chunks": chunks}
+    if processor is not None and chunks:
+        prepared["results"] = {h: json.dumps(processor(t), default=str) for h, t in dict(chunks).items()}
+    return prepared
+
+
+def check_url(url: str) -> None:
+    """Refuse URLs the app must not fetch on a user's behalf (SSRF).
+
+    Only http/https is allowed. With INGEST_URL_ALLOWLIST (comma-separated
+    hosts; ``.example.com`` also matches subdomains) the host must be listed;
+    either way every address it resolves to must be public, so loopback,
+    private, link-local (cloud metadata) and reserved ranges are blocked.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("Only http:// and https:// URLs can be ingested")
+    host = parsed.hostname.lower()
+    allowlist = [h.strip().lower() for h in os.getenv("INGEST_URL_ALLOWLIST", "").split(",") if h.strip()]
+    if allowlist and not any(host == h or (h.startswith(".") and host.endswith(h)) for h in allowlist):
+        raise ValueError(f"Host '{host}' is not in INGEST_URL_ALLOWLIST")
+    try:
+        infos = socket.getaddrinfo(host, parsed.port or (443 if parsed.scheme == "https" else 80))
+    except socket.gaierror as e:
+        raise ValueError(f"Cannot resolve host '{host}'") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"Host '{host}' resolves to a non-public address ({address})")
+
+
+def fetch_url(url: str, timeout: float = 30.0, max_bytes: int = MAX_URL_BYTES) -> bytes:
+    """Download a URL for ingestion; every redirect hop is checked with ``check_url``"""
+    import requests
+
+    for _ in range(MAX_REDIRECTS + 1):
+        check_url(url)
+        with requests.get(url, timeout=timeout, stream=True, allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers["Location"])
+                continue
+            response.raise_for_status()
+            data = bytearray()
+            for block in response.iter_content(65536):
+                data.extend(block)
+                if len(data) > max_bytes:
+                    raise ValueError(f"Response is larger than {max_bytes // 2**20} MB")
+            return bytes(data)
+    raise ValueError(f"More than {MAX_REDIRECTS} redirects")
+
+
+class IngestStore:
+    """SQLite manifest of ingested sources plus a content-addressed chunk table.
+
+    ``processor`` is called once per chunk the store has never seen (from any
+    source); its JSON-serialisable result is cached with the chunk and reused
+    whenever that content shows up again.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, processor: Optional[Callable[[str], Any]] = None):
+        self.root = root
+        self.processor = processor
+        os.makedirs(root, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "manifest.sqlite"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._db:
+            self._db.executescript("""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS sources (
+                    source TEXT PRIMARY KEY,
+                    file_hash TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    chunks TEXT,
+                    updated TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS sources_file_hash ON sources(file_hash);
+                CREATE TABLE IF NOT EXISTS chunks (
+                    hash TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    result TEXT,
+                    refs INTEGER NOT NULL DEFAULT 0
+                );
+            """)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT source FROM sources ORDER BY source")]
+
+    def manifest(self, source: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT file_hash, size, chunks, updated FROM sources WHERE source = ?",
+                                   (source,)).fetchone()
+        if row is None:
+            return None
+        return {"source": source, "file_hash": row[0], "size": row[1],
+                "chunks": json.loads(row[2]) if row[2] is not None else None, "updated": row[3]}
+
+    def ingest(self, source: str, data: Union[bytes, str]) -> Dict[str, Any]:
+        """Ingest (or re-ingest) one source and report what changed"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        digest = file_hash(data)
+        known = self.manifest(source)
+        if known and known["file_hash"] == digest:
+            return self._report(source, digest, unchanged=True, chunks=known["chunks"])
+        # Same bytes under another name: reuse its chunk list without re-chunking
+        with self._lock:
+            row = self._db.execute("SELECT size, chunks FROM sources WHERE file_hash = ? LIMIT 1",
+                                   (digest,)).fetchone()
+        if row is not None:
+            hashes = json.loads(row[1]) if row[1] is not None else None
+            try:
+                return self.apply(source, {"file_hash": digest, "size": row[0], "chunks": None}, hashes)
+            except LookupError:
+                # The other source was retired in the meantime
+                pass
+        return self.apply(source, prepare(source, data))
+
+    def apply(self, source: str, prepared: Dict[str, Any],
+              known_hashes: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Record a prepared file: process new chunks, retire dropped ones"""
+        known = self.manifest(source)
+        if known and known["file_hash"] == prepared["file_hash"]:
+            return self._report(source, prepared["file_hash"], unchanged=True, chunks=known["chunks"])
+
+        chunks = prepared["chunks"]
+        if chunks is None and known_hashes is None:
+            hashes = None
+            texts: Dict[str, str] = {}
+        elif chunks is None:
+            hashes, texts = known_hashes, {}
+        else:
+            hashes = [h for h, _ in chunks]
+            texts = dict(chunks)
+
+        # Decide outside the transaction which chunks look new, so processing
+        # (the slow part) runs without holding the lock
+        with self._lock:
+            old_set = set(self._source_chunks(source))
+            candidates = [h for h in dict.fromkeys(hashes or ()) if h not in old_set]
+            existing = self._existing(candidates)
+            candidates = [h for h in candidates if h not in existing]
+        if any(h not in texts for h in candidates):
+            raise LookupError(f"Chunk content for '{source}' is no longer stored")
+        precomputed = prepared.get("results") or {}
+        results = {h: precomputed[h] if h in precomputed else self._process(texts[h]) for h in candidates}
+
+        # The existence check and the reference counts are decided again in one
+        # write transaction: a chunk retired concurrently is re-inserted, not lost
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                old = self._source_chunks(source)
+                old_set = set(old)
+                new_set = set(hashes or ())
+                added = [h for h in dict.fromkeys(hashes or ()) if h not in old_set]
+                removed = [h for h in dict.fromkeys(old) if h not in new_set]
+                existing = self._existing(added)
+                fresh = [h for h in added if h not in existing]
+                if any(h not in texts for h in fresh):
+                    raise LookupError(f"Chunk content for '{source}' is no longer stored")
+                for h in fresh:
+                    if h not in results:
+                        results[h] = precomputed[h] if h in precomputed else self._process(texts[h])
+                self._db.executemany("INSERT INTO chunks (hash, text, result) VALUES (?, ?, ?)",
+                                     [(h, texts[h], results[h]) for h in fresh])
+                self._db.executemany("UPDATE chunks SET refs = refs + 1 WHERE hash = ?", [(h,) for h in added])
+                retired = self._release(removed)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sources (source, file_hash, size, chunks, updated) VALUES (?, ?, ?, ?, ?)",
+                    (source, prepared["file_hash"], prepared["size"],
+                     json.dumps(hashes) if hashes is not None else None, datetime.now().isoformat()))
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+
+        return self._report(source, prepared["file_hash"], unchanged=False, chunks=hashes,
+                            added=len(added), processed=len(fresh), removed=len(removed), retired=retired)
+
+    def _source_chunks(self, source: str) -> List[str]:
+        row = self._db.execute("SELECT chunks FROM sources WHERE source = ?", (source,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else []
+
+    def _existing(self, hashes: List[str]) -> set:
+        """Which of ``hashes`` are in the chunk table"""
+        existing = set()
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            existing.update(r[0] for r in self._db.execute(
+                f"SELECT hash FROM chunks WHERE hash IN ({','.join('?' * len(batch))})", batch))
+        return existing
+
+    def _process(self, text: str) -> Optional[str]:
+        if self.processor is None:
+            return None
+        return json.dumps(self.processor(text), default=str)
+
+    @staticmethod
+    def _report(source: str, digest: str, unchanged: bool, chunks: Optional[List[str]],
+                added: int = 0, processed: int = 0, removed: int = 0, retired: int = 0) -> Dict[str, Any]:
+        total = len(chunks) if chunks is not None else 0
+        return {
+            "source": source,
+            "file_hash": digest,
+            "unchanged": unchanged,
+            "supported": chunks is not None,
+            "chunks": total,
+            "added": added,
+            "processed": processed,
+            "reused": total - processed if not unchanged else total,
+            "removed": removed,
+            "retired": retired,
+        }
+
+    def remove(self, source: str) -> int:
+        """Forget a source; returns the number of chunks retired with it"""
+        with self._lock:
+            row = self._db.execute("SELECT chunks FROM sources WHERE source = ?", (source,)).fetchone()
+            if row is None:
+                return 0
+            hashes = list(dict.fromkeys(json.loads(row[0]))) if row[0] is not None else []
+            with self._db:
+                retired = self._release(hashes)
+                self._db.execute("DELETE FROM sources WHERE source = ?", (source,))
+        return retired
+
+    def _release(self, hashes: List[str]) -> int:
+        """Drop one reference from each chunk and delete those no source uses"""
+        self._db.executemany("UPDATE chunks SET refs = refs - 1 WHERE hash = ?", [(h,) for h in hashes])
+        return sum(self._db.execute("DELETE FROM chunks WHERE hash = ? AND refs <= 0", (h,)).rowcount
+                   for h in hashes)
+
+    def _chunk_rows(self, source: str, column: str) -> List[Any]:
+        known = self.manifest(source)
+        if not known or not known["chunks"]:
+            return []
+        hashes = known["chunks"]
+        values: Dict[str, Any] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                values.update(self._db.execute(
+                    f"SELECT hash, {column} FROM chunks WHERE hash IN ({','.join('?' * len(batch))})", batch))
+        return [values.get(h) for h in hashes]
+
+    def text(self, source: str) -> str:
+        """Reassembled text of an ingested source"""
+        return "".join(t or "" for t in self._chunk_rows(source, "text"))
+
+    def results(self, source: str) -> List[Any]:
+        """Cached processor results for each chunk of a source, in order"""
+        return [json.loads(r) if r is not None else None for r in self._chunk_rows(source, "result")]
+
+
+_stores: Dict[str, IngestStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_ingest_store(root: Optional[str] = None, processor: Optional[Callable[[str], Any]] = None) -> IngestStore:
+    """Shared store per directory (INGEST_STORE_DIR by default).
+
+    Cached chunk results belong to the store's processor, so asking for the
+    same directory with a different processor raises ValueError; passing no
+    processor returns the existing store as is.
+    """
+    root = root or DEFAULT_STORE_DIR
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = IngestStore(root, processor)
+        elif processor is not None and store.processor != processor:
+            raise ValueError(f"Ingest store '{root}' is already open with a different processor")
+    return store
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Concurrent-session load generator for the Digital Roots Streamlit app
+Starts one ``streamlit run`` server - what a single replica container runs -
+against a local mock OpenAI backend and drives N simultaneous browser
+sessions over its websocket, the same protocol the frontend speaks. Reports
+rerun throughput and latency percentiles as seen by the clients, plus the
+server process's CPU use and memory growth per connected session, at each
+concurrency level, to size replicas in docker-compose.yml.
+
+Every session connects and loads the page before the clock starts. Server
+CPU and RSS come from /proc (Linux); against an already running replica
+(--url) only client-side latency is measured. The clients share the host
+with the server, so on small machines run with --url from another host.
+
+Tabs are rendered server-side on every rerun, so a "tab switch" in a script
+is an interaction with a widget on that tab (each one is a full rerun).
+
+Usage:
+    python load_test.py --levels 1,2,4,8 --iterations 3
+    python load_test.py --levels 4,16 --latency 0.5 --slo-ms 2000 --json results.json
+    python load_test.py --url http://replica-1:8501 --levels 8,16
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Optional, List, Tuple
+
+try:
+    from websockets.sync.client import connect as ws_connect  # ships with Streamlit >= 1.50
+except ImportError:
+    ws_connect = None
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "streamlit_app.py")
+
+# Each script is a list of (action, argument) steps replayed by one session;
+# options are picked by the label a user sees
+SCRIPTS: Dict[str, List[Tuple[str, Any]]] = {
+    "analyst": [
+        ("chat", ("Finance Agent", "What is our cash runway under the current ZEC rate?")),
+        ("chat", ("Risk Agent", "Which risks dominate the tail of the loss distribution?")),
+        ("evidence_page", 1),
+        ("export", "ndjson.gz"),
+    ],
+    "executive": [
+        ("chat", ("CEO Digital Twin", "Summarise this week's operational priorities.")),
+        ("language", "Español"),
+        ("chat", ("Strategy Agent", "How should we phase the second greenhouse?")),
+        ("language", "English"),
+        ("chat", ("Operations Agent", "Any anomalies in the grow rooms today?")),
+    ],
+    "auditor": [
+        ("chat", ("Compliance Agent", "Does our labelling meet EU-GMP requirements?")),
+        ("evidence_page", 1),
+        ("export", "parquet"),
+        ("chat", ("Market Agent", "How are wholesale flower prices trending?")),
+    ],
+}
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Minimal ``/v1/chat/completions`` endpoint (streaming and non-streaming)"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        try:
+            self._respond()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early (cancelled or hedged attempt)
+            self.close_connection = True
+
+    def _respond(self):
+        server: "MockOpenAI" = self.server.mock
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        server.count()
+        model = body.get("model", "gpt-4o-mini")
+        words = [f"token{i} " for i in range(server.tokens)]
+        usage = {"prompt_tokens": 50, "completion_tokens": server.tokens, "total_tokens": 50 + server.tokens}
+        time.sleep(server.latency * random.uniform(0.8, 1.2))
+
+        if not body.get("stream"):
+            payload = json.dumps({
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(words)}}],
+                "usage": usage,
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+        for word in words:
+            data = dict(chunk, choices=[{"index": 0, "delta": {"content": word}, "finish_reason": None}])
+            self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.write(f"data: {json.dumps(dict(chunk, choices=[], usage=usage))}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class MockOpenAI:
+    """Local OpenAI-compatible backend with a fixed time to first token"""
+
+    def __init__(self, latency: float = 0.2, tokens: int = 40, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.tokens = tokens
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _MockHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openai", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def __enter__(self) -> "MockOpenAI":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StreamlitServer:
+    """``streamlit run`` in a child process, with /proc-based CPU and RSS readings"""
+
+    def __init__(self, app_path: str = APP_PATH, env: Optional[Dict[str, str]] = None,
+                 startup_timeout: float = 60.0):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._command = [sys.executable, "-m", "streamlit", "run", app_path,
+                         "--server.headless", "true", "--server.address", "127.0.0.1",
+                         "--server.port", str(self.port), "--server.fileWatcherType", "none",
+                         "--browser.gatherUsageStats", "false"]
+        self._env = env
+        self._startup_timeout = startup_timeout
+        self._process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "StreamlitServer":
+        self._process = subprocess.Popen(self._command, env=self._env, stdin=subprocess.DEVNULL,
+                                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + self._startup_timeout
+        while time.time() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"streamlit exited with status {self._process.returncode}")
+            try:
+                with urllib.request.urlopen(self.url + "/_stcore/health", timeout=1.0):
+                    return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError(f"streamlit did not become healthy within {self._startup_timeout:.0f}s")
+
+    def __exit__(self, *exc) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+    def rss_bytes(self) -> Optional[int]:
+        try:
+            with open(f"/proc/{self._process.pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self._process.pid}/stat") as f:
+                # Fields after the parenthesised command name; utime and stime are 14 and 15
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        except (OSError, ValueError, IndexError):
+            return None
+
+
+def _pick(options: List[str], label: str) -> str:
+    """The option a user would click for ``label`` (options carry icons/flags)"""
+    for option in options:
+        if option == label or option.endswith(" " + label):
+            return option
+    raise LookupError(f"No option '{label}' in {options}")
+
+
+class Session:
+    """One simulated browser tab replaying a script over the app's websocket.
+
+    Like the frontend, every rerun request carries the current value of every
+    widget the user has touched; button clicks are sent for one rerun only.
+    """
+
+    def __init__(self, script: List[Tuple[str, Any]], url: str, timeout: float = 120.0):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        self._back, self._forward, self._state = BackMsg, ForwardMsg, WidgetState
+        self.script = script
+        self.timeout = timeout
+        stream = url.rstrip("/").replace("http", "ws", 1) + "/_stcore/stream"
+        self.ws = ws_connect(stream, subprotocols=["streamlit"], max_size=None, open_timeout=timeout)
+        self.widgets: Dict[str, Tuple[str, Any]] = {}
+        self.values: Dict[str, Any] = {}
+        self.latencies: List[float] = []
+        self.errors: List[str] = []
+
+    def close(self) -> None:
+        self.ws.close()
+
+    def _rerun(self, trigger: Optional[str] = None, record: bool = True) -> None:
+        msg = self._back()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.widget_states.widgets.extend(self.values.values())
+        if trigger is not None:
+            msg.rerun_script.widget_states.widgets.append(self._state(id=trigger, trigger_value=True))
+        start = time.perf_counter()
+        self.ws.send(msg.SerializeToString())
+        widgets = {}
+        while True:
+            reply = self._forward()
+            reply.ParseFromString(self.ws.recv(timeout=self.timeout))
+            kind = reply.WhichOneof("type")
+            if kind == "delta" and reply.delta.WhichOneof("type") == "new_element":
+                element = reply.delta.new_element
+                element_type = element.WhichOneof("type")
+                proto = getattr(element, element_type)
+                if element_type == "exception":
+                    self.errors.append(proto.message)
+                elif hasattr(proto, "id") and hasattr(proto, "label"):
+                    widgets[proto.label] = (element_type, proto)
+            elif kind == "script_finished":
+                if reply.script_finished == self._forward.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors.append("Script failed to compile")
+                break
+        if record:
+            self.latencies.append(time.perf_counter() - start)
+        self.widgets = widgets
+
+    def _widget(self, label: str, element_type: str) -> Any:
+        found = self.widgets.get(label)
+        if found is None or found[0] != element_type:
+            raise LookupError(f"No {element_type} labelled '{label}'")
+        return found[1]
+
+    def _set(self, label: str, element_type: str, **value: Any) -> None:
+        proto = self._widget(label, element_type)
+        self.values[proto.id] = self._state(id=proto.id, **value)
+
+    def _select(self, label: str, option: str) -> None:
+        self._set(label, "selectbox", string_value=_pick(list(self._widget(label, "selectbox").options), option))
+
+    def step(self, action: str, arg: Any) -> None:
+        if action == "chat":
+            agent, question = arg
+            self._select("Select Agent:", agent)
+            self._set("Ask your question:", "text_area", string_value=question)
+            self._rerun(trigger=self._widget("Send", "button").id)
+        elif action == "language":
+            self._select("Language:", arg)
+            self._rerun()
+        elif action == "evidence_page":
+            try:
+                self._set("Page:", "number_input", int_value=arg)
+            except LookupError:
+                # Only one page of evidence so far: the tab itself is the interaction
+                pass
+            self._rerun()
+        elif action == "export":
+            try:
+                self._select("Format:", arg)
+                self._rerun(trigger=self._widget("Export Evidence Log", "button").id)
+            except LookupError:
+                self._rerun()
+        else:
+            raise ValueError(f"Unknown script action '{action}'")
+
+    def open(self) -> None:
+        """Initial page load, as when the tab is opened (not measured)"""
+        self._rerun(record=False)
+
+    def play(self, iterations: int) -> None:
+        try:
+            for _ in range(iterations):
+                for action, arg in self.script:
+                    self.step(action, arg)
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_level(url: str, sessions: int, iterations: int, scripts: Optional[List[str]] = None,
+              timeout: float = 120.0, server: Optional[StreamlitServer] = None) -> Dict[str, Any]:
+    """Run ``sessions`` concurrent browser sessions against one app server"""
+    names = scripts or list(SCRIPTS)
+    rss_before = server.rss_bytes() if server else None
+    barrier = threading.Barrier(sessions + 1)
+    clients: List[Optional[Session]] = [None] * sessions
+    startup_errors: List[str] = []
+
+    def user(i: int) -> None:
+        try:
+            clients[i] = Session(SCRIPTS[names[i % len(names)]], url, timeout)
+            clients[i].open()
+        except Exception as e:
+            startup_errors.append(f"Session {i} failed to open: {type(e).__name__}: {e}")
+            barrier.abort()
+            return
+        try:
+            barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            return
+        clients[i].play(iterations)
+
+    threads = [threading.Thread(target=user, args=(i,), name=f"session-{i}", daemon=True)
+               for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    try:
+        # Released once every session has loaded the page
+        barrier.wait(timeout)
+    except threading.BrokenBarrierError:
+        if not startup_errors:
+            startup_errors.append("Sessions did not all open within the timeout")
+    cpu_before = server.cpu_seconds() if server else None
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    cpu_after = server.cpu_seconds() if server else None
+    # Sessions are still connected, so RSS includes their session state
+    rss_after = server.rss_bytes() if server else None
+    for client in clients:
+        if client is not None:
+            client.close()
+
+    latencies = [lat for c in clients if c for lat in c.latencies]
+    errors = startup_errors + [err for c in clients if c for err in c.errors]
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    measured = rss_before is not None and rss_after is not None
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed_s": round(elapsed, 3),
+        "reruns_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 1),
+        "cpu_s": round(cpu, 2) if cpu is not None else None,
+        # Cores the server process kept busy
+        "cpu_util": round(cpu / elapsed, 2) if cpu is not None and elapsed else None,
+        "cpu_ms_per_rerun": round(cpu / len(latencies) * 1000, 1) if cpu is not None and latencies else None,
+        "rss_mb": round(rss_after / 2**20, 1) if measured else None,
+        "rss_growth_mb_per_session": round((rss_after - rss_before) / sessions / 2**20, 2) if measured else None,
+    }
+
+
+def format_report(results: List[Dict[str, Any]], slo_ms: Optional[float] = None) -> str:
+    columns = [("sessions", "sessions"), ("reruns", "reruns"), ("errors", "errors"),
+               ("reruns_per_s", "reruns/s"), ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"),
+               ("p99_ms", "p99 ms"), ("cpu_util", "server cpu"), ("cpu_ms_per_rerun", "cpu ms/rerun"),
+               ("rss_mb", "server MB"), ("rss_growth_mb_per_session", "MB/session")]
+
+    def cell(value: Any) -> str:
+        return "-" if value is None else str(value)
+
+    widths = [max(len(title), *(len(cell(r[key])) for r in results)) for key, title in columns]
+    lines = ["  ".join(title.rjust(w) for (_, title), w in zip(columns, widths))]
+    for r in results:
+        lines.append("  ".join(cell(r[key]).rjust(w) for (key, _), w in zip(columns, widths)))
+    for r in results:
+        if r["first_error"]:
+            lines.append(f"⚠️ {r['sessions']} sessions: {r['errors']} errors, first: {r['first_error']}")
+    if slo_ms is not None:
+        within = [r["sessions"] for r in results if r["p95_ms"] <= slo_ms and not r["errors"]]
+        if within:
+            lines.append(f"✅ Up to {max(within)} concurrent sessions on one app server keep p95 rerun "
+                         f"latency within {slo_ms:.0f} ms")
+        else:
+            lines.append(f"❌ No tested level keeps p95 rerun latency within {slo_ms:.0f} ms")
+    return "\n".join(lines)
+
+
+def warm_up(url: str, timeout: float = 120.0) -> List[str]:
+    """Play every script once so imports and first-use caches are not billed to level 1"""
+    errors = []
+    for script in SCRIPTS.values():
+        session = Session(script, url, timeout)
+        try:
+            session.open()
+            session.play(1)
+        finally:
+            session.close()
+        errors.extend(session.errors)
+    return errors
+
+
+def _run_levels(url: str, levels: List[int], args: argparse.Namespace,
+                server: Optional[StreamlitServer] = None,
+                mock: Optional[MockOpenAI] = None) -> List[Dict[str, Any]]:
+    errors = warm_up(url, args.timeout)
+    if errors:
+        print(f"⚠️ Warm-up: {len(errors)} errors, first: {errors[0]}", file=sys.stderr)
+    results = []
+    for level in levels:
+        print(f"ℹ️ Running {level} concurrent session(s)...", file=sys.stderr)
+        before = mock.requests if mock else 0
+        result = run_level(url, level, args.iterations, args.script, args.timeout, server)
+        if mock:
+            result["backend_requests"] = mock.requests - before
+        results.append(result)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test streamlit_app.py with concurrent sessions")
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=2, help="Script repetitions per session")
+    parser.add_argument("--script", action="append", choices=sorted(SCRIPTS),
+                        help="Scripts to assign round-robin (repeatable, default: all)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Mock backend time to first token (s)")
+    parser.add_argument("--tokens", type=int, default=40, help="Completion tokens per mock response")
+    parser.add_argument("--slo-ms", type=float, help="p95 rerun latency target used to suggest sessions per replica")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-rerun timeout (s)")
+    parser.add_argument("--app", default=APP_PATH, help="Streamlit script to serve")
+    parser.add_argument("--url", help="Drive an already running app (e.g. one replica) instead of starting one")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args(argv)
+
+    if ws_connect is None:
+        parser.error("the 'websockets' package is required (pip install websockets)")
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    if args.url:
+        results = _run_levels(args.url, levels, args)
+    else:
+        with MockOpenAI(args.latency, args.tokens) as mock:
+            env = dict(os.environ, OPENAI_API_KEY="mock-key", OPENAI_BASE_URL=mock.base_url)
+            # Keep the run self-contained: no model calls leave the machine, no traces exported
+            for name in ("TRACE_FILE", "TRACE_OTLP_ENDPOINT", "TRACE_LANGSMITH"):
+                env.pop(name, None)
+            with StreamlitServer(args.app, env) as server:
+                results = _run_levels(server.url, levels, args, server, mock)
+
+    print(format_report(results, args.slo_ms))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
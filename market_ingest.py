@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Market data ingestion for Digital Roots
+Loads price/volume series (CSV: timestamp, price[, volume][, series] - or
+JSON records / {"<series>": [records...]}) into the market store the Market
+agent reads (MARKET_DATA_DIR), updating indicators incrementally. Points at
+or before a series' last stored timestamp are skipped and reported.
+
+Run it once per export, from cron, or with --watch as a small daemon that
+picks up new files dropped into a directory.
+
+Usage:
+    python market_ingest.py /exports/wholesale-flower.csv --series wholesale_flower --store /var/lib/digital_roots/market
+    python market_ingest.py /exports/prices --watch 300
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import Optional, List
+
+from agents.market_data import MarketStore
+
+DONE_SUFFIX = ".ingested"
+EXTENSIONS = (".csv", ".json")
+
+
+def _input_files(inputs: List[str]) -> List[str]:
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def ingest(store: MarketStore, paths: List[str], series: Optional[str] = None,
+           mark_done: bool = False) -> int:
+    """Ingest price files; returns the number of points stored"""
+    total = 0
+    for path in paths:
+        if mark_done and os.path.exists(path + DONE_SUFFIX):
+            continue
+        dropped = sum(store.dropped.values())
+        if path.lower().endswith(".json"):
+            count = store.ingest_json(path, series)
+        else:
+            count = store.ingest_csv(path, series)
+        dropped = sum(store.dropped.values()) - dropped
+        print(f"✅ {path}: {count:,} points" + (f", {dropped:,} skipped" if dropped else ""), file=sys.stderr)
+        total += count
+        if mark_done:
+            with open(path + DONE_SUFFIX, "w"):
+                pass
+    return total
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest market price/volume series")
+    parser.add_argument("inputs", nargs="+", help="CSV/JSON files or directories of them")
+    parser.add_argument("--store", default=os.getenv("MARKET_DATA_DIR"),
+                        help="Market store directory (MARKET_DATA_DIR)")
+    parser.add_argument("--series", help="Series name for files without a 'series' column")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="Keep polling the inputs for new files (marked <file>.ingested once done)")
+    args = parser.parse_args(argv)
+
+    if not args.store:
+        parser.error("--store or MARKET_DATA_DIR is required")
+    logging.basicConfig(level=logging.WARNING, format="⚠️ %(message)s")
+    store = MarketStore(args.store)
+    try:
+        ingest(store, _input_files(args.inputs), args.series, mark_done=bool(args.watch))
+        while args.watch:
+            time.sleep(args.watch)
+            ingest(store, _input_files(args.inputs), args.series, mark_done=True)
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    dropped = store.dropped
+    if any(dropped.values()):
+        print(f"ℹ️ Skipped {dropped['out_of_order']:,} points already stored or out of order, "
+              f"{dropped['invalid']:,} without a positive price", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
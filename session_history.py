@@ -0,0 +1,230 @@
+"""
+Bounded session history for Digital Roots
+One compact record per interaction, a fixed-size in-memory ring of recent
+turns, and older turns spilled to a per-session segment file on disk that is
+only read back when someone pages through old history.
+"""
+import os
+import json
+import time
+import uuid
+import weakref
+import tempfile
+from array import array
+from collections import deque
+from typing import Dict, Any, Optional, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+DEFAULT_RING_SIZE = int(os.getenv("SESSION_HISTORY_RING", "50"))
+DEFAULT_SPILL_DIR = os.getenv("SESSION_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "digital_roots_sessions")
+# Segments of sessions that went away without cleanup are removed after this long
+STALE_SEGMENT_SECONDS = 24 * 3600
+
+# Histories alive in this process, by segment path
+_live: "weakref.WeakValueDictionary[str, SessionHistory]" = weakref.WeakValueDictionary()
+
+
+class Interaction:
+    """One chat turn; shared by the chat view and the evidence log"""
+
+    __slots__ = ("timestamp", "agent", "question", "answer", "tokens")
+
+    def __init__(self, timestamp: str, agent: str, question: str, answer: str, tokens: int):
+        self.timestamp = timestamp
+        self.agent = agent
+        self.question = question
+        self.answer = answer
+        self.tokens = tokens
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Interaction":
+        return cls(data.get("timestamp", ""), data.get("agent", ""), data.get("question", ""),
+                   data.get("answer", ""), int(data.get("tokens", 0) or 0))
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _release(path: str, handle: List[Any]) -> None:
+    """Close a history's segment (dropping its lock) and delete it"""
+    if handle[0] is not None:
+        handle[0].close()
+        handle[0] = None
+    _remove(path)
+
+
+def _in_use(path: str) -> bool:
+    """Whether a live session, in this or another process, owns the segment"""
+    if path in _live:
+        return True
+    if fcntl is None:
+        return False
+    try:
+        with open(path, "rb") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+    except OSError:
+        pass
+    return False
+
+
+def cleanup_stale_segments(spill_dir: str = DEFAULT_SPILL_DIR, max_age: float = STALE_SEGMENT_SECONDS) -> int:
+    """Delete spill segments not written to for ``max_age`` seconds whose session is gone"""
+    if not os.path.isdir(spill_dir):
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(spill_dir):
+        path = os.path.join(spill_dir, name)
+        try:
+            if name.endswith(".jsonl") and os.path.getmtime(path) < cutoff and not _in_use(path):
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+class SessionHistory:
+    """Ring of the most recent interactions with spill-to-disk for older ones.
+
+    Memory per session is bounded by ``ring_size`` records plus one 8-byte
+    offset per spilled record. Spilled records are appended to
+    ``<spill_dir>/<session_id>.jsonl`` and read back by offset on demand.
+
+    The segment stays open (under a shared lock) for the life of the history,
+    so ``cleanup_stale_segments`` in any process skips it however long the
+    session has been idle, and reads keep working even if the file is
+    unlinked. It is deleted when the history is garbage collected. If the
+    spilled records still become unreadable they are dropped and counted in
+    ``lost`` instead of failing every page view.
+    """
+
+    def __init__(self, session_id: Optional[str] = None, ring_size: int = DEFAULT_RING_SIZE,
+                 spill_dir: str = DEFAULT_SPILL_DIR):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.ring_size = max(1, ring_size)
+        self.spill_path = os.path.join(spill_dir, f"{self.session_id}.jsonl")
+        self._ring: deque = deque()
+        self._offsets = array("q")
+        self._spill_end = 0
+        self.lost = 0
+        os.makedirs(spill_dir, exist_ok=True)
+        # Held in a list so the finalizer can close it without referencing self
+        self._handle: List[Any] = [None]
+        self._finalizer = weakref.finalize(self, _release, self.spill_path, self._handle)
+        _live[self.spill_path] = self
+
+    def __len__(self) -> int:
+        return len(self._offsets) + len(self._ring)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    @property
+    def spilled(self) -> int:
+        """Number of interactions held on disk"""
+        return len(self._offsets)
+
+    def append(self, record: Interaction) -> None:
+        """Add an interaction; the oldest in-memory one is spilled once the ring is full"""
+        self._ring.append(record)
+        if len(self._ring) > self.ring_size:
+            self._spill(self._ring.popleft())
+
+    def _segment(self):
+        if self._handle[0] is None:
+            f = open(self.spill_path, "a+b")
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_SH)
+            self._spill_end = f.seek(0, os.SEEK_END)
+            self._handle[0] = f
+        return self._handle[0]
+
+    def _spill(self, record: Interaction) -> None:
+        line = (json.dumps(record.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+        f = self._segment()
+        f.write(line)
+        f.flush()
+        self._offsets.append(self._spill_end)
+        self._spill_end += len(line)
+
+    def _lose_spilled(self) -> None:
+        """Forget spilled records that can no longer be read; the ring is kept"""
+        self.lost += len(self._offsets)
+        self._offsets = array("q")
+        _release(self.spill_path, self._handle)
+
+    def _read_spilled(self, start: int, stop: int) -> List[Interaction]:
+        if start >= stop:
+            return []
+        end = self._offsets[stop] if stop < len(self._offsets) else self._spill_end
+        try:
+            f = self._segment()
+            f.seek(self._offsets[start])
+            data = f.read(end - self._offsets[start])
+            return [Interaction.from_dict(json.loads(line)) for line in data.splitlines() if line]
+        except (OSError, ValueError):
+            self._lose_spilled()
+            return []
+
+    def recent(self, count: int) -> List[Interaction]:
+        """The last ``count`` interactions, oldest first"""
+        return self.page(max(len(self) - count, 0), count)
+
+    def page(self, start: int, count: int) -> List[Interaction]:
+        """Interactions ``start .. start + count`` in chronological order"""
+        start = max(start, 0)
+        stop = min(start + count, len(self))
+        spilled = len(self._offsets)
+        records = self._read_spilled(start, min(stop, spilled))
+        if spilled and not self._offsets:
+            # The spilled part was lost; the page falls back to what is still in memory
+            start, stop, spilled = max(start - spilled, 0), max(stop - spilled, 0), 0
+        ring = list(self._ring)
+        records.extend(ring[max(start - spilled, 0):max(stop - spilled, 0)])
+        return records
+
+    def __iter__(self) -> Iterator[Interaction]:
+        """All interactions, streaming spilled ones from disk"""
+        if self._offsets:
+            # Pages of spilled records, re-reading by offset so appends in between are harmless
+            spilled = len(self._offsets)
+            for start in range(0, spilled, self.ring_size):
+                yield from self._read_spilled(start, min(start + self.ring_size, spilled))
+                if not self._offsets:
+                    break
+        yield from list(self._ring)
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        for record in self:
+            yield record.to_dict()
+
+    def clear(self) -> None:
+        self._ring.clear()
+        self._offsets = array("q")
+        self._spill_end = 0
+        self.lost = 0
+        _release(self.spill_path, self._handle)
@@ -4,6 +4,7 @@ import os
 import sys
 import json
 import requests
+import tempfile
 from datetime import datetime
 from typing import Dict, Any, Optional
 
@@ -20,6 +21,16 @@ from agents.compliance import run_compliance
 from agents.code import run_code
 from agents.innovation import run_innovation
 from agents.risk import run_risk
+from agents.scanner import redact, get_scanner
+from agents.tracing import span
+from agents.llm import hedge_stats
+from agents.breaker import breaker_states
+from agents.cache import get_cache
+from agents.tokens import token_session
+from agents.evidence import get_evidence_log, verify_log
+from evidence_export import export, parse_bound
+from session_history import SessionHistory, Interaction, cleanup_stale_segments
+from ingestion import get_ingest_store, fetch_url
 
 # Configuration
 LANGGRAPH_API_URL = "https://ground-control-a0ae430fa0b85ca09ebb486704b69f2b.us.langgraph.app"
@@ -32,6 +43,15 @@ LANGUAGES = {
     "fr": "🇫🇷 Français"
 }
 
+# Evidence entries shown per page in the Evidence tab
+EVIDENCE_PAGE_SIZE = 20
+
+# Append-only, hash-chained log of every chat interaction (optional)
+EVIDENCE_LOG = os.getenv("EVIDENCE_LOG")
+
+# Seconds an agent health check result is reused (shared cache, see CACHE_URL)
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "60"))
+
 # Available agents
 AGENTS = {
     "ghc_dt": {"name": "CEO Digital Twin", "icon": "👨‍💼", "func": run_ghc_dt},
@@ -49,10 +69,10 @@ def init_session_state():
     """Initialize session state variables"""
     if 'language' not in st.session_state:
         st.session_state.language = 'en'
-    if 'chat_history' not in st.session_state:
-        st.session_state.chat_history = []
-    if 'evidence_log' not in st.session_state:
-        st.session_state.evidence_log = []
+    if 'history' not in st.session_state:
+        # Single bounded store shared by the chat view and the evidence log
+        cleanup_stale_segments()
+        st.session_state.history = SessionHistory()
 
 def get_text(key, language='en'):
     """Get text in specified language"""
@@ -107,21 +127,31 @@ def chat_interface():
     if st.button("Send") and question:
         with st.spinner("Processing..."):
             try:
-                # Call the selected agent
-                agent_func = AGENTS[selected_agent]["func"]
-                result = agent_func(question)
-                
-                # Add to chat history
-                chat_entry = {
-                    "timestamp": datetime.now().isoformat(),
-                    "agent": selected_agent,
-                    "question": question,
-                    "answer": result["answer"],
-                    "tokens": result["meta"]["tokens"]
-                }
-                st.session_state.chat_history.append(chat_entry)
-                st.session_state.evidence_log.append(chat_entry)
-                
+                # One trace per question: redaction, agent call and evidence write
+                with span("chat.question", agent=selected_agent):
+                    # Strip PII and licence numbers before anything reaches the model
+                    with span("redaction"):
+                        question = redact(question)
+
+                    # Call the selected agent; its completions count against this session's token budget
+                    agent_func = AGENTS[selected_agent]["func"]
+                    with token_session(st.session_state.history.session_id):
+                        result = agent_func(question)
+
+                    # Add to chat history
+                    with span("evidence_write"):
+                        interaction = Interaction(
+                            timestamp=datetime.now().isoformat(),
+                            agent=selected_agent,
+                            question=question,
+                            answer=result["answer"],
+                            tokens=result["meta"]["tokens"]
+                        )
+                        st.session_state.history.append(interaction)
+                        # Durable, tamper-evident copy for audits
+                        if EVIDENCE_LOG:
+                            get_evidence_log(EVIDENCE_LOG).append(interaction.to_dict())
+
                 # Display result
                 st.success(f"**{AGENTS[selected_agent]['name']}** ({result['meta']['tokens']} tokens)")
                 st.write(result["answer"])
@@ -130,9 +160,9 @@ def chat_interface():
                 st.error(f"Error: {str(e)}")
     
     # Chat history
-    if st.session_state.chat_history:
+    if st.session_state.history:
         st.subheader("Recent Conversations")
-        for entry in reversed(st.session_state.chat_history[-5:]):
+        for entry in reversed(st.session_state.history.recent(5)):
             with st.expander(f"{AGENTS[entry['agent']]['icon']} {entry['question'][:50]}..."):
                 st.write(f"**Agent:** {AGENTS[entry['agent']]['name']}")
                 st.write(f"**Question:** {entry['question']}")
@@ -151,12 +181,17 @@ def ingest_interface():
     if uploaded_file:
         st.success(f"File uploaded: {uploaded_file.name}")
         
-        # Process file (placeholder)
+        # Content-addressed ingestion: unchanged files are skipped and only
+        # changed chunks of an updated file are scanned again
         if st.button("Process File"):
             with st.spinner("Processing file..."):
-                # Simulate processing
-                st.success("File processed successfully!")
-                
+                try:
+                    store = get_ingest_store(processor=get_scanner().findings)
+                    report = store.ingest(uploaded_file.name, uploaded_file.getvalue())
+                    show_ingest_report(store, report)
+                except Exception as e:
+                    st.error(f"Error processing file: {str(e)}")
+
     # URL ingestion
     st.subheader("URL Ingestion")
     url = st.text_input("Enter URL to process:")
@@ -164,32 +199,88 @@ def ingest_interface():
     if st.button("Process URL") and url:
         with st.spinner("Processing URL..."):
             try:
-                # Simulate URL processing
-                st.success(f"URL processed: {url}")
+                data = fetch_url(url)
+                store = get_ingest_store(processor=get_scanner().findings)
+                report = store.ingest(url, data)
+                show_ingest_report(store, report)
             except Exception as e:
                 st.error(f"Error processing URL: {str(e)}")
 
+def show_ingest_report(store, report):
+    """Summarise an ingestion delta and the scanner findings of the source"""
+    if report["unchanged"]:
+        st.info(f"Unchanged since last ingestion ({report['chunks']} chunks) - skipped")
+    elif not report["supported"]:
+        st.info("File recorded; its format has no text extraction, so only the file hash is tracked")
+    else:
+        st.info(
+            f"{report['chunks']} chunks: {report['processed']} processed, "
+            f"{report['reused']} reused, {report['removed']} removed"
+        )
+    findings = [f for result in store.results(report["source"]) if result for f in result]
+    pii = [f for f in findings if f["redact"]]
+    terms = sorted({f["term"] for f in findings if f["kind"] == "REGULATED"})
+    if pii:
+        st.warning(f"{len(pii)} PII/licence matches will be redacted before any model call")
+    if terms:
+        st.info(f"Regulated terms: {', '.join(terms)}")
+    st.success(f"Processed: {report['source']}")
+
 def evidence_interface():
     """Evidence and audit log interface"""
     st.header("📋 Evidence Log")
     
-    if st.session_state.evidence_log:
-        st.info(f"Total interactions: {len(st.session_state.evidence_log)}")
+    history = st.session_state.history
+    if history:
+        total = len(history)
+        st.info(f"Total interactions: {total}")
+        if history.lost:
+            st.warning(f"{history.lost} older interactions could no longer be read from disk and were dropped")
         
-        # Display evidence log
-        for i, entry in enumerate(reversed(st.session_state.evidence_log)):
-            with st.expander(f"Entry {len(st.session_state.evidence_log)-i}: {entry['timestamp'][:19]}"):
-                st.json(entry)
+        # Display evidence log newest first; older pages are read from disk on demand
+        pages = (total + EVIDENCE_PAGE_SIZE - 1) // EVIDENCE_PAGE_SIZE
+        page = st.number_input("Page:", min_value=1, max_value=pages, value=1, step=1) if pages > 1 else 1
+        stop = total - (page - 1) * EVIDENCE_PAGE_SIZE
+        start = max(stop - EVIDENCE_PAGE_SIZE, 0)
+        for i, entry in enumerate(reversed(history.page(start, stop - start))):
+            with st.expander(f"Entry {stop - i}: {entry['timestamp'][:19]}"):
+                st.json(entry.to_dict())
                 
         # Export functionality
-        if st.button("Export Evidence Log"):
-            evidence_json = json.dumps(st.session_state.evidence_log, indent=2)
-            st.download_button(
-                label="Download Evidence Log",
-                data=evidence_json,
-                file_name=f"evidence_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json"
+        st.subheader("Export")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            export_format = st.selectbox("Format:", options=["ndjson.gz", "parquet"])
+        with col2:
+            date_range = st.date_input("Date range:", value=())
+        with col3:
+            export_agents = st.multiselect(
+                "Agents:",
+                options=list(AGENTS.keys()),
+                format_func=lambda x: AGENTS[x]['name']
             )
+
+        if st.button("Export Evidence Log"):
+            since = until = None
+            if len(date_range) == 2:
+                since = parse_bound(date_range[0].isoformat())
+                until = parse_bound(date_range[1].isoformat(), end=True)
+            file_name = f"evidence_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+            try:
+                # Stream to a temp file in chunks instead of building one big string
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    export_path = os.path.join(tmp_dir, file_name)
+                    count = export(history.iter_dicts(), export_path, export_format,
+                                   since=since, until=until, agents=export_agents or None)
+                    with open(export_path, "rb") as export_file:
+                        st.download_button(
+                            label=f"Download Evidence Log ({count} entries)",
+                            data=export_file,
+                            file_name=file_name,
+                            mime="application/gzip" if export_format == "ndjson.gz" else "application/vnd.apache.parquet"
+                        )
+            except Exception as e:
+                st.error(f"Export failed: {str(e)}")
     else:
         st.info("No evidence logged yet. Start chatting to generate evidence.")
 
@@ -211,21 +302,90 @@ def governance_interface():
     
     with col2:
         st.write("**System Status**")
-        # Check system health
+        # Health checks call every agent, so results are shared across reruns and replicas
+        cache = get_cache()
+        health_keys = {agent_id: f"health:{agent_id}" for agent_id in AGENTS}
+        if st.button("Recheck Status"):
+            cache.delete(*health_keys.values())
+        cached_status = cache.get_many(health_keys.values())
+        fresh_status = {}
         for agent_id, agent_info in AGENTS.items():
-            try:
-                # Test agent with simple query
-                result = agent_info["func"]("System status check")
-                if "OPENAI_API_KEY not configured" in result["answer"]:
-                    status = "⚠️ API Key Missing"
-                elif result["answer"].startswith("Error:"):
+            status = cached_status.get(health_keys[agent_id])
+            if status is None:
+                try:
+                    # Test agent with simple query
+                    result = agent_info["func"]("System status check")
+                    if "OPENAI_API_KEY not configured" in result["answer"]:
+                        status = "⚠️ API Key Missing"
+                    elif "circuit open" in result["answer"]:
+                        status = "⛔ Circuit Open"
+                    elif result["answer"].startswith("Error:"):
+                        status = "❌ Error"
+                    else:
+                        status = "✅ Working"
+                except:
                     status = "❌ Error"
-                else:
-                    status = "✅ Working"
-            except:
-                status = "❌ Error"
+                fresh_status[health_keys[agent_id]] = status
             st.write(f"- {agent_info['name']}: {status}")
-    
+        cache.set_many(fresh_status, ttl=HEALTH_CACHE_TTL)
+
+    # Deadlines and hedged requests in the shared completion path
+    latency_stats = hedge_stats()
+    if latency_stats:
+        st.subheader("Completion Latency")
+        st.dataframe([
+            {
+                "Agent": AGENTS[agent_id]["name"] if agent_id in AGENTS else agent_id,
+                "Requests": s["requests"],
+                "p95 (ms)": None if s["p95_ms"] is None else round(s["p95_ms"]),
+                "Hedge rate": f"{s['hedge_rate']:.1%}",
+                "Hedge win rate": f"{s['win_rate']:.1%}",
+                "Hedges skipped (pool busy)": s["hedges_skipped"],
+                "Deadline exceeded": s["deadline_exceeded"],
+            }
+            for agent_id, s in latency_stats.items()
+        ], hide_index=True)
+
+    # Circuit breakers per agent and model
+    circuits = breaker_states()
+    if circuits:
+        st.subheader("Circuit Breakers")
+        state_labels = {"closed": "✅ Closed", "half_open": "🟡 Half-open", "open": "⛔ Open"}
+        st.dataframe([
+            {
+                "Agent": AGENTS[agent_id]["name"] if agent_id in AGENTS else agent_id,
+                "Model": model,
+                "State": state_labels.get(b["state"], b["state"]),
+                "Failure rate": f"{b['failure_rate']:.0%}",
+                "Slow rate": f"{b['slow_rate']:.0%}",
+                "Trips": b["trips"],
+                "Fast-failed": b["rejected"],
+                "Retry in (s)": round(b["retry_in_s"]) if b["state"] == "open" else None,
+            }
+            for (agent_id, model), b in circuits.items()
+        ], hide_index=True)
+
+    # Evidence log integrity
+    evidence_logs = list(dict.fromkeys(p for p in (EVIDENCE_LOG, os.getenv("GHC_DT_EVIDENCE_LOG")) if p))
+    if evidence_logs:
+        st.subheader("Evidence Integrity")
+        full_scan = st.checkbox("Full rescan (re-verify already verified segments)")
+        if st.button("Verify Evidence Log"):
+            for path in evidence_logs:
+                if not os.path.exists(path):
+                    st.info(f"{path}: nothing logged yet")
+                    continue
+                with st.spinner(f"Verifying {path}..."):
+                    report = verify_log(path, full=full_scan)
+                summary = (f"{report['segments']} sealed segments, {report['checked_entries']} entries checked "
+                           f"in {report['elapsed_s']:.2f}s, head {report['head'][:12]}")
+                if report["ok"]:
+                    st.success(f"✅ {path}: chain intact ({summary})")
+                else:
+                    st.error(f"❌ {path}: {'; '.join(report['errors'][:5])}")
+                if report["legacy_bytes"]:
+                    st.warning(f"{path}: {report['legacy_bytes']} bytes of entries predate chaining and are not covered")
+
     # Compliance information
     st.subheader("Compliance & Security")
     st.info("""
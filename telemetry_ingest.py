@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Telemetry ingestion for Digital Roots
+Loads sensor CSVs (long: timestamp, sensor, value - or wide: timestamp,
+<sensor>...) and batch records into the operations store, feeding every
+reading through streaming anomaly detection on the way in. Alerts are
+appended to the alerts log that the Operations and CEO Digital Twin agents
+read (ANOMALY_ALERTS_LOG, default <store>/alerts.jsonl).
+
+Run it once per export, from cron, or with --watch as a small daemon that
+picks up new files dropped into a directory.
+
+Usage:
+    python telemetry_ingest.py /exports/greenhouse-2024-06.csv --store /var/lib/digital_roots/ops
+    python telemetry_ingest.py /exports/incoming --watch 60 --batches /exports/batches.csv
+"""
+import os
+import sys
+import time
+import argparse
+from typing import Optional, List
+
+from agents.sensor_store import SensorStore
+from agents.anomaly import alerts_log_path, detector_from_env
+
+DONE_SUFFIX = ".ingested"
+
+
+def _csv_files(inputs: List[str]) -> List[str]:
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.lower().endswith(".csv"))
+        else:
+            files.append(path)
+    return files
+
+
+def ingest(store: SensorStore, paths: List[str], mark_done: bool = False) -> int:
+    """Ingest sensor CSVs; returns the number of alerts raised"""
+    raised = store.detector.alerts_raised if store.detector else 0
+    for path in paths:
+        if mark_done and os.path.exists(path + DONE_SUFFIX):
+            continue
+        start = time.perf_counter()
+        before = store.detector.alerts_raised if store.detector else 0
+        count = store.ingest_csv(path)
+        alerts = (store.detector.alerts_raised - before) if store.detector else 0
+        print(f"✅ {path}: {count:,} readings in {time.perf_counter() - start:.1f}s, {alerts} alerts",
+              file=sys.stderr)
+        if mark_done:
+            with open(path + DONE_SUFFIX, "w"):
+                pass
+    return (store.detector.alerts_raised - raised) if store.detector else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest sensor telemetry with anomaly detection")
+    parser.add_argument("inputs", nargs="*", help="Sensor CSV files or directories of CSVs")
+    parser.add_argument("--store", default=os.getenv("OPERATIONS_DATA_DIR"),
+                        help="Operations store directory (OPERATIONS_DATA_DIR)")
+    parser.add_argument("--batches", help="Batch records CSV (batch_id, start, end, yield_g, ...)")
+    parser.add_argument("--no-detect", action="store_true", help="Store readings without anomaly detection")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="Keep polling the inputs for new CSVs (marked <file>.ingested once done)")
+    args = parser.parse_args(argv)
+
+    if not args.store:
+        parser.error("--store or OPERATIONS_DATA_DIR is required")
+    store = SensorStore(args.store, None if args.no_detect else detector_from_env(args.store))
+    if args.batches:
+        print(f"✅ {store.ingest_batches_csv(args.batches)} batch records", file=sys.stderr)
+
+    alerts = ingest(store, _csv_files(args.inputs), mark_done=bool(args.watch))
+    try:
+        while args.watch:
+            time.sleep(args.watch)
+            alerts += ingest(store, _csv_files(args.inputs), mark_done=True)
+    except KeyboardInterrupt:
+        pass
+    if store.detector:
+        print(f"ℹ️ {alerts} alerts written to {alerts_log_path(args.store)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
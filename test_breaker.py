@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the completion circuit breaker: trip, half-open probe, close and reopen
+"""
+import time
+
+from agents.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+def _breaker(**kwargs):
+    options = dict(window=10, min_calls=4, failure_rate=50.0, slow_seconds=1.0, open_seconds=0.05)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def test_trips_on_failure_rate():
+    breaker = _breaker()
+    for success in (True, False, True):
+        breaker.record(success, 0.1)
+    assert breaker.state == CLOSED  # below min_calls nothing trips
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN and breaker.trips == 1
+    assert not breaker.allow() and breaker.rejected == 1
+
+
+def test_trips_on_slow_calls():
+    breaker = _breaker(slow_rate=75.0)
+    for _ in range(4):
+        breaker.record(True, 2.0)
+    assert breaker.state == OPEN
+
+
+def test_half_open_probe_success_closes():
+    breaker = _breaker(half_open_probes=1)
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN and breaker.trips == 2
+    assert not breaker.allow() and breaker.retry_in() > 0
+    # A slow probe counts as a failure too
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True, 2.0)
+    assert breaker.state == OPEN and breaker.trips == 3
+
+
+def test_released_probe_slot_is_reusable():
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    time.sleep(0.06)
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()  # e.g. the call timed out locally before reaching upstream
+    assert breaker.allow()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing circuit breaker")
+    print("=" * 40)
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
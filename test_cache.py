@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared cache: replicas must not serve each other's stale near-cache entries
+"""
+import time
+
+from agents.cache import Cache, RedisBackend, LocalRedisServer
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _replicas(server, count=2):
+    caches = [Cache(RedisBackend(server.url), near_ttl=60) for _ in range(count)]
+    # Invalidations only reach replicas whose listener has subscribed
+    assert _wait_for(lambda: len(server._subscribers) == count)
+    return caches
+
+
+def test_values_shared_across_replicas():
+    with LocalRedisServer() as server:
+        a, b = _replicas(server)
+        a.set_many({"answer:1": {"text": "Lemon Haze"}, "answer:2": [1, 2, 3]})
+        assert b.get_many(["answer:1", "answer:2", "answer:3"]) == {
+            "answer:1": {"text": "Lemon Haze"}, "answer:2": [1, 2, 3]}
+        assert b.stats["hits"] == 2 and b.stats["misses"] == 1
+
+
+def test_set_invalidates_other_replicas_near_cache():
+    with LocalRedisServer() as server:
+        a, b = _replicas(server)
+        a.set("answer:1", "old")
+        time.sleep(0.1)  # let the first write's own invalidation reach b
+        assert b.get("answer:1") == "old"
+        assert b.get("answer:1") == "old" and b.stats["near_hits"] == 1
+
+        a.set("answer:1", "new")
+        assert _wait_for(lambda: "digital_roots:answer:1" not in b._near)
+        assert b.get("answer:1") == "new"
+
+
+def test_delete_invalidates_other_replicas_near_cache():
+    with LocalRedisServer() as server:
+        a, b = _replicas(server)
+        a.set("answer:1", "old")
+        assert b.get("answer:1") == "old"
+
+        a.delete("answer:1")
+        assert _wait_for(lambda: "digital_roots:answer:1" not in b._near)
+        assert b.get("answer:1") is None
+
+
+if __name__ == "__main__":
+    print("🧪 Testing cross-replica cache invalidation")
+    print("=" * 40)
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
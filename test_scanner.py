@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Regression tests for PII redaction: business figures must reach the agents intact
+"""
+from agents.scanner import Scanner
+
+
+def test_amounts_and_versions_are_not_redacted():
+    scanner = Scanner(terms=[])
+    for text in ("Revenue was 750.000.000 EUR",
+                 "We harvested 812 345 678 seeds",
+                 "Upgrade to version 10.0.0.1",
+                 "Our permit 2025 renewal is due"):
+        assert scanner.redact(text) == text
+
+
+def test_phone_needs_prefix_or_keyword():
+    scanner = Scanner(terms=[])
+    assert scanner.redact("Call +34 612 345 678 today") == "Call [PHONE] today"
+    assert scanner.redact("móvil: 612 345 678") == "móvil: [PHONE]"
+    assert scanner.redact("tel. 912.345.678") == "tel. [PHONE]"
+
+
+def test_ipv4_needs_address_context():
+    scanner = Scanner(terms=[])
+    assert scanner.redact("IP address: 192.168.1.20") == "IP address: [IPV4]"
+    assert scanner.redact("server 10.0.0.5 is down") == "server [IPV4] is down"
+
+
+def test_checksummed_identifiers_still_redacted():
+    scanner = Scanner(terms=[])
+    assert scanner.redact("DNI 12345678Z, card 4111 1111 1111 1111") == "DNI [DNI], card [CARD]"
+    assert scanner.redact("licence no. 2025-114") == "[LICENCE]"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing PII redaction")
+    print("=" * 40)
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
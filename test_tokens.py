@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tests for token admission: context overflow policies and token budgets
+"""
+import os
+from contextlib import contextmanager
+
+from agents.tokens import (
+    admit, count_messages, token_session, AdmissionError, PART_HEADER, MIN_CHUNK_TOKENS,
+)
+
+MODEL = "gpt-4o-mini"
+
+
+@contextmanager
+def _env(**values):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update({name: str(value) for name, value in values.items()})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _messages(words=3000):
+    document = " ".join(f"plant{i} yield" for i in range(words))
+    return [{"role": "system", "content": "You are the Data Agent."},
+            {"role": "user", "content": f"Summarise this report:\n{document}"}]
+
+
+def _fits(request, limit=2000, reserve=200):
+    return count_messages(request, MODEL) + reserve <= limit
+
+
+def test_small_request_admitted_unchanged():
+    messages = _messages(words=10)
+    with _env(LLM_CONTEXT_LIMIT=2000, LLM_OUTPUT_RESERVE=200, LLM_OVERFLOW="reject"):
+        admission = admit("tokens_test_small", messages, MODEL)
+    assert admission.action == "admitted" and admission.requests == [messages]
+    assert admission.prompt_tokens == count_messages(messages, MODEL)
+
+
+def test_overflow_rejected():
+    with _env(LLM_CONTEXT_LIMIT=2000, LLM_OUTPUT_RESERVE=200, LLM_OVERFLOW="reject"):
+        try:
+            admit("tokens_test_reject", _messages(), MODEL)
+        except AdmissionError as e:
+            assert "Request rejected" in str(e)
+        else:
+            raise AssertionError("oversize prompt was admitted")
+
+
+def test_overflow_truncated():
+    messages = _messages()
+    with _env(LLM_CONTEXT_LIMIT=2000, LLM_OUTPUT_RESERVE=200, LLM_OVERFLOW="truncate"):
+        admission = admit("tokens_test_truncate", messages, MODEL)
+    assert admission.action == "truncated" and len(admission.requests) == 1
+    request = admission.requests[0]
+    assert _fits(request)
+    assert request[0] == messages[0]
+    assert "[... truncated ...]" in request[1]["content"]
+    assert request[1]["content"].startswith("Summarise this report:")
+
+
+def test_overflow_chunked_and_combined():
+    messages = _messages()
+    with _env(LLM_CONTEXT_LIMIT=2000, LLM_OUTPUT_RESERVE=200, LLM_OVERFLOW="chunk", LLM_MAX_CHUNKS=16):
+        admission = admit("tokens_test_chunk", messages, MODEL)
+        assert admission.action == "chunked" and len(admission.requests) > 1
+        count = len(admission.requests)
+        for i, request in enumerate(admission.requests, 1):
+            assert _fits(request)
+            assert request[1]["content"].startswith(PART_HEADER.format(index=i, count=count))
+        # Nothing of the original prompt is lost between the parts
+        parts = "".join(r[1]["content"].split("\n", 1)[1] for r in admission.requests)
+        assert parts == messages[1]["content"]
+
+        combine = admission.combine_request([f"answer {i} " * 200 for i in range(count)], MODEL)
+    assert combine[0] == messages[0] and _fits(combine)
+
+
+def test_too_many_chunks_rejected():
+    with _env(LLM_CONTEXT_LIMIT=2000, LLM_OUTPUT_RESERVE=200, LLM_OVERFLOW="chunk", LLM_MAX_CHUNKS=2):
+        try:
+            admit("tokens_test_max_chunks", _messages(), MODEL)
+        except AdmissionError as e:
+            assert "LLM_MAX_CHUNKS is 2" in str(e)
+        else:
+            raise AssertionError("prompt needing more than LLM_MAX_CHUNKS parts was admitted")
+    # Too little room per part is refused rather than fanned out
+    limit = MIN_CHUNK_TOKENS + 200
+    with _env(LLM_CONTEXT_LIMIT=limit, LLM_OUTPUT_RESERVE=200, LLM_OVERFLOW="chunk"):
+        try:
+            admit("tokens_test_min_chunk", _messages(), MODEL)
+        except AdmissionError as e:
+            assert "needed to chunk" in str(e)
+        else:
+            raise AssertionError("chunks below MIN_CHUNK_TOKENS were admitted")
+
+
+def test_agent_budget_exhausted_and_settled():
+    messages = _messages(words=50)
+    with _env(LLM_AGENT_TOKEN_BUDGET=800, LLM_OUTPUT_RESERVE=200, LLM_BUDGET_WINDOW=3600):
+        first = admit("tokens_test_budget", messages, MODEL)
+        try:
+            admit("tokens_test_budget", messages, MODEL)
+        except AdmissionError as e:
+            assert "agent token budget exhausted" in str(e)
+        else:
+            raise AssertionError("request over the agent budget was admitted")
+        # Settling to the real usage frees the unused part of the reservation
+        first.settle(100)
+        admit("tokens_test_budget", messages, MODEL)
+
+
+def test_session_budget_exhausted():
+    messages = _messages(words=50)
+    with _env(LLM_SESSION_TOKEN_BUDGET=800, LLM_OUTPUT_RESERVE=200):
+        with token_session("tokens-test-session"):
+            admit("tokens_test_session_a", messages, MODEL)
+            try:
+                admit("tokens_test_session_b", messages, MODEL)
+            except AdmissionError as e:
+                assert "session token budget exhausted" in str(e)
+            else:
+                raise AssertionError("request over the session budget was admitted")
+        # Outside the session only the (unset) agent budget applies
+        admit("tokens_test_session_b", messages, MODEL)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing token admission")
+    print("=" * 40)
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")